@@ -0,0 +1,177 @@
+import itertools
+import logging
+import math
+
+import geodesy
+
+logger = logging.getLogger(__name__)
+
+# Anchor watch: once the vessel has been stationary for SETTLE_FIXES fixes the
+# median position becomes the anchor reference. The swing radius starts at the
+# spread of those fixes and grows, up to MAX_SWING_RADIUS_M, as the vessel
+# sweeps more of its circle when the wind or tide turns. A drift alarm is
+# raised when single fixes, or the rolling median center, stay more than
+# DRIFT_THRESHOLD_M outside the swing radius for SUSTAIN_SECONDS. The alarm
+# stays latched until acknowledge() is called or the vessel gets underway;
+# only then does the watch re-arm where it settles next. The per-fix
+# path only reads the newest ring entry and does scalar math; medians and
+# the radius are recomputed every RECENTER_EVERY fixes. Positions are read
+# from a fix_ring.FixRing that the caller appends to.
+WINDOW_FIXES = 300  # Newest ring entries used for the median and radius
+RECENTER_EVERY = 10  # Fixes between rolling median updates
+SETTLE_FIXES = 60  # Consecutive stationary fixes before arming
+MOORED_SPEED = 1.0  # km/h
+UNDERWAY_SPEED = 5.0  # km/h; SETTLE_FIXES fixes above this disarm the watch
+DRIFT_THRESHOLD_M = 30.0
+MIN_SWING_RADIUS_M = 15.0  # GPS noise alone reaches a few meters
+MAX_SWING_RADIUS_M = 60.0  # Roughly the anchor scope; set per vessel
+SUSTAIN_SECONDS = 30.0
+RADIUS_PERCENTILE = 0.95
+# Settings a config reload may change; WINDOW_FIXES is bound when the watch is created.
+HOT_SETTINGS = ('RECENTER_EVERY', 'SETTLE_FIXES', 'MOORED_SPEED', 'UNDERWAY_SPEED', 'DRIFT_THRESHOLD_M',
+                'MIN_SWING_RADIUS_M', 'MAX_SWING_RADIUS_M', 'SUSTAIN_SECONDS', 'RADIUS_PERCENTILE')
+
+STATE_IDLE = "idle"
+STATE_ARMED = "armed"
+STATE_ALARM = "alarm"
+
+
+class AnchorWatch:
+    """Drift detector over the newest positions in a fix ring."""
+
+    def __init__(self, ring, window=None):
+        self.ring = ring
+        self.window = WINDOW_FIXES if window is None else window
+        self.seen = 0  # ring.written when last evaluated
+        self.since_recenter = 0
+        self.state = STATE_IDLE
+        self.stationary = 0  # Consecutive fixes below MOORED_SPEED
+        self.moving = 0  # Consecutive fixes above UNDERWAY_SPEED
+        self.anchor = None  # (lat, lon) reference while armed
+        self.anchor_radius_m = 0.0  # Swing radius around the anchor reference
+        self.center = None  # Rolling median (lat, lon)
+        self.radius_m = 0.0  # Rolling RADIUS_PERCENTILE distance from the center
+        self.distance_m = 0.0  # Latest fix from the anchor reference
+        self.drift_m = 0.0  # Rolling center from the anchor reference
+        self.outside_since = None
+        self.drift_since = None
+        self.last_time = None
+
+    def update(self):
+        """Evaluate the newest ring entry; return True if the watch changed state (armed, alarm, disarmed)."""
+        ring = self.ring
+        if ring.written == self.seen:
+            return False
+        self.seen = ring.written
+        slot = ring.newest_slot()
+        lat = ring.latitude[slot]
+        lon = ring.longitude[slot]
+        speed = ring.speed[slot]
+        now = ring.time[slot]
+        self.last_time = now
+        self.since_recenter += 1
+        if self.since_recenter >= RECENTER_EVERY or self.center is None:
+            self._recenter()
+        if speed == speed:  # Not NaN
+            self.stationary = self.stationary + 1 if speed <= MOORED_SPEED else 0
+            self.moving = self.moving + 1 if speed >= UNDERWAY_SPEED else 0
+
+        if self.state == STATE_IDLE:
+            if self.stationary >= SETTLE_FIXES and len(ring) >= SETTLE_FIXES:
+                self._arm()
+                return True
+            return False
+        if self.moving >= SETTLE_FIXES:
+            self._disarm()
+            logger.info("Anchor watch disarmed: vessel underway")
+            return True
+        if self.state == STATE_ALARM:
+            # Latched: keep reporting the distance, but never re-arm at the drifted position.
+            self.distance_m = self._distance(self.anchor, lat, lon)
+            return False
+
+        self.distance_m = self._distance(self.anchor, lat, lon)
+        if self.anchor_radius_m < self.distance_m:
+            self.anchor_radius_m = min(self.distance_m, MAX_SWING_RADIUS_M)
+        alarm_radius = self.anchor_radius_m + DRIFT_THRESHOLD_M
+        if self.distance_m > alarm_radius:
+            if self.outside_since is None:
+                self.outside_since = now
+        else:
+            self.outside_since = None
+        if self.drift_m > alarm_radius:
+            if self.drift_since is None:
+                self.drift_since = now
+        else:
+            self.drift_since = None
+        if ((self.outside_since is not None and now - self.outside_since >= SUSTAIN_SECONDS) or
+                (self.drift_since is not None and now - self.drift_since >= SUSTAIN_SECONDS)):
+            self.state = STATE_ALARM
+            self.stationary = 0
+            logger.warning(f"Anchor drift alarm: {self.distance_m:.0f} m from anchor, "
+                           f"center moved {self.drift_m:.0f} m (swing radius {self.anchor_radius_m:.0f} m)")
+            return True
+        return False
+
+    def acknowledge(self):
+        """Clear a drift alarm; the watch re-arms once the vessel settles again. Return True if it was alarmed."""
+        if self.state != STATE_ALARM:
+            return False
+        self._disarm()
+        logger.info("Anchor drift alarm acknowledged")
+        return True
+
+    def _disarm(self):
+        self.state = STATE_IDLE
+        self.anchor = None
+        self.stationary = 0
+        self.outside_since = None
+        self.drift_since = None
+
+    def _arm(self):
+        self._recenter()
+        self.anchor = self.center
+        self.anchor_radius_m = min(max(self.radius_m, MIN_SWING_RADIUS_M), MAX_SWING_RADIUS_M)
+        self.drift_m = 0.0
+        self.outside_since = None
+        self.drift_since = None
+        self.state = STATE_ARMED
+        logger.info(f"Anchor watch armed at {self.anchor[0]:.6f}, {self.anchor[1]:.6f}, "
+                    f"swing radius {self.anchor_radius_m:.0f} m")
+
+    def _recenter(self):
+        self.since_recenter = 0
+        lat_views, _ = self.ring.views('latitude', self.window)
+        lon_views, _ = self.ring.views('longitude', self.window)
+        lats = sorted(itertools.chain(*lat_views))
+        lons = sorted(itertools.chain(*lon_views))
+        n = len(lats)
+        self.center = center_lat, center_lon = (lats[n // 2], lons[n // 2])
+        # Squared equirectangular distances in degrees, scaled to meters once at the end.
+        lon_scale = math.cos(math.radians(center_lat))
+        squared = sorted((lat - center_lat) ** 2 + ((lon - center_lon) * lon_scale) ** 2
+                         for lat, lon in zip(itertools.chain(*lat_views), itertools.chain(*lon_views)))
+        self.radius_m = math.radians(math.sqrt(squared[min(n - 1, int(n * RADIUS_PERCENTILE))])) * geodesy.EARTH_RADIUS_M
+        if self.anchor is not None:
+            self.drift_m = self._distance(self.anchor, *self.center)
+
+    @staticmethod
+    def _distance(origin, lat, lon):
+        # Equirectangular approximation; errors are negligible over an anchorage.
+        dy = math.radians(lat - origin[0])
+        dx = math.radians(lon - origin[1]) * math.cos(math.radians(origin[0]))
+        return geodesy.EARTH_RADIUS_M * math.hypot(dx, dy)
+
+    def status(self):
+        return {
+            "type": "anchorWatch",
+            "state": self.state,
+            "anchor": list(self.anchor) if self.anchor else None,
+            "swing_radius_m": round(self.anchor_radius_m, 1),
+            "alarm_radius_m": round(self.anchor_radius_m + DRIFT_THRESHOLD_M, 1) if self.anchor else None,
+            "center": list(self.center) if self.center else None,
+            "radius_m": round(self.radius_m, 1),
+            "distance_m": round(self.distance_m, 1),
+            "drift_m": round(self.drift_m, 1),
+            "timestamp": int(self.last_time * 1000) if self.last_time else None
+        }
@@ -0,0 +1,207 @@
+import ctypes
+import ctypes.util
+import glob
+import logging
+import os
+import select
+import socket
+import struct
+import subprocess
+import threading
+import time
+
+import fix_records
+
+logger = logging.getLogger(__name__)
+
+# Runtime hotplug for GPS receivers without udev rules. A thread watches /dev
+# with inotify (through ctypes, no extra packages) and, once the tty nodes
+# have settled, hands the current device list to a callback. Where inotify is
+# unavailable it falls back to rescanning every RESCAN_INTERVAL.
+#
+# gpsd is reconfigured through its control socket: "+/dev/ttyACM0\r\n" adds a
+# device and "-/dev/ttyACM0\r\n" removes it; gpsd answers "OK\n" or "ERROR\n".
+DEVICE_PATTERNS = ('/dev/ttyACM*', '/dev/ttyUSB*')
+WATCH_DIR = '/dev'
+BY_ID_DIR = '/dev/serial/by-id'  # Stable names, used to give a re-enumerated receiver its old role
+SETTLE_TIME = 1.0  # Seconds to wait after the last /dev event before rescanning
+RESCAN_INTERVAL = 30  # Seconds between rescans even without events
+CONTROL_TIMEOUT = 2  # Seconds to wait for gpsd to answer a control command
+
+IN_CLOEXEC = 0o2000000
+IN_NONBLOCK = 0o4000
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, name length
+
+
+def scan_devices(limit=None):
+    """Sorted tty devices that look like GPS receivers, at most `limit` of them."""
+    devices = sorted(path for pattern in DEVICE_PATTERNS for path in glob.glob(pattern))
+    return devices[:limit] if limit else devices
+
+
+def device_identity(device):
+    """The /dev/serial/by-id name pointing at a device, or the device path when there is none."""
+    real = os.path.realpath(device)
+    for link in glob.glob(os.path.join(BY_ID_DIR, '*')):
+        if os.path.realpath(link) == real:
+            return os.path.basename(link)
+    return device
+
+
+def gpsd_control(socket_path, command, device):
+    """Send one add ('+') or remove ('-') command to gpsd's control socket; returns True on OK.
+
+    Falls back to `sudo gpsdctl` when this user may not open the socket.
+    """
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as control:
+            control.settimeout(CONTROL_TIMEOUT)
+            control.connect(socket_path)
+            control.sendall(f"{command}{device}\r\n".encode('ascii'))
+            reply = control.recv(64)
+        if reply.startswith(b'OK'):
+            return True
+        logger.error(f"gpsd refused {command}{device}: {reply!r}")
+        return False
+    except PermissionError:
+        action = 'add' if command == '+' else 'remove'
+        try:
+            result = subprocess.run(['sudo', 'env', f'GPSD_SOCKET={socket_path}', 'gpsdctl', action, device],
+                                    capture_output=True, text=True, timeout=CONTROL_TIMEOUT + 3)
+        except subprocess.SubprocessError as e:
+            logger.error(f"gpsdctl {action} {device} failed: {e}")
+            return False
+        if result.returncode != 0:
+            logger.error(f"gpsdctl {action} {device} failed: {result.stderr.strip()}")
+        return result.returncode == 0
+    except OSError as e:
+        logger.error(f"Cannot reach gpsd control socket {socket_path}: {e}")
+        return False
+
+
+def gpsd_listening(socket_path):
+    """True if a gpsd is accepting connections on its control socket."""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as control:
+            control.settimeout(CONTROL_TIMEOUT)
+            control.connect(socket_path)
+        return True
+    except PermissionError:
+        return os.path.exists(socket_path)  # Only root may connect, but something is listening
+    except OSError:
+        return False
+
+
+class RoleMap:
+    """Receiver labels (top_gps, bottom_gps, gps_2, ...) that stick to a physical receiver.
+
+    A receiver keeps its label across re-enumeration (ttyACM0 coming back as
+    ttyACM2) as long as it has a /dev/serial/by-id name; new receivers take the
+    lowest free label.
+    """
+
+    def __init__(self):
+        self.by_identity = {}  # identity -> slot index
+
+    def assign(self, devices):
+        """Return [(device, label)] in slot order for the devices present now."""
+        identities = {device: device_identity(device) for device in devices}
+        present = set(identities.values())
+        # Forget devices without a stable name once they are gone; their tty may be reused by another receiver.
+        for identity in [identity for identity in self.by_identity
+                         if identity not in present and identity.startswith('/dev/')]:
+            del self.by_identity[identity]
+        taken = {self.by_identity[identity] for identity in present if identity in self.by_identity}
+        for device in sorted(devices):
+            identity = identities[device]
+            if identity not in self.by_identity:
+                slot = 0
+                while slot in taken:
+                    slot += 1
+                # The lowest free label may still be remembered for an absent receiver; a present one wins it.
+                for absent in [absent for absent, held in self.by_identity.items() if held == slot]:
+                    del self.by_identity[absent]
+                self.by_identity[identity] = slot
+                taken.add(slot)
+        slots = sorted((self.by_identity[identities[device]], device) for device in devices)
+        return [(device, fix_records.receiver_label(slot)) for slot, device in slots]
+
+
+class DeviceWatcher:
+    """Thread calling on_change(devices, added, removed) whenever the set of GPS tty devices changes."""
+
+    def __init__(self, devices, on_change, limit=None):
+        self.devices = list(devices)
+        self.on_change = on_change
+        self.limit = limit
+        self.fd = self._inotify()
+        self.thread = threading.Thread(target=self.run, name='device-watcher', daemon=True)
+
+    def _inotify(self):
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd < 0:
+                raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+            if libc.inotify_add_watch(fd, WATCH_DIR.encode(), IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO) < 0:
+                os.close(fd)
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch {WATCH_DIR} failed")
+            return fd
+        except (OSError, AttributeError) as e:
+            logger.warning(f"inotify unavailable ({e}), rescanning GPS devices every {RESCAN_INTERVAL} s")
+            return None
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def _relevant(self, data):
+        """True if any event in an inotify read names a device matching DEVICE_PATTERNS."""
+        prefixes = tuple(os.path.basename(pattern).rstrip('*') for pattern in DEVICE_PATTERNS)
+        pos = 0
+        while pos + EVENT_HEADER.size <= len(data):
+            _, _, _, length = EVENT_HEADER.unpack_from(data, pos)
+            name = data[pos + EVENT_HEADER.size:pos + EVENT_HEADER.size + length].rstrip(b'\0').decode(errors='replace')
+            pos += EVENT_HEADER.size + length
+            if name.startswith(prefixes) or name == 'serial':
+                return True
+        return False
+
+    def _wait_for_event(self, timeout):
+        """Block until a relevant /dev event (then let the burst settle) or the timeout."""
+        if self.fd is None:
+            time.sleep(timeout)
+            return
+        deadline = time.monotonic() + timeout
+        seen = False
+        while True:
+            remaining = (SETTLE_TIME if seen else deadline - time.monotonic())
+            if remaining <= 0:
+                return
+            readable, _, _ = select.select([self.fd], [], [], remaining)
+            if not readable:
+                return  # Settled, or rescan interval reached
+            try:
+                data = os.read(self.fd, 4096)
+            except BlockingIOError:
+                continue
+            seen = self._relevant(data) or seen
+
+    def run(self):
+        while True:
+            try:
+                self._wait_for_event(RESCAN_INTERVAL)
+                devices = scan_devices(self.limit)
+                if devices != self.devices:
+                    added = [device for device in devices if device not in self.devices]
+                    removed = [device for device in self.devices if device not in devices]
+                    logger.info(f"GPS devices changed: {self.devices} -> {devices}")
+                    self.devices = devices
+                    self.on_change(devices, added, removed)
+            except Exception as e:
+                logger.error(f"Device watcher error: {e}")
+                time.sleep(RESCAN_INTERVAL)
@@ -0,0 +1,72 @@
+import asyncio
+import gzip
+import json
+import time
+from email.utils import formatdate
+
+# Sequence-numbered fan-out of published fixes for the local WebSocket, the
+# SSE stream and long-poll clients. Each fix is encoded once, with its "seq"
+# added, and shared by every consumer. Consumers that fall behind skip to the
+# newest fix rather than queueing old ones: they always get the current
+# position, and a slow client cannot make the service buffer without bound.
+#
+# The HTTP validators are fixed per fix too: the ETag is the seq prefixed with
+# the process start time (seq restarts at 1 with the service), and the gzip
+# body is compressed at most once per fix, on first request.
+GZIP_MIN_BYTES = 256  # Smaller bodies are sent uncompressed
+GZIP_LEVEL = 6
+
+
+class FixFeed:
+    """The newest published fix plus a wakeup for consumers waiting on a newer one."""
+
+    def __init__(self):
+        self.seq = 0
+        self.message = None  # JSON text of the newest fix, for WebSocket clients
+        self.body = None  # The same as UTF-8 bytes, for HTTP responses
+        self.event = None  # SSE frame for the same fix
+        self.etag = None
+        self.last_modified = None  # HTTP date of the publish
+        self._gzip_body = None
+        self._epoch = f"{int(time.time()):x}"
+        self._changed = asyncio.Event()
+
+    def publish(self, data):
+        """Encode a fix dict once, number it and wake every waiting consumer; returns its seq."""
+        self.seq += 1
+        self.message = json.dumps(dict(data, seq=self.seq))
+        self.body = self.message.encode('utf-8')
+        self.event = b"id: %d\nevent: fix\ndata: %s\n\n" % (self.seq, self.body)
+        self.etag = f'"{self._epoch}-{self.seq}"'
+        self.last_modified = formatdate(usegmt=True)
+        self._gzip_body = None
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+        return self.seq
+
+    def gzip_body(self):
+        """The newest body gzip-compressed, or None if it is too small to be worth it."""
+        if self._gzip_body is None and self.body is not None and len(self.body) >= GZIP_MIN_BYTES:
+            self._gzip_body = gzip.compress(self.body, GZIP_LEVEL, mtime=0)
+        return self._gzip_body
+
+    def not_modified(self, if_none_match):
+        """True if an If-None-Match header value names the newest fix's ETag."""
+        if not if_none_match or self.etag is None:
+            return False
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        return '*' in tags or self.etag in tags or 'W/' + self.etag in tags
+
+    async def wait_newer(self, seq, timeout=None):
+        """Wait until a fix newer than seq exists; True if one does, False on timeout.
+
+        A seq ahead of ours (the client saw a previous run of the service)
+        counts as older, so the client resynchronises at once.
+        """
+        if self.seq != seq and self.message is not None:
+            return True
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
@@ -0,0 +1,147 @@
+import uplink_codec
+
+# Compact records for the GPS pipeline. Receivers are updated in place from
+# gpsd reports; a Fix snapshots them into slotted objects and converts to the
+# fix dict used everywhere else (archive, WebSocket, uplink) only on demand.
+# PRNs are kept as an int bitmap; the JSON shape lists them as ascending
+# strings.
+RECEIVER_LABELS = ("top_gps", "bottom_gps")
+TEXT_LABELS = ("Top GPS", "Bottom GPS")
+
+
+class SatelliteSet:
+    """PRNs of the satellites used in a solution, as a bitmap."""
+    __slots__ = ('bitmap',)
+
+    def __init__(self, bitmap=0):
+        self.bitmap = bitmap
+
+    @classmethod
+    def from_sky(cls, satellites):
+        bitmap = 0
+        for sat in satellites:
+            if sat.get('used', False):
+                prn = sat.get('PRN')
+                if isinstance(prn, int) and prn >= 0:
+                    bitmap |= 1 << prn
+        return cls(bitmap)
+
+    def __len__(self):
+        return bin(self.bitmap).count('1')
+
+    def __contains__(self, prn):
+        return prn >= 0 and bool(self.bitmap >> prn & 1)
+
+    def prns(self):
+        return uplink_codec.bitset_to_prns(self.bitmap)
+
+
+class ReceiverState:
+    """Latest TPV and SKY values from one receiver."""
+    __slots__ = ('device', 'label', 'timestamp', 'latitude', 'longitude', 'altitude', 'speed', 'heading', 'satellites')
+
+    def __init__(self, device, label=None):
+        self.device = device
+        self.label = label  # Role such as "top_gps"; None means "by position in the fix"
+        self.timestamp = None
+        self.latitude = None
+        self.longitude = None
+        self.altitude = None
+        self.speed = None  # km/h
+        self.heading = None
+        self.satellites = None  # SatelliteSet once a SKY report has arrived
+
+    def update_tpv(self, report, timestamp):
+        speed = getattr(report, 'speed', None)
+        heading = getattr(report, 'track', None)
+        self.timestamp = timestamp
+        self.latitude = getattr(report, 'lat', None)
+        self.longitude = getattr(report, 'lon', None)
+        self.altitude = getattr(report, 'alt', None)
+        self.speed = round(speed * 3.6, 2) if isinstance(speed, (int, float)) else speed  # m/s to km/h
+        self.heading = round(heading, 1) if isinstance(heading, (int, float)) else heading
+
+    def update_sky(self, report):
+        self.satellites = SatelliteSet.from_sky(report.get('satellites', []))
+
+    def copy(self):
+        state = ReceiverState(self.device, self.label)
+        state.timestamp = self.timestamp
+        state.latitude = self.latitude
+        state.longitude = self.longitude
+        state.altitude = self.altitude
+        state.speed = self.speed
+        state.heading = self.heading
+        state.satellites = self.satellites  # SatelliteSets are replaced, never mutated
+        return state
+
+    def to_dict(self, label):
+        satellites = self.satellites
+        return {
+            "gps": label,
+            "latitude": self.latitude,
+            "longitude": self.longitude,
+            "altitude": self.altitude,
+            "speed": self.speed,
+            "satellites": len(satellites) if satellites is not None else None,
+            "satellite_prns": satellites.prns() if satellites is not None else []
+        }
+
+
+def receiver_label(index):
+    return RECEIVER_LABELS[index] if index < len(RECEIVER_LABELS) else f"gps_{index}"
+
+
+def text_label(label):
+    """The output file heading for a receiver label: "Top GPS" for top_gps, "GPS 2" for gps_2."""
+    if label in RECEIVER_LABELS:
+        return TEXT_LABELS[RECEIVER_LABELS.index(label)]
+    return label.replace('_', ' ').upper()
+
+
+class Fix:
+    """One output fix: a snapshot of every receiver, in device order."""
+    __slots__ = ('timestamp', 'ship_id', 'device_id', 'heading', 'receivers', 'primary')
+
+    def __init__(self, timestamp, ship_id, device_id, heading, receivers, primary=None):
+        self.timestamp = timestamp
+        self.ship_id = ship_id
+        self.device_id = device_id
+        self.heading = heading
+        self.receivers = receivers  # Tuple of ReceiverState copies
+        self.primary = primary  # Label of the receiver chosen for the published position, if any
+
+    def to_dict(self):
+        """Return the fix in the JSON shape produced by parse_gps_data, plus "primary" when one is chosen."""
+        data = {
+            "timestamp": self.timestamp,
+            "ship_id": self.ship_id,
+            "device_id": self.device_id,
+            "heading": self.heading,
+            "gps_data": [receiver.to_dict(receiver.label or receiver_label(index))
+                         for index, receiver in enumerate(self.receivers)]
+        }
+        if self.primary is not None:
+            data["primary"] = self.primary
+        return data
+
+    def to_text(self):
+        """Render the human-readable block written to the output file."""
+        output = [
+            f"GPS Data (Real-Time): {self.timestamp}",
+            f"Ship ID: {self.ship_id}",
+            f"Device ID: {self.device_id}",
+            f"Heading: {self.heading if self.heading is not None else 'Unknown'}"
+        ]
+        for index, receiver in enumerate(self.receivers):
+            satellites = receiver.satellites
+            output.extend([
+                f"{text_label(receiver.label or receiver_label(index))} ({receiver.device}):",
+                f"  Latitude: {receiver.latitude if receiver.latitude is not None else 'Unknown'}",
+                f"  Longitude: {receiver.longitude if receiver.longitude is not None else 'Unknown'}",
+                f"  Altitude (m): {receiver.altitude if receiver.altitude is not None else 'Unknown'}",
+                f"  Speed (km/h): {receiver.speed if receiver.speed is not None else 'Unknown'}",
+                f"  Satellites: {len(satellites) if satellites is not None else 'Unknown'}",
+                f"  Satellite PRNs: {', '.join(satellites.prns()) if satellites is not None else ''}"
+            ])
+        return "\n".join(output) + "\n---------------------------\n"
@@ -0,0 +1,132 @@
+import argparse
+import asyncio
+import random
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import fix_records
+from gps_websocket_offline import parse_gps_data
+
+# Compare the nested-dict pipeline (device_data dicts -> text block ->
+# parse_gps_data) with fix_records (ReceiverState -> Fix -> to_text/to_dict)
+# on a synthetic gpsd stream, then project CPU and memory for a day at the
+# given rate. Run on the Pi itself for meaningful numbers.
+
+BASE_LAT = 16.8166
+BASE_LON = 96.1927
+SKY_EVERY = 10  # One SKY report per receiver for every 10 TPV reports
+PARSE_LOOP = asyncio.new_event_loop()  # parse_gps_data is a coroutine
+
+
+class Report(dict):
+    """Stand-in for the gps module's dictwrapper: dict access plus attributes."""
+    __getattr__ = dict.__getitem__
+
+
+def make_reports(receivers, count):
+    devices = [f"/dev/ttyACM{i}" for i in range(receivers)]
+    reports = []
+    for i in range(count):
+        device = devices[i % receivers]
+        if (i // receivers) % SKY_EVERY == 0:
+            satellites = [Report(PRN=prn, used=random.random() < 0.7, ss=random.randint(20, 45))
+                          for prn in random.sample(list(range(1, 33)) + list(range(65, 97)) + [120, 123, 127], 20)]
+            reports.append(Report({"class": "SKY", "device": device, "satellites": satellites}))
+        else:
+            reports.append(Report({"class": "TPV", "device": device, "lat": BASE_LAT + random.uniform(-1e-4, 1e-4),
+                                   "lon": BASE_LON + random.uniform(-1e-4, 1e-4), "alt": random.uniform(0, 10),
+                                   "speed": random.uniform(0, 0.3), "track": random.uniform(0, 360)}))
+    return devices, reports
+
+
+def timestamp_now():
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S.%f')
+
+
+def run_dicts(devices, reports, keep):
+    """The previous process_gps_data body: update dicts, render text, parse the text back."""
+    device_data = {device: {'latitude': None, 'longitude': None, 'altitude': None, 'speed': None,
+                            'satellites': None, 'timestamp': None, 'heading': None, 'satellite_prns': []}
+                   for device in devices}
+    kept = []
+    for report in reports:
+        device = report.device
+        timestamp = timestamp_now()
+        if report.get('class') == 'TPV':
+            speed = getattr(report, 'speed', None)
+            heading = getattr(report, 'track', None)
+            device_data[device].update({
+                'timestamp': timestamp, 'latitude': getattr(report, 'lat', None), 'longitude': getattr(report, 'lon', None),
+                'altitude': getattr(report, 'alt', None), 'speed': round(speed * 3.6, 2), 'heading': round(heading, 1)})
+        else:
+            used = [sat for sat in report.get('satellites', []) if sat.get('used', False)]
+            device_data[device].update({'satellites': len(used), 'satellite_prns': [str(sat.get('PRN', 'Unknown')) for sat in used]})
+        output = [f"GPS Data (Real-Time): {timestamp}", "Ship ID: BENCH", "Device ID: bench",
+                  f"Heading: {device_data[device]['heading'] if device_data[device]['heading'] is not None else 'Unknown'}"]
+        for idx, dev in enumerate(sorted(devices)):
+            data = device_data[dev]
+            output.extend([
+                f"{'Top GPS' if idx == 0 else 'Bottom GPS'} ({dev}):",
+                f"  Latitude: {data['latitude'] if data['latitude'] is not None else 'Unknown'}",
+                f"  Longitude: {data['longitude'] if data['longitude'] is not None else 'Unknown'}",
+                f"  Altitude (m): {data['altitude'] if data['altitude'] is not None else 'Unknown'}",
+                f"  Speed (km/h): {data['speed'] if data['speed'] is not None else 'Unknown'}",
+                f"  Satellites: {data['satellites'] if data['satellites'] is not None else 'Unknown'}",
+                f"  Satellite PRNs: {', '.join(data['satellite_prns'])}"])
+        text = "\n".join(output) + "\n---------------------------\n"
+        parsed = PARSE_LOOP.run_until_complete(parse_gps_data(text))
+        if keep:
+            kept.append(parsed)
+    return kept
+
+
+def run_records(devices, reports, keep):
+    device_data = {device: fix_records.ReceiverState(device) for device in devices}
+    device_order = sorted(devices)
+    kept = []
+    for report in reports:
+        device = report.device
+        timestamp = timestamp_now()
+        if report.get('class') == 'TPV':
+            device_data[device].update_tpv(report, timestamp)
+        else:
+            device_data[device].update_sky(report)
+        fix = fix_records.Fix(timestamp, "BENCH", "bench", device_data[device].heading,
+                              tuple(device_data[dev].copy() for dev in device_order))
+        fix.to_text()
+        fix.to_dict()
+        if keep:
+            kept.append(fix)
+    return kept
+
+
+def measure(run, devices, reports, retained):
+    started = time.process_time()
+    run(devices, reports, False)
+    cpu = (time.process_time() - started) / len(reports)
+    tracemalloc.start()
+    kept = run(devices, reports[:retained], True)
+    retained_bytes = tracemalloc.get_traced_memory()[0] / len(kept)
+    tracemalloc.stop()
+    return cpu, retained_bytes
+
+
+def main(args):
+    devices, reports = make_reports(args.receivers, args.reports)
+    per_day = args.rate * args.receivers * (1 + 1 / SKY_EVERY) * 86400
+    print(f"{args.receivers} receivers at {args.rate} Hz: {per_day / 1e6:.2f} M reports per day")
+    print(f"{'pipeline':<10} {'us/report':>10} {'CPU s/day':>10} {'B/fix kept':>11} {'GB 24 h kept':>12}")
+    for name, run in (("dicts", run_dicts), ("records", run_records)):
+        cpu, retained = measure(run, devices, reports, args.retained)
+        print(f"{name:<10} {cpu * 1e6:>10.1f} {cpu * per_day:>10.0f} {retained:>11.0f} {retained * per_day / 1e9:>12.2f}")
+    print("Note: the dicts pipeline only knows two receivers (top/bottom); extra receivers overwrite the bottom slot.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fix record memory/CPU comparison")
+    parser.add_argument('--receivers', type=int, default=4)
+    parser.add_argument('--rate', type=float, default=10.0, help="TPV reports per receiver per second")
+    parser.add_argument('--reports', type=int, default=20000, help="synthetic reports to time")
+    parser.add_argument('--retained', type=int, default=5000, help="fixes kept to measure retained memory")
+    main(parser.parse_args())
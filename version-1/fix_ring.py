@@ -0,0 +1,141 @@
+import array
+import math
+
+import geodesy
+
+# Fixed-size, column-oriented history of recent fixes. Each column is a typed
+# array preallocated to RING_CAPACITY entries, so memory is fixed up front:
+# 38 bytes per entry, about 1.4 MB per receiver at the default capacity.
+#
+# One writer appends; any number of readers (event loop or executor threads)
+# read without locks. The writer bumps `claimed` before touching a slot and
+# `written` after filling it, so a reader that remembers `written` from before
+# it read can call valid() afterwards to check nothing it looked at was
+# overwritten in the meantime.
+RING_CAPACITY = 36000  # One hour at 10 Hz
+COLUMNS = (
+    # name, array type, value stored for "unknown"
+    ("time", 'd', math.nan),  # Seconds since the epoch (UTC)
+    ("latitude", 'd', math.nan),
+    ("longitude", 'd', math.nan),
+    ("altitude", 'f', math.nan),
+    ("speed", 'f', math.nan),  # km/h
+    ("heading", 'f', math.nan),
+    ("satellites", 'h', -1),
+)
+FUSED = "fused"  # Ring holding the mean of all positioned receivers
+
+
+class FixRing:
+    """Ring buffer of the last `capacity` fixes of one receiver, one typed array per column."""
+
+    def __init__(self, capacity=RING_CAPACITY):
+        self.capacity = capacity
+        for name, code, unknown in COLUMNS:
+            setattr(self, name, array.array(code, [unknown]) * capacity)
+        self.claimed = 0  # Appends started
+        self.written = 0  # Appends completed
+
+    def append(self, timestamp, latitude, longitude, altitude=None, speed=None, heading=None, satellites=None):
+        slot = self.claimed % self.capacity
+        self.claimed += 1
+        self.time[slot] = timestamp
+        self.latitude[slot] = latitude
+        self.longitude[slot] = longitude
+        self.altitude[slot] = math.nan if altitude is None else altitude
+        self.speed[slot] = math.nan if speed is None else speed
+        self.heading[slot] = math.nan if heading is None else heading
+        self.satellites[slot] = -1 if satellites is None else satellites
+        self.written = self.claimed
+
+    def __len__(self):
+        return min(self.written, self.capacity)
+
+    def newest_slot(self):
+        """Slot of the most recent complete entry, or None if the ring is empty."""
+        return (self.written - 1) % self.capacity if self.written else None
+
+    def segments(self, n=None, written=None):
+        """Return the slot ranges [(start, stop)] of the newest n entries, oldest first (at most two)."""
+        written = self.written if written is None else written
+        available = min(written, self.capacity)
+        n = available if n is None else min(n, available)
+        if n <= 0:
+            return []
+        end = written % self.capacity or self.capacity
+        start = end - n
+        if start >= 0:
+            return [(start, end)]
+        return [(start + self.capacity, self.capacity), (0, end)]
+
+    def views(self, name, n=None):
+        """Zero-copy memoryviews over the newest n values of a column, oldest first, plus the write count they reflect."""
+        written = self.written
+        column = memoryview(getattr(self, name))
+        return [column[start:stop] for start, stop in self.segments(n, written)], written
+
+    def valid(self, written, n):
+        """True if the newest n entries as of `written` have not been overwritten since."""
+        return self.claimed - written + min(n, written) <= self.capacity
+
+    def values(self, name, n=None):
+        """Copy the newest n values of a column into a list, retrying if the writer laps the read."""
+        while True:
+            segments, written = self.views(name, n)
+            result = []
+            for segment in segments:
+                result.extend(segment)
+            if self.valid(written, len(result)):
+                return result
+
+    def count_since(self, timestamp):
+        """Number of newest entries with time >= timestamp (times are appended in order)."""
+        written = self.written
+        size = min(written, self.capacity)
+        low, high = 0, size  # Logical indexes, 0 = oldest
+        oldest = written - size
+        while low < high:
+            middle = (low + high) // 2
+            if self.time[(oldest + middle) % self.capacity] < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return size - low
+
+
+class FixHistory:
+    """One FixRing per receiver label plus a fused ring, created on first use."""
+
+    def __init__(self, capacity=RING_CAPACITY):
+        self.capacity = capacity
+        self.rings = {}
+
+    def ring(self, name):
+        ring = self.rings.get(name)
+        if ring is None:
+            ring = self.rings[name] = FixRing(self.capacity)
+        return ring
+
+    def append_fix(self, gps_data, timestamp):
+        """Append each positioned receiver of a fix dict, and the fused position, to their rings.
+
+        A receiver whose position is unchanged since its last entry (the fix was
+        re-emitted for another receiver's or a SKY report) is not appended again.
+        """
+        heading = gps_data.get("heading")
+        for gps in gps_data.get("gps_data", []):
+            lat = gps.get("latitude")
+            lon = gps.get("longitude")
+            if not isinstance(lat, (int, float)) or not isinstance(lon, (int, float)):
+                continue
+            ring = self.ring(gps.get("gps"))
+            slot = ring.newest_slot()
+            if slot is not None and ring.latitude[slot] == lat and ring.longitude[slot] == lon:
+                continue
+            ring.append(timestamp, lat, lon, gps.get("altitude"), gps.get("speed"), heading, gps.get("satellites"))
+        fused = geodesy.receiver_position(gps_data, FUSED)
+        if fused is not None:
+            ring = self.ring(FUSED)
+            slot = ring.newest_slot()
+            if slot is None or ring.latitude[slot] != fused[0] or ring.longitude[slot] != fused[1]:
+                ring.append(timestamp, fused[0], fused[1], speed=fused[2], heading=heading)
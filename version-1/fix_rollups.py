@@ -0,0 +1,307 @@
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+
+import fix_ring
+import geodesy
+
+logger = logging.getLogger(__name__)
+
+# Per-minute and per-hour aggregates of the ingested fixes, per receiver label
+# and for the fused position, so long-range queries read summary rows instead
+# of every fix. Minute buckets are filled from fixes as they arrive; when a
+# minute closes its row is written and folded into the open hour bucket,
+# whose row is written when the hour closes. Rows go to
+# <directory>/<level>-YYYYMMDD.jsonl, one file per level and UTC day.
+#
+# A row holds sums and counts as well as the derived means, so rows for the
+# same receiver and period are merged by readers: close() writes the buckets
+# still filling, and after a restart the rest of the period gets a row of its
+# own. Each row also holds the epoch seconds of its first and last fix, so on
+# startup the minute rows of the last two days that no hour row spans (the
+# minutes a crash kept from reaching the 1h level, even in an hour that already
+# has a row from before a restart) are rebuilt into hour rows. Distance is the sum of
+# the steps between consecutive fixes of the receiver, including the step into
+# the period; the bounding box is (south, west, north, east) and does not wrap
+# the antimeridian.
+ROLLUP_LEVELS = (("1m", 60), ("1h", 3600))  # (name, seconds); each level folds into the next
+ROLLUP_NAMES = tuple(name for name, _ in ROLLUP_LEVELS)
+ROLLUP_SUFFIX = '.jsonl'
+SUM_FIELDS = ("count", "lat_sum", "lon_sum", "speed_sum", "speed_count", "satellites_sum", "satellites_count",
+              "distance_m")
+MIN_FIELDS = ("south", "west", "speed_min", "satellites_min", "first")
+MAX_FIELDS = ("north", "east", "speed_max", "satellites_max", "last")
+
+
+def period_time(start):
+    """Bucket start in epoch seconds as a fix-style timestamp ("YYYY-MM-DD HH:MM:SS", UTC)."""
+    return datetime.fromtimestamp(start, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+class RollupBucket:
+    """Aggregate of one receiver's fixes over one period."""
+    __slots__ = ('receiver', 'start', 'seconds') + SUM_FIELDS + MIN_FIELDS + MAX_FIELDS
+
+    def __init__(self, receiver, start, seconds):
+        self.receiver = receiver
+        self.start = start  # Epoch seconds, a multiple of seconds
+        self.seconds = seconds
+        for name in SUM_FIELDS:
+            setattr(self, name, 0)
+        for name in MIN_FIELDS + MAX_FIELDS:
+            setattr(self, name, None)
+
+    def add(self, timestamp, latitude, longitude, speed, satellites, distance_m):
+        self.count += 1
+        self.first = timestamp if self.first is None else min(self.first, timestamp)
+        self.last = timestamp if self.last is None else max(self.last, timestamp)
+        self.lat_sum += latitude
+        self.lon_sum += longitude
+        self.distance_m += distance_m
+        if self.south is None:
+            self.south = self.north = latitude
+            self.west = self.east = longitude
+        else:
+            self.south = min(self.south, latitude)
+            self.north = max(self.north, latitude)
+            self.west = min(self.west, longitude)
+            self.east = max(self.east, longitude)
+        if isinstance(speed, (int, float)):
+            self.speed_count += 1
+            self.speed_sum += speed
+            self.speed_min = speed if self.speed_min is None else min(self.speed_min, speed)
+            self.speed_max = speed if self.speed_max is None else max(self.speed_max, speed)
+        if isinstance(satellites, int):
+            self.satellites_count += 1
+            self.satellites_sum += satellites
+            self.satellites_min = satellites if self.satellites_min is None else min(self.satellites_min, satellites)
+            self.satellites_max = satellites if self.satellites_max is None else max(self.satellites_max, satellites)
+
+    def merge(self, other):
+        """Fold another bucket or row of the same receiver into this one."""
+        get = other.get if isinstance(other, dict) else lambda name: getattr(other, name)
+        for name in SUM_FIELDS:
+            setattr(self, name, getattr(self, name) + (get(name) or 0))
+        for names, pick in ((MIN_FIELDS, min), (MAX_FIELDS, max)):
+            for name in names:
+                mine = getattr(self, name)
+                theirs = get(name)
+                if theirs is not None:
+                    setattr(self, name, theirs if mine is None else pick(mine, theirs))
+
+    def to_dict(self):
+        row = {"receiver": self.receiver, "time": period_time(self.start), "start": self.start,
+               "seconds": self.seconds}
+        for name in SUM_FIELDS + MIN_FIELDS + MAX_FIELDS:
+            row[name] = getattr(self, name)
+        row["distance_m"] = round(self.distance_m, 1)
+        row["latitude"] = round(self.lat_sum / self.count, 7) if self.count else None
+        row["longitude"] = round(self.lon_sum / self.count, 7) if self.count else None
+        row["speed"] = round(self.speed_sum / self.speed_count, 2) if self.speed_count else None
+        row["satellites"] = round(self.satellites_sum / self.satellites_count, 1) if self.satellites_count else None
+        return row
+
+    @classmethod
+    def from_dict(cls, row):
+        bucket = cls(row["receiver"], row["start"], row["seconds"])
+        bucket.merge(row)
+        return bucket
+
+
+class RollupStore:
+    """Open buckets per level and receiver, with the writers of their day files."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.open = [{} for _ in ROLLUP_LEVELS]  # Per level: receiver -> RollupBucket
+        self.files = {}  # level name -> (day, file)
+        self.last_position = {}  # receiver -> (lat, lon) of its previous fix
+        os.makedirs(directory, exist_ok=True)
+        self._backfill()
+
+    def path(self, level, day):
+        return os.path.join(self.directory, f"{level}-{day}{ROLLUP_SUFFIX}")
+
+    def _write(self, level, bucket):
+        day = datetime.fromtimestamp(bucket.start, timezone.utc).strftime('%Y%m%d')
+        try:
+            current = self.files.get(level)
+            if current is None or current[0] != day:
+                if current is not None:
+                    current[1].close()
+                current = self.files[level] = (day, open(self.path(level, day), 'a', buffering=1))
+            current[1].write(json.dumps(bucket.to_dict(), separators=(',', ':')) + '\n')
+        except Exception as e:
+            logger.error(f"Failed to write {level} rollup: {e}")
+
+    def _close_bucket(self, index, bucket):
+        """Write a finished bucket and fold it into the next level's open bucket."""
+        name, _ = ROLLUP_LEVELS[index]
+        self._write(name, bucket)
+        if index + 1 < len(ROLLUP_LEVELS):
+            self._bucket(index + 1, bucket.receiver, bucket.start).merge(bucket)
+
+    def _bucket(self, index, receiver, timestamp):
+        """The open bucket of a level for the period containing timestamp, closing the previous one."""
+        _, seconds = ROLLUP_LEVELS[index]
+        start = int(timestamp // seconds * seconds)
+        bucket = self.open[index].get(receiver)
+        if bucket is not None and bucket.start == start:
+            return bucket
+        if bucket is not None:
+            self._close_bucket(index, bucket)
+        bucket = self.open[index][receiver] = RollupBucket(receiver, start, seconds)
+        return bucket
+
+    def _backfill(self):
+        """Write the upper-level rows a crash left out, from the finer rows of yesterday and today.
+
+        A period whose finer rows count more fixes than its rows at this level is
+        missing some; the finer rows outside the [first, last] span of every row
+        at this level are merged into a new row for it.
+        """
+        now = time.time()
+        days = sorted({datetime.fromtimestamp(now - offset, timezone.utc).strftime('%Y%m%d') for offset in (86400, 0)})
+        for index in range(1, len(ROLLUP_LEVELS)):
+            name, seconds = ROLLUP_LEVELS[index]
+            finer, _ = ROLLUP_LEVELS[index - 1]
+            for day in days:
+                written = {}  # (start, receiver) -> rows of this level
+                for row in read_rows(self.path(name, day)):
+                    written.setdefault((row.get("start"), row.get("receiver")), []).append(row)
+                pending = {}  # (start, receiver) -> finer rows
+                for row in read_rows(self.path(finer, day)):
+                    pending.setdefault((row["start"] // seconds * seconds, row["receiver"]), []).append(row)
+                missing = {}
+                for key, rows in pending.items():
+                    rows_here = written.get(key, [])
+                    if sum(row.get("count") or 0 for row in rows) <= sum(row.get("count") or 0 for row in rows_here):
+                        continue
+                    if any(row.get("first") is None for row in rows_here):
+                        continue  # Written before rows had spans; its coverage is unknown
+                    for row in rows:
+                        if row.get("first") is not None and any(
+                                done["first"] <= row["first"] and row["last"] <= done["last"] for done in rows_here):
+                            continue
+                        bucket = missing.get(key)
+                        if bucket is None:
+                            bucket = missing[key] = RollupBucket(key[1], key[0], seconds)
+                        bucket.merge(row)
+                for key in sorted(missing, key=lambda key: (key[0], str(key[1]))):
+                    self._write(name, missing[key])
+                if missing:
+                    logger.info(f"Rebuilt {len(missing)} {name} rollups for {day} from {finer} rows")
+
+    def add(self, receiver, timestamp, latitude, longitude, speed=None, satellites=None):
+        """Count one fix of a receiver at timestamp (epoch seconds)."""
+        previous = self.last_position.get(receiver)
+        distance = geodesy.haversine_m(previous[0], previous[1], latitude, longitude) if previous else 0.0
+        self.last_position[receiver] = (latitude, longitude)
+        self._bucket(0, receiver, timestamp).add(timestamp, latitude, longitude, speed, satellites, distance)
+
+    def add_fix(self, gps_data, timestamp):
+        """Count each positioned receiver of a fix dict, and the fused position.
+
+        Like fix_ring.FixHistory, a receiver whose position is unchanged since its
+        previous fix (the fix was re-emitted for another receiver) is not counted again.
+        """
+        for gps in gps_data.get("gps_data", []):
+            lat = gps.get("latitude")
+            lon = gps.get("longitude")
+            if not isinstance(lat, (int, float)) or not isinstance(lon, (int, float)):
+                continue
+            label = gps.get("gps")
+            if self.last_position.get(label) == (lat, lon):
+                continue
+            self.add(label, timestamp, lat, lon, gps.get("speed"), gps.get("satellites"))
+        fused = geodesy.receiver_position(gps_data, fix_ring.FUSED)
+        if fused is not None and self.last_position.get(fix_ring.FUSED) != fused[:2]:
+            self.add(fix_ring.FUSED, timestamp, fused[0], fused[1], fused[2])
+
+    def open_rows(self, level, receiver=None, start=None, end=None):
+        """Rows for the buckets of a level that are still filling, filtered like read_rollups()."""
+        index = ROLLUP_NAMES.index(level)
+        _, seconds = ROLLUP_LEVELS[index]
+        merged = {}
+        for bucket in self.open[index].values():
+            if receiver is None or bucket.receiver == receiver:
+                merged[(bucket.start, bucket.receiver)] = copy = RollupBucket(bucket.receiver, bucket.start, seconds)
+                copy.merge(bucket)
+        if index > 0:
+            # Fixes in the open finer buckets reach this level only when those close.
+            for row in self.open_rows(ROLLUP_NAMES[index - 1], receiver):
+                key = (row["start"] // seconds * seconds, row["receiver"])
+                bucket = merged.get(key)
+                if bucket is None:
+                    bucket = merged[key] = RollupBucket(key[1], key[0], seconds)
+                bucket.merge(row)
+        rows = [bucket.to_dict() for bucket in merged.values()]
+        return [row for row in rows if (receiver is None or row["receiver"] == receiver)
+                and (start is None or row["start"] >= start) and (end is None or row["start"] < end)]
+
+    def close(self):
+        """Write the buckets still filling (readers merge them with the rest of their period) and close the files."""
+        for index in range(len(ROLLUP_LEVELS)):
+            buckets, self.open[index] = self.open[index], {}
+            for bucket in buckets.values():
+                self._close_bucket(index, bucket)
+        for _, file in self.files.values():
+            file.close()
+        self.files = {}
+
+
+def read_rows(path):
+    """Rows of one rollup file; a missing file or a torn last line is skipped."""
+    rows = []
+    try:
+        with open(path, 'rb') as f:
+            for line in f:
+                try:
+                    rows.append(json.loads(line))
+                except ValueError:
+                    continue
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.error(f"Cannot read rollups {path}: {e}")
+    return rows
+
+
+def merge_rows(rows):
+    """Merge rows of the same receiver and period; returns them ordered by period start, then receiver."""
+    merged = {}
+    for row in rows:
+        key = (row["start"], row["receiver"])
+        bucket = merged.get(key)
+        if bucket is None:
+            merged[key] = RollupBucket.from_dict(row)
+        else:
+            bucket.merge(row)
+    return [merged[key].to_dict() for key in sorted(merged, key=lambda key: (key[0], str(key[1])))]
+
+
+def read_rollups(directory, level, receiver=None, start=None, end=None):
+    """Written rows of a level from the day files, filtered by receiver and start <= period start < end."""
+    prefix = f"{level}-"
+    start_day = datetime.fromtimestamp(start, timezone.utc).strftime('%Y%m%d') if start is not None else None
+    end_day = datetime.fromtimestamp(end, timezone.utc).strftime('%Y%m%d') if end is not None else None
+    try:
+        names = sorted(os.listdir(directory))
+    except FileNotFoundError:
+        return []
+    rows = []
+    for name in names:
+        if not (name.startswith(prefix) and name.endswith(ROLLUP_SUFFIX)):
+            continue
+        day = name[len(prefix):-len(ROLLUP_SUFFIX)]
+        if (start_day and day < start_day) or (end_day and day > end_day):
+            continue
+        for row in read_rows(os.path.join(directory, name)):
+            if receiver is not None and row.get("receiver") != receiver:
+                continue
+            if (start is not None and row["start"] < start) or (end is not None and row["start"] >= end):
+                continue
+            rows.append(row)
+    return rows
@@ -0,0 +1,157 @@
+import asyncio
+import json
+import logging
+import math
+import os
+import struct
+
+logger = logging.getLogger(__name__)
+
+# Local pub/sub between fleet hub worker processes. Every worker listens on a
+# Unix socket and keeps one outgoing connection to each peer. Changed ships
+# are published as (ship_id, lat, lon, encoded JSON) records, so peers can
+# store and route them without parsing. A freshly (re)connected link first carries a full snapshot, which
+# lets a restarted worker catch up. Conflicting versions of a ship are
+# resolved last-writer-wins.
+#
+# Geofences are evaluated by one worker only, the fence owner, so event
+# sequence numbers are the same on every worker. It publishes its events as
+# JSON frames; on connect it also sends its retained events and which ships
+# are inside which fences.
+BUS_DIR = '/tmp'
+SYNC_INTERVAL = 0.1  # Seconds between publishing batches to peers
+RECONNECT_DELAY = 0.5
+FRAME_HEADER = struct.Struct('!I')
+FRAME_KIND = struct.Struct('!B')  # First byte of every frame payload
+KIND_SHIPS = 0
+KIND_FENCES = 1
+POSITION = struct.Struct('!dd')  # NaN when the ship has no position
+
+
+def socket_path(port, index):
+    return os.path.join(BUS_DIR, f'fleet_hub_{port}_{index}.sock')
+
+
+def encode_records(records):
+    """Pack (ship_id, lat, lon, encoded) records into one length-prefixed frame."""
+    parts = []
+    for ship_id, lat, lon, encoded in records:
+        key = ship_id.encode('utf-8')
+        value = encoded.encode('utf-8')
+        position = POSITION.pack(math.nan if lat is None else lat, math.nan if lon is None else lon)
+        parts.append(FRAME_HEADER.pack(len(key)) + key + position + FRAME_HEADER.pack(len(value)) + value)
+    payload = FRAME_KIND.pack(KIND_SHIPS) + b''.join(parts)
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+
+def encode_fence_state(state):
+    """Pack a geofence state dict ({"events": [...]}, plus "inside" in a snapshot) into one frame."""
+    payload = FRAME_KIND.pack(KIND_FENCES) + json.dumps(state, separators=(',', ':')).encode('utf-8')
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+
+def decode_records(payload, pos=FRAME_KIND.size):
+    while pos < len(payload):
+        (key_len,) = FRAME_HEADER.unpack_from(payload, pos)
+        pos += FRAME_HEADER.size
+        ship_id = payload[pos:pos + key_len].decode('utf-8')
+        pos += key_len
+        lat, lon = POSITION.unpack_from(payload, pos)
+        pos += POSITION.size
+        (value_len,) = FRAME_HEADER.unpack_from(payload, pos)
+        pos += FRAME_HEADER.size
+        encoded = payload[pos:pos + value_len].decode('utf-8')
+        pos += value_len
+        yield ship_id, None if math.isnan(lat) else lat, None if math.isnan(lon) else lon, encoded
+
+
+class PeerBus:
+    """Share changed ship records between hub workers on the same host."""
+
+    def __init__(self, port, index, workers, apply_update, snapshot, apply_fences=None, fence_snapshot=None):
+        self.port = port
+        self.index = index
+        self.workers = workers
+        self.apply_update = apply_update
+        self.snapshot = snapshot
+        self.apply_fences = apply_fences  # Called with each geofence state frame from the fence owner
+        self.fence_snapshot = fence_snapshot  # Set on the fence owner only
+        self.pending = {}  # ship_id -> (lat, lon, encoded), local changes not yet published
+        self.pending_events = []  # Geofence events not yet published (fence owner only)
+        self.writers = {}  # peer index -> StreamWriter
+        self.server = None
+
+    async def start(self):
+        path = socket_path(self.port, self.index)
+        if os.path.exists(path):
+            os.unlink(path)
+        self.server = await asyncio.start_unix_server(self._handle_peer, path)
+        for peer in range(self.workers):
+            if peer != self.index:
+                asyncio.create_task(self._connect(peer))
+        logger.info(f"Worker {self.index} bus listening on {path}")
+
+    def publish(self, ship_id, lat, lon, encoded):
+        self.pending[ship_id] = (lat, lon, encoded)
+
+    def publish_events(self, events):
+        self.pending_events.extend(events)
+
+    async def _connect(self, peer):
+        path = socket_path(self.port, peer)
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(path)
+            except OSError:
+                await asyncio.sleep(RECONNECT_DELAY)
+                continue
+            writer.write(encode_records(self.snapshot()))
+            if self.fence_snapshot:
+                writer.write(encode_fence_state(self.fence_snapshot()))
+            self.writers[peer] = writer
+            logger.info(f"Worker {self.index} connected to peer {peer}")
+            # Peers never write back; EOF means the peer went away.
+            await reader.read()
+            self.writers.pop(peer, None)
+            writer.close()
+            logger.warning(f"Worker {self.index} lost peer {peer}")
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    async def _handle_peer(self, reader, writer):
+        try:
+            while True:
+                header = await reader.readexactly(FRAME_HEADER.size)
+                (length,) = FRAME_HEADER.unpack(header)
+                payload = await reader.readexactly(length)
+                if payload[0] == KIND_FENCES:
+                    if self.apply_fences:
+                        self.apply_fences(json.loads(payload[FRAME_KIND.size:]))
+                    continue
+                for record in decode_records(payload):
+                    self.apply_update(*record)
+        except asyncio.IncompleteReadError:
+            pass
+        finally:
+            writer.close()
+
+    async def run(self):
+        """Publish pending local changes to every connected peer."""
+        while True:
+            await asyncio.sleep(SYNC_INTERVAL)
+            if not self.pending and not self.pending_events:
+                continue
+            frame = b''
+            if self.pending:
+                frame = encode_records((ship_id, *update) for ship_id, update in self.pending.items())
+                self.pending.clear()
+            if self.pending_events:
+                frame += encode_fence_state({"events": self.pending_events})
+                self.pending_events = []
+            for peer, writer in list(self.writers.items()):
+                try:
+                    writer.write(frame)
+                    await writer.drain()
+                except (ConnectionError, OSError) as e:
+                    logger.error(f"Worker {self.index} failed to publish to peer {peer}: {e}")
+                    self.writers.pop(peer, None)
+                    writer.close()
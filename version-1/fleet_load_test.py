@@ -0,0 +1,125 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import datetime, timezone
+
+import websockets
+
+# Load generator for ws_server.py: simulated ships push batched fixes over a
+# few uplink connections while viewers receive shipsUpdate packets. Run it
+# from another machine (or other cores) so it does not compete with the hub.
+
+BASE_LAT = 16.8167
+BASE_LON = 96.1927
+SAMPLED_VIEWERS = 10  # Viewers that fully parse packets to measure latency
+
+
+def make_fix(ship_id, lat, lon):
+    return {
+        "timestamp": datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S.%f'),
+        "ship_id": ship_id,
+        "device_id": f"dev-{ship_id}",
+        "heading": round(random.uniform(0, 360), 1),
+        "gps_data": [
+            {"gps": "top_gps", "latitude": lat, "longitude": lon, "altitude": 5.0,
+             "speed": round(random.uniform(0, 20), 2), "satellites": 12,
+             "satellite_prns": ["6", "9", "11", "12", "14", "17", "19", "20", "22", "65", "72", "88"]},
+            {"gps": "bottom_gps", "latitude": lat + 0.00001, "longitude": lon, "altitude": 6.0,
+             "speed": round(random.uniform(0, 20), 2), "satellites": 8,
+             "satellite_prns": ["6", "9", "11", "14", "17", "19", "22", "88"]}
+        ]
+    }
+
+
+async def run_uplink(url, ship_ids, rate, stop_at, counters):
+    """Send one batch per tick containing a fix for each ship on this connection."""
+    positions = {ship_id: [BASE_LAT + random.uniform(-5, 5), BASE_LON + random.uniform(-5, 5)] for ship_id in ship_ids}
+    async with websockets.connect(url, max_size=None) as websocket:
+        await websocket.send(json.dumps({"type": "hello", "encodings": ["json"], "batch": True}))
+        interval = 1.0 / rate
+        next_tick = time.monotonic()
+        while time.monotonic() < stop_at:
+            fixes = []
+            for ship_id, position in positions.items():
+                position[0] += random.uniform(-0.0005, 0.0005)
+                position[1] += random.uniform(-0.0005, 0.0005)
+                fixes.append(make_fix(ship_id, position[0], position[1]))
+            await websocket.send(json.dumps({"type": "batch", "fixes": fixes}))
+            counters["sent"] += len(fixes)
+            next_tick += interval
+            await asyncio.sleep(max(0.0, next_tick - time.monotonic()))
+
+
+async def run_viewer(url, index, stop_at, counters, latencies):
+    async with websockets.connect(url, max_size=None) as websocket:
+        await websocket.send(json.dumps({"type": "subscribe"}))  # Connections are viewers once they subscribe
+        while True:
+            remaining = stop_at - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                message = await asyncio.wait_for(websocket.recv(), remaining)
+            except asyncio.TimeoutError:
+                return
+            counters["packets"] += 1
+            counters["bytes"] += len(message)
+            if index >= SAMPLED_VIEWERS:
+                continue
+            packet = json.loads(message)
+            if packet.get("type") != "shipsUpdate" or packet.get("full"):
+                continue
+            now = time.time()
+            counters["ship_updates"] += len(packet["ships"])
+            for ship in packet["ships"][:100]:
+                sent = datetime.strptime(ship["timestamp"], '%Y-%m-%d %H:%M:%S.%f').replace(tzinfo=timezone.utc)
+                latencies.append(now - sent.timestamp())
+
+
+async def run_load(url, ships, uplinks, viewers, rate, duration, ship_offset=0):
+    """Drive the hub for duration seconds and return the measured counters."""
+    counters = {"sent": 0, "packets": 0, "bytes": 0, "ship_updates": 0}
+    latencies = []
+    stop_at = time.monotonic() + duration
+    viewer_tasks = [run_viewer(url, i, stop_at, counters, latencies) for i in range(viewers)]
+    ship_ids = [f"SHIP{i:05d}" for i in range(ship_offset, ship_offset + ships)]
+    per_uplink = max(1, len(ship_ids) // max(uplinks, 1))
+    uplink_tasks = [run_uplink(url, ship_ids[i:i + per_uplink], rate, stop_at, counters)
+                    for i in range(0, len(ship_ids), per_uplink)]
+    started = time.monotonic()
+    results = await asyncio.gather(*viewer_tasks, *uplink_tasks, return_exceptions=True)
+    counters["elapsed"] = time.monotonic() - started
+    counters["errors"] = [repr(r) for r in results if isinstance(r, Exception)]
+    counters["latencies"] = sorted(latencies)
+    return counters
+
+
+async def main(args):
+    counters = await run_load(args.url, args.ships, args.uplinks, args.viewers, args.rate, args.duration)
+    elapsed = counters["elapsed"]
+    errors = counters["errors"]
+    latencies = counters["latencies"]
+    print(f"Duration: {elapsed:.1f} s, connection errors: {len(errors)}")
+    if errors:
+        print(f"  first error: {errors[0]}")
+    print(f"Fixes sent: {counters['sent']} ({counters['sent'] / elapsed:.0f}/s)")
+    print(f"Viewer packets: {counters['packets']} ({counters['packets'] / elapsed:.0f}/s, "
+          f"{counters['bytes'] / max(counters['packets'], 1) / 1024:.1f} KiB avg)")
+    sampled = min(args.viewers, SAMPLED_VIEWERS)
+    if sampled:
+        print(f"Ship updates per sampled viewer: {counters['ship_updates'] / sampled / elapsed:.0f}/s")
+    if latencies:
+        print(f"Fix-to-viewer latency: p50 {latencies[len(latencies) // 2] * 1000:.0f} ms, "
+              f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fleet hub load test")
+    parser.add_argument('--url', default="ws://127.0.0.1:8765")
+    parser.add_argument('--ships', type=int, default=10000)
+    parser.add_argument('--uplinks', type=int, default=100, help="connections the ships are spread over")
+    parser.add_argument('--viewers', type=int, default=1000)
+    parser.add_argument('--rate', type=float, default=1.0, help="fixes per ship per second")
+    parser.add_argument('--duration', type=float, default=30.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,115 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import fleet_load_test
+
+# Scaling benchmark for the sharded fleet hub: start ws_server.py with 1, 2,
+# 4, ... workers and drive each configuration with the same offered load from
+# several load generator processes. With enough cores, fixes/s and viewer
+# packets/s should grow close to linearly with the worker count until the
+# offered load is absorbed. Pin the hub to its own cores (--hub-cpus) so the
+# generators do not steal from it; on a single-core machine nothing will scale.
+
+HUB_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ws_server.py')
+STARTUP_TIMEOUT = 10
+
+
+def wait_for_port(port, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+
+def start_hub(port, workers, cpus):
+    def pin():
+        if cpus:
+            os.sched_setaffinity(0, cpus)
+    return subprocess.Popen([sys.executable, HUB_SCRIPT, '--port', str(port), '--workers', str(workers)],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, preexec_fn=pin)
+
+
+def run_generator(args, index, results):
+    """One load generator process; its share of ships and viewers is disjoint from the others'."""
+    if args.gen_cpus:
+        os.sched_setaffinity(0, args.gen_cpus)
+    ships = args.ships // args.generators
+    counters = asyncio.run(fleet_load_test.run_load(
+        f"ws://127.0.0.1:{args.port}", ships, max(1, args.uplinks // args.generators),
+        args.viewers // args.generators, args.rate, args.duration, ship_offset=index * ships))
+    results.put(counters)
+
+
+def run_configuration(args, workers):
+    hub = start_hub(args.port, workers, args.hub_cpus)
+    try:
+        if not wait_for_port(args.port, STARTUP_TIMEOUT):
+            raise RuntimeError(f"hub with {workers} workers did not start")
+        time.sleep(1)  # let the peer bus connect
+        results = multiprocessing.Queue()
+        generators = [multiprocessing.Process(target=run_generator, args=(args, i, results))
+                      for i in range(args.generators)]
+        for generator in generators:
+            generator.start()
+        totals = {"sent": 0, "packets": 0, "ship_updates": 0, "errors": 0, "latencies": []}
+        elapsed = args.duration
+        for _ in generators:
+            counters = results.get()
+            elapsed = max(elapsed, counters["elapsed"])
+            for key in ("sent", "packets", "ship_updates"):
+                totals[key] += counters[key]
+            totals["errors"] += len(counters["errors"])
+            totals["latencies"].extend(counters["latencies"])
+        for generator in generators:
+            generator.join()
+        totals["elapsed"] = elapsed
+        return totals
+    finally:
+        hub.terminate()
+        hub.wait()
+
+
+def main(args):
+    print(f"{args.ships} ships at {args.rate}/s, {args.viewers} viewers, {args.generators} generators, "
+          f"{args.duration:.0f} s per run, {os.cpu_count()} CPUs")
+    print(f"{'workers':>7} {'fixes/s':>10} {'packets/s':>10} {'speedup':>8} {'p50 ms':>7} {'p99 ms':>7} {'errors':>6}")
+    baseline = None
+    for workers in args.workers:
+        totals = run_configuration(args, workers)
+        fixes_per_s = totals["sent"] / totals["elapsed"]
+        packets_per_s = totals["packets"] / totals["elapsed"]
+        baseline = baseline or packets_per_s or 1
+        latencies = sorted(totals["latencies"])
+        p50 = latencies[len(latencies) // 2] * 1000 if latencies else float('nan')
+        p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else float('nan')
+        print(f"{workers:>7} {fixes_per_s:>10.0f} {packets_per_s:>10.0f} {packets_per_s / baseline:>7.2f}x "
+              f"{p50:>7.0f} {p99:>7.0f} {totals['errors']:>6}")
+
+
+def cpu_list(text):
+    return {int(cpu) for cpu in text.split(',') if cpu}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fleet hub multi-worker scaling benchmark")
+    parser.add_argument('--port', type=int, default=8799)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--ships', type=int, default=10000)
+    parser.add_argument('--uplinks', type=int, default=100)
+    parser.add_argument('--viewers', type=int, default=1000)
+    parser.add_argument('--rate', type=float, default=1.0)
+    parser.add_argument('--duration', type=float, default=20.0)
+    parser.add_argument('--generators', type=int, default=4, help="load generator processes")
+    parser.add_argument('--hub-cpus', type=cpu_list, default=None, help="comma-separated CPUs for the hub, e.g. 0,1,2,3")
+    parser.add_argument('--gen-cpus', type=cpu_list, default=None, help="comma-separated CPUs for the generators")
+    main(parser.parse_args())
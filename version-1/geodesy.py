@@ -0,0 +1,57 @@
+import math
+
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_NM = 1852.0
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Great-circle distance in meters between two lat/lon points in degrees."""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def heading_delta(a, b):
+    """Smallest absolute difference between two headings in degrees."""
+    diff = abs(a - b) % 360
+    return 360 - diff if diff > 180 else diff
+
+
+def primary_position(gps_data):
+    """Return (lat, lon, speed, receiver) from the fix's "primary" receiver, else the first one with a position."""
+    receivers = gps_data.get("gps_data", [])
+    primary = gps_data.get("primary")
+    if primary is not None:
+        receivers = sorted(receivers, key=lambda gps: gps.get("gps") != primary)
+    for gps in receivers:
+        lat = gps.get("latitude")
+        lon = gps.get("longitude")
+        if isinstance(lat, (int, float)) and isinstance(lon, (int, float)):
+            return lat, lon, gps.get("speed"), gps.get("gps")
+    return None
+
+
+def receiver_position(gps_data, receiver):
+    """Return (lat, lon, speed) for one receiver label, or the mean of all positioned receivers if receiver is 'fused'."""
+    lat_sum = lon_sum = speed_sum = 0.0
+    count = speed_count = 0
+    for gps in gps_data.get("gps_data", []):
+        if receiver != "fused" and gps.get("gps") != receiver:
+            continue
+        lat = gps.get("latitude")
+        lon = gps.get("longitude")
+        if not isinstance(lat, (int, float)) or not isinstance(lon, (int, float)):
+            continue
+        lat_sum += lat
+        lon_sum += lon
+        count += 1
+        speed = gps.get("speed")
+        if isinstance(speed, (int, float)):
+            speed_sum += speed
+            speed_count += 1
+    if not count:
+        return None
+    return lat_sum / count, lon_sum / count, speed_sum / speed_count if speed_count else None
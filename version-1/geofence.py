@@ -0,0 +1,227 @@
+import collections
+import json
+import logging
+import math
+
+import geodesy
+import spatial_index
+
+logger = logging.getLogger(__name__)
+
+# Fences are loaded from a JSON list such as
+#   [{"id": "yangon-port", "name": "Yangon port", "type": "polygon",
+#     "points": [[16.77, 96.15], [16.77, 96.25], [16.70, 96.25], [16.70, 96.15]]},
+#    {"id": "anchorage-3", "type": "circle", "center": [16.60, 96.30], "radius_m": 500,
+#     "dwell_seconds": 600}]
+# Points are [lat, lon]. A dwell event fires once a ship has stayed inside a
+# fence for dwell_seconds (default DEFAULT_DWELL_SECONDS, 0 disables it).
+FENCE_CELL_DEG = 0.1
+DEFAULT_DWELL_SECONDS = 0
+EVENT_HISTORY = 10000  # Events kept for HTTP polling
+
+
+class Fence:
+    __slots__ = ('fence_id', 'name', 'kind', 'bbox', 'points', 'center', 'radius_m', 'dwell_seconds')
+
+    def __init__(self, fence_id, name, kind, bbox, points=None, center=None, radius_m=None,
+                 dwell_seconds=DEFAULT_DWELL_SECONDS):
+        self.fence_id = fence_id
+        self.name = name
+        self.kind = kind
+        self.bbox = bbox
+        self.points = points
+        self.center = center
+        self.radius_m = radius_m
+        self.dwell_seconds = dwell_seconds
+
+    def contains(self, lat, lon):
+        if self.kind == "circle":
+            return geodesy.haversine_m(self.center[0], self.center[1], lat, lon) <= self.radius_m
+        return point_in_polygon(self.points, lat, lon)
+
+    def to_dict(self):
+        data = {"id": self.fence_id, "name": self.name, "type": self.kind, "dwell_seconds": self.dwell_seconds}
+        if self.kind == "circle":
+            data["center"] = list(self.center)
+            data["radius_m"] = self.radius_m
+        else:
+            data["points"] = [list(point) for point in self.points]
+        return data
+
+
+def point_in_polygon(points, lat, lon):
+    """Ray-casting test on the lat/lon plane; points is a list of (lat, lon) without the closing vertex."""
+    inside = False
+    j = len(points) - 1
+    for i in range(len(points)):
+        lat_i, lon_i = points[i]
+        lat_j, lon_j = points[j]
+        if (lat_i > lat) != (lat_j > lat):
+            if lon < (lon_j - lon_i) * (lat - lat_i) / (lat_j - lat_i) + lon_i:
+                inside = not inside
+        j = i
+    return inside
+
+
+def parse_fence(data):
+    """Build a Fence from its JSON definition, raising ValueError if it is malformed."""
+    fence_id = data.get("id")
+    if not fence_id:
+        raise ValueError("fence needs an id")
+    fence_id = str(fence_id)
+    kind = data.get("type")
+    dwell_seconds = float(data.get("dwell_seconds", DEFAULT_DWELL_SECONDS))
+    name = data.get("name") or fence_id
+    if kind == "circle":
+        lat, lon = (float(value) for value in data["center"])
+        radius_m = float(data["radius_m"])
+        if radius_m <= 0:
+            raise ValueError(f"fence {fence_id}: radius_m must be positive")
+        dlat = math.degrees(radius_m / geodesy.EARTH_RADIUS_M)
+        dlon = min(180.0, dlat / max(math.cos(math.radians(min(89.9, abs(lat) + dlat))), 1e-6))
+        west, east = lon - dlon, lon + dlon
+        if dlon >= 180.0:
+            west, east = -180.0, 180.0
+        elif west < -180.0:
+            west += 360.0  # Crosses the antimeridian: a wrapped box with west > east
+        elif east > 180.0:
+            east -= 360.0
+        bbox = (max(-90.0, lat - dlat), west, min(90.0, lat + dlat), east)
+        return Fence(fence_id, name, kind, bbox, center=(lat, lon), radius_m=radius_m, dwell_seconds=dwell_seconds)
+    if kind == "polygon":
+        points = [(float(lat), float(lon)) for lat, lon in data["points"]]
+        if len(points) > 1 and points[0] == points[-1]:
+            points.pop()
+        if len(points) < 3:
+            raise ValueError(f"fence {fence_id}: a polygon needs at least 3 points")
+        lats = [point[0] for point in points]
+        lons = [point[1] for point in points]
+        bbox = (min(lats), min(lons), max(lats), max(lons))
+        return Fence(fence_id, name, kind, bbox, points=points, dwell_seconds=dwell_seconds)
+    raise ValueError(f"fence {fence_id}: unknown type {kind!r}")
+
+
+class GeofenceEngine:
+    """Track which fences each ship is inside and report enter, exit and dwell events."""
+
+    def __init__(self):
+        self.fences = {}  # fence_id -> Fence
+        self.index = spatial_index.BoxIndex(FENCE_CELL_DEG)
+        self.inside = {}  # ship_id -> {fence_id: [entered_at, dwell_reported]}
+        self.events = collections.deque(maxlen=EVENT_HISTORY)
+        self.seq = 0
+
+    def load(self, path):
+        """Replace the fence set from a JSON file, keeping state for fences that still exist."""
+        with open(path, 'r') as f:
+            definitions = json.load(f)
+        fences = {}
+        for definition in definitions:
+            try:
+                fence = parse_fence(definition)
+                fences[fence.fence_id] = fence
+            except (KeyError, TypeError, ValueError) as e:
+                logger.error(f"Skipping geofence {definition.get('id') if isinstance(definition, dict) else definition}: {e}")
+        self.set_fences(fences.values())
+        logger.info(f"Loaded {len(fences)} geofences from {path}")
+
+    def set_fences(self, fences):
+        self.fences = {fence.fence_id: fence for fence in fences}
+        self.index = spatial_index.BoxIndex(FENCE_CELL_DEG)
+        for fence in self.fences.values():
+            self.index.add(fence.fence_id, fence.bbox)
+        for ship_fences in self.inside.values():
+            for fence_id in [fence_id for fence_id in ship_fences if fence_id not in self.fences]:
+                del ship_fences[fence_id]
+
+    def evaluate(self, ship_id, lat, lon, now):
+        """Test one fix against the candidate fences and return the events it causes."""
+        current = {fence_id for fence_id in self.index.containing(lat, lon)
+                   if self.fences[fence_id].contains(lat, lon)}
+        previous = self.inside.get(ship_id)
+        if not current and not previous:
+            return []
+        if previous is None:
+            previous = self.inside[ship_id] = {}
+        events = []
+        for fence_id in [fence_id for fence_id in previous if fence_id not in current]:
+            del previous[fence_id]
+            events.append(self._event("exit", fence_id, ship_id, lat, lon, now))
+        for fence_id in current:
+            state = previous.get(fence_id)
+            if state is None:
+                previous[fence_id] = [now, False]
+                events.append(self._event("enter", fence_id, ship_id, lat, lon, now))
+                continue
+            dwell_seconds = self.fences[fence_id].dwell_seconds
+            if dwell_seconds and not state[1] and now - state[0] >= dwell_seconds:
+                state[1] = True
+                events.append(self._event("dwell", fence_id, ship_id, lat, lon, now, now - state[0]))
+        if not previous:
+            del self.inside[ship_id]
+        return events
+
+    def _event(self, kind, fence_id, ship_id, lat, lon, now, dwell=None):
+        self.seq += 1
+        event = {
+            "seq": self.seq,
+            "event": kind,
+            "fence_id": fence_id,
+            "fence_name": self.fences[fence_id].name,
+            "ship_id": ship_id,
+            "latitude": lat,
+            "longitude": lon,
+            "timestamp": int(now * 1000)
+        }
+        if dwell is not None:
+            event["dwell_seconds"] = round(dwell, 1)
+        self.events.append(event)
+        return event
+
+    def events_since(self, seq, limit):
+        """Return up to limit retained events with a sequence number above seq, oldest first."""
+        result = []
+        for event in reversed(self.events):
+            if event["seq"] <= seq:
+                break
+            result.append(event)
+        result.reverse()
+        return result[:limit]
+
+    def snapshot(self):
+        """Retained events and inside state, for engines that follow this one (see apply_state)."""
+        return {"events": list(self.events), "inside": self.inside}
+
+    def apply_state(self, state):
+        """Follow another engine instead of evaluating fixes; returns the events to pass on to viewers.
+
+        A state with "inside" is a snapshot and replaces everything here (the
+        other engine may have restarted); otherwise its events are applied in
+        order, skipping ones already seen.
+        """
+        if "inside" in state:
+            self.inside = {ship_id: dict(fences) for ship_id, fences in state["inside"].items()}
+            self.events = collections.deque(state["events"], maxlen=EVENT_HISTORY)
+            self.seq = self.events[-1]["seq"] if self.events else 0
+            return []
+        new = []
+        for event in state["events"]:
+            if event["seq"] <= self.seq:
+                continue
+            self.seq = event["seq"]
+            self.events.append(event)
+            new.append(event)
+            ship_id, fence_id = event["ship_id"], event["fence_id"]
+            fences = self.inside.setdefault(ship_id, {})
+            if event["event"] == "exit":
+                fences.pop(fence_id, None)
+            elif event["event"] == "enter":
+                fences[fence_id] = [event["timestamp"] / 1000, False]
+            elif fence_id in fences:
+                fences[fence_id][1] = True
+            if not fences:
+                del self.inside[ship_id]
+        return new
+
+    def ships_inside(self, fence_id):
+        return sorted(ship_id for ship_id, fences in self.inside.items() if fence_id in fences)
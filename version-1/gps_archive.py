@@ -0,0 +1,233 @@
+import gzip
+import json
+import logging
+import os
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+# The archive is a directory of newline-separated JSON fix segments, one per
+# UTC day, named gps-YYYYMMDD.jsonl. Segments are append-only. Old segments
+# are compacted by retention.py into gps-YYYYMMDD.jsonl.gz and later into
+# thinned gps-YYYYMMDD-<N>s.jsonl.gz (one fix per N seconds); readers take the
+# most complete file of each day.
+SEGMENT_PREFIX = 'gps-'
+SEGMENT_SUFFIX = '.jsonl'
+COMPRESSED_SUFFIX = '.jsonl.gz'
+
+
+def parse_segment_name(name):
+    """Return (day, rank) for an archive file name, rank 0 = raw, 1 = compressed, 2 = thinned; None otherwise."""
+    if not name.startswith(SEGMENT_PREFIX):
+        return None
+    day = name[len(SEGMENT_PREFIX):len(SEGMENT_PREFIX) + 8]
+    rest = name[len(SEGMENT_PREFIX) + 8:]
+    if len(day) != 8 or not day.isdigit():
+        return None
+    if rest == SEGMENT_SUFFIX:
+        return day, 0
+    if rest == COMPRESSED_SUFFIX:
+        return day, 1
+    if rest.startswith('-') and rest.endswith('s' + COMPRESSED_SUFFIX) and rest[1:-len('s' + COMPRESSED_SUFFIX)].isdigit():
+        return day, 2
+    return None
+
+
+def open_segment(path):
+    """Open a raw or compacted segment for reading lines as bytes."""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def segment_day(timestamp):
+    """Return the YYYYMMDD day for a fix timestamp string, or today (UTC) if it cannot be parsed."""
+    if timestamp and len(timestamp) >= 10 and timestamp[4] == '-' and timestamp[7] == '-':
+        return timestamp[0:4] + timestamp[5:7] + timestamp[8:10]
+    return datetime.now(timezone.utc).strftime('%Y%m%d')
+
+
+class FixArchive:
+    """Append-only, day-segmented archive of every parsed fix."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.day = None
+        self.file = None
+        os.makedirs(directory, exist_ok=True)
+
+    def segment_path(self, day):
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{day}{SEGMENT_SUFFIX}")
+
+    def append(self, gps_data):
+        """Append one fix to its day segment, rotating the open file at midnight."""
+        day = segment_day(gps_data.get("timestamp"))
+        try:
+            if day != self.day:
+                self.close()
+                self.file = open(self.segment_path(day), 'a', buffering=1)
+                self.day = day
+            self.file.write(json.dumps(gps_data, separators=(',', ':')) + '\n')
+        except Exception as e:
+            logger.error(f"Failed to archive GPS data: {e}")
+
+    def segments(self, start_day=None, end_day=None):
+        """Return (day, path) for archived segments within the inclusive day range, oldest first.
+
+        A day with several files (compaction was interrupted) is listed once,
+        with the most complete one.
+        """
+        best = {}
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        for name in names:
+            parsed = parse_segment_name(name)
+            if parsed is None:
+                continue
+            day, rank = parsed
+            if (start_day and day < start_day) or (end_day and day > end_day):
+                continue
+            if day not in best or rank < best[day][0]:
+                best[day] = (rank, os.path.join(self.directory, name))
+        return sorted((day, path) for day, (_, path) in best.items())
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+            self.day = None
+
+
+
+class ArchiveReader:
+    """Follow the archive from a durable cursor, one fix at a time.
+
+    The cursor (segment day and byte offset) is only advanced by commit(), so a
+    failed send can rewind() and retry the same fixes. Each consumer keeps its
+    own cursor file, which makes consumers independent of each other.
+    """
+
+    def __init__(self, archive, cursor_path):
+        self.archive = archive
+        self.cursor_path = cursor_path
+        self.file = None
+        self.day = None
+        self.offset = 0
+        self.committed = (None, 0)
+        self.line_bytes = 500.0  # Running average fix size, for lag estimates
+        if not self._load():
+            # A new consumer starts at the live end instead of replaying history.
+            segments = archive.segments()
+            if segments:
+                self.day, path = segments[-1]
+                self.offset = os.path.getsize(path)
+        self.committed = (self.day, self.offset)
+
+    def _load(self):
+        try:
+            with open(self.cursor_path, 'r') as f:
+                cursor = json.load(f)
+            self.day = cursor["day"]
+            self.offset = int(cursor["offset"])
+            return True
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logger.error(f"Ignoring unreadable archive cursor {self.cursor_path}: {e}")
+            return False
+
+    def _open(self, day, offset):
+        if self.file:
+            self.file.close()
+            self.file = None
+        self.day = day
+        self.offset = offset
+        path = self.archive.segment_path(day)
+        if os.path.exists(path):
+            self.file = open(path, 'rb')
+            self.file.seek(offset)
+
+    def _next_segment(self):
+        for day, _ in self.archive.segments(start_day=self.day):
+            if self.day is None or day > self.day:
+                return day
+        return None
+
+    def read(self):
+        """Return the next archived fix, or None when caught up with the writer."""
+        while True:
+            if self.file is None:
+                if self.day is None:
+                    self.day = self._next_segment()
+                    if self.day is None:
+                        return None
+                self._open(self.day, self.offset)
+                if self.file is None:
+                    next_day = self._next_segment()
+                    if next_day is None:
+                        return None
+                    self._open(next_day, 0)
+                    continue
+            line = self.file.readline()
+            if line.endswith(b'\n'):
+                self.offset += len(line)
+                self.line_bytes += 0.01 * (len(line) - self.line_bytes)
+                try:
+                    return json.loads(line)
+                except ValueError:
+                    logger.error(f"Skipping corrupt archive line in {self.day} at offset {self.offset - len(line)}")
+                    continue
+            if line:
+                # The writer is mid-line; leave it for the next read.
+                self.file.seek(self.offset)
+                return None
+            if self.archive.day == self.day:
+                return None
+            next_day = self._next_segment()
+            if next_day is None:
+                return None
+            self._open(next_day, 0)
+
+    def lag_fixes(self):
+        """Estimate how many archived fixes are still unread."""
+        total = 0
+        for day, path in self.archive.segments(start_day=self.day):
+            try:
+                total += os.path.getsize(path)
+            except OSError:
+                continue
+            if day == self.day:
+                total -= self.offset
+        return int(total / self.line_bytes)
+
+    def commit(self):
+        """Mark everything read so far as delivered."""
+        self.committed = (self.day, self.offset)
+
+    def rewind(self):
+        """Return to the last committed position."""
+        day, offset = self.committed
+        if self.file:
+            self.file.close()
+            self.file = None
+        self.day = day
+        self.offset = offset
+
+    def save(self):
+        """Persist the committed position atomically."""
+        day, offset = self.committed
+        try:
+            os.makedirs(os.path.dirname(self.cursor_path), exist_ok=True)
+            tmp_path = self.cursor_path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump({"day": day, "offset": offset}, f)
+            os.replace(tmp_path, self.cursor_path)
+        except Exception as e:
+            logger.error(f"Failed to save archive cursor {self.cursor_path}: {e}")
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
@@ -0,0 +1,212 @@
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Typed configuration for a service module's settings. The settings are the
+# module's UPPERCASE constants: their values are the defaults and their types
+# are the schema. Values are layered
+#   module default  <  JSON config file  <  environment (<prefix><NAME>)
+# so a fleet-wide file can be pushed to every Pi and a single unit can still be
+# overridden from its systemd unit or shell. Environment values are parsed as
+# the setting's type; list and dict settings take JSON.
+#
+# Example /home/mdt/gps_config.json:
+#   {"SHIP_ID": "MV-EXAMPLE", "UPLINK_BATCH_MAX_FIXES": 20,
+#    "UPLINK_DESTINATIONS": [{"name": "primary", "url": "ws://shore:4001"}]}
+#
+# Settings listed as hot are re-applied when the file changes; the others are
+# logged as needing a restart.
+#
+# Settings of the modules a service uses (uplink_rate, anchor_watch, ...) are
+# added as sections: an object of that name in the same file, and
+# <prefix><SECTION>_<NAME> in the environment, e.g.
+#   {"anchor_watch": {"MAX_SWING_RADIUS_M": 80}}   GPS_ANCHOR_WATCH_MAX_SWING_RADIUS_M=80
+CONFIG_TYPES = (bool, int, float, str, list, tuple, dict, type(None))
+TRUE_STRINGS = ('1', 'true', 'yes', 'on')
+FALSE_STRINGS = ('0', 'false', 'no', 'off')
+
+
+def coerce(name, value, default):
+    """Convert a file or environment value to the type of the setting's default, or raise ValueError."""
+    if isinstance(default, bool):
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, str) and value.strip().lower() in TRUE_STRINGS + FALSE_STRINGS:
+            return value.strip().lower() in TRUE_STRINGS
+        raise ValueError(f"{name} must be a boolean, got {value!r}")
+    if isinstance(default, (int, float)):
+        if isinstance(value, str):
+            try:
+                value = json.loads(value)
+            except json.JSONDecodeError:
+                raise ValueError(f"{name} must be a number, got {value!r}")
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"{name} must be a number, got {value!r}")
+        if isinstance(default, int) and not isinstance(value, int):
+            if not float(value).is_integer():
+                raise ValueError(f"{name} must be an integer, got {value!r}")
+            value = int(value)
+        return float(value) if isinstance(default, float) else value
+    if isinstance(default, str):
+        if not isinstance(value, str):
+            raise ValueError(f"{name} must be a string, got {value!r}")
+        return value
+    if isinstance(default, (list, tuple, dict)):
+        if isinstance(value, str):
+            try:
+                value = json.loads(value)
+            except json.JSONDecodeError:
+                raise ValueError(f"{name} must be JSON, got {value!r}")
+        if isinstance(default, dict) and not isinstance(value, dict):
+            raise ValueError(f"{name} must be an object, got {value!r}")
+        if isinstance(default, (list, tuple)):
+            if not isinstance(value, list):
+                raise ValueError(f"{name} must be a list, got {value!r}")
+            return tuple(value) if isinstance(default, tuple) else value
+        return value
+    # Optional settings (default None): a string from the environment, anything JSON from the file.
+    return value
+
+
+class Config:
+    """Settings of one module, loaded from a JSON file and the environment and applied onto the module."""
+
+    def __init__(self, module, path, prefix, hot=(), exclude=()):
+        self.module = module
+        self.path = path
+        self.prefix = prefix
+        self.hot = frozenset(hot)
+        self.defaults = {name: value for name, value in vars(module).items()
+                         if name.isupper() and isinstance(value, CONFIG_TYPES) and name not in exclude}
+        unknown = self.hot - self.defaults.keys()
+        if unknown:
+            raise ValueError(f"Unknown hot settings: {sorted(unknown)}")
+        self.mtime = None
+        self.values = dict(self.defaults)
+        self.sections = {}  # name -> Config of another module, read from the object of that name in the file
+        self.section_prefix = ''  # "<section>." in the log lines of a section's settings
+
+    def add_section(self, name, module, hot=(), exclude=()):
+        """Configure another module's settings from the "<name>" object of the same file; returns its Config."""
+        section = Config(module, f"{self.path} [{name}]", f"{self.prefix}{name.upper()}_", hot,
+                         tuple(exclude) + ('HOT_SETTINGS',))
+        section.section_prefix = f"{name}."
+        self.sections[name] = section
+        return section
+
+    def _section_values(self, file_values, name):
+        values = file_values.get(name, {})
+        if not isinstance(values, dict):
+            logger.error(f"{self.path}: {name} must be a JSON object, ignoring it")
+            return {}
+        return values
+
+    def _read_file(self):
+        """Settings from the config file, or {} if it does not exist; raises ValueError if unreadable."""
+        try:
+            self.mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            self.mtime = None
+            return {}
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            raise ValueError(f"Cannot read config file {self.path}: {e}")
+        if not isinstance(data, dict):
+            raise ValueError(f"Config file {self.path} must contain a JSON object")
+        return data
+
+    def _resolve(self, file_values):
+        """Layer file and environment values over the defaults, skipping (and logging) invalid ones."""
+        values = dict(self.defaults)
+        for name, value in file_values.items():
+            if name in self.sections:
+                continue
+            if name not in self.defaults:
+                logger.warning(f"Ignoring unknown setting {name} in {self.path}")
+                continue
+            try:
+                values[name] = coerce(name, value, self.defaults[name])
+            except ValueError as e:
+                logger.error(f"{self.path}: {e}; keeping {values[name]!r}")
+        for name in self.defaults:
+            raw = os.environ.get(self.prefix + name)
+            if raw is None:
+                continue
+            try:
+                values[name] = coerce(name, raw, self.defaults[name])
+            except ValueError as e:
+                logger.error(f"{self.prefix}{name}: {e}; keeping {values[name]!r}")
+        return values
+
+    def load(self):
+        """Read the file and environment and apply every setting; call once at startup."""
+        try:
+            file_values = self._read_file()
+        except ValueError as e:
+            logger.error(f"{e}; using defaults and environment only")
+            file_values = {}
+        return self._apply(file_values)
+
+    def _apply(self, file_values):
+        self.values = self._resolve(file_values)
+        changed = {name: value for name, value in self.values.items() if value != self.defaults[name]}
+        for name, value in changed.items():
+            setattr(self.module, name, value)
+        if changed:
+            logger.info(f"Configuration: {', '.join(f'{self.section_prefix}{name}={value!r}' for name, value in sorted(changed.items()))}")
+        for name, section in self.sections.items():
+            changed.update((f"{name}.{key}", value)
+                           for key, value in section._apply(self._section_values(file_values, name)).items())
+        return changed
+
+    def reload_if_changed(self):
+        """Re-read the file if it changed and apply hot settings; returns the names applied."""
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self.mtime:
+            return []
+        try:
+            file_values = self._read_file()
+        except ValueError as e:
+            logger.error(f"{e}; keeping the current configuration")
+            return []
+        return self._reload(file_values)
+
+    def _reload(self, file_values):
+        values = self._resolve(file_values)
+        applied = []
+        for name, value in values.items():
+            if value == self.values[name]:
+                continue
+            if name in self.hot:
+                setattr(self.module, name, value)
+                self.values[name] = value
+                applied.append(name)
+            else:
+                logger.warning(f"{name} changed in {self.path}; restart to apply it")
+        if applied:
+            logger.info(f"Reloaded {', '.join(f'{self.section_prefix}{name}={self.values[name]!r}' for name in applied)}")
+        for name, section in self.sections.items():
+            applied.extend(f"{name}.{key}" for key in section._reload(self._section_values(file_values, name)))
+        return applied
+
+
+def log_to_file(path):
+    """Also log to path, formatted like the existing root handler; called once the path is configured."""
+    if not path:
+        return
+    root = logging.getLogger()
+    try:
+        handler = logging.FileHandler(path)
+    except OSError as e:
+        logger.error(f"Cannot log to {path}: {e}")
+        return
+    if root.handlers:
+        handler.setFormatter(root.handlers[0].formatter)
+    root.addHandler(handler)
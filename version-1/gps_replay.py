@@ -0,0 +1,279 @@
+import gzip
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import zlib
+
+logger = logging.getLogger(__name__)
+
+# Recording format: one header line per ingest session followed by
+# "<ms since session start>\t<raw gpsd line>" records. Files ending in .gz are
+# gzip-compressed; appending a new session adds another gzip member. A new
+# header is also written when the device list changes, so replay rebinds the
+# receivers at the same point. A recording cut short (power loss, SIGKILL)
+# replays up to its last complete record.
+RECORD_MAGIC = '#gpsrec'
+RECORD_VERSION = 1
+RECORD_FLUSH_EVERY = 50  # Records between flushes to disk
+REPLAY_MAX_GAP = 60  # Longest pause (seconds) replayed between two recorded sessions
+
+
+def open_recording(path, mode):
+    """Open a recording file as text, transparently handling gzip."""
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+class SessionRecorder:
+    """Append raw gpsd JSON lines with their receive times to a recording file."""
+
+    def __init__(self, path, devices):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.devices = list(devices)
+        self.start = None
+        self.count = 0
+        self._last_raw = None
+        self._lock = threading.Lock()  # close() may come from another thread than record()
+        self.file = open_recording(path, 'a')
+        logger.info(f"Recording gpsd session to {path}")
+
+    def record(self, raw, received=None):
+        """Write one raw gpsd line received at the given wall-clock time; ignored once closed."""
+        # The gps client leaves the previous line in .response when a read
+        # fails, so the same object must not be recorded twice.
+        if not raw or raw is self._last_raw:
+            return
+        self._last_raw = raw
+        if received is None:
+            received = time.time()
+        with self._lock:
+            if self.file.closed:
+                return
+            if self.start is None:
+                self.start = received
+                self.file.write(f"{RECORD_MAGIC} {RECORD_VERSION} {self.start:.3f} {','.join(self.devices)}\n")
+                self.file.flush()
+            offset_ms = round((received - self.start) * 1000)
+            self.file.write(f"{offset_ms}\t{raw.strip()}\n")
+            self.count += 1
+            if self.count % RECORD_FLUSH_EVERY == 0:
+                self.file.flush()
+
+    def set_devices(self, devices):
+        """Start a new session header with the given device list before the next record."""
+        with self._lock:
+            if list(devices) != self.devices:
+                self.devices = list(devices)
+                self.start = None
+
+    def close(self):
+        """Flush and close the recording; safe to call more than once."""
+        with self._lock:
+            if self.file.closed:
+                return
+            try:
+                self.file.close()
+                logger.info(f"Recorded {self.count} gpsd reports to {self.path}")
+            except Exception as e:
+                logger.error(f"Failed to close recording {self.path}: {e}")
+
+
+class ReplayReport(dict):
+    """gpsd report with attribute access, like gps.dictwrapper."""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+
+def _wrap(value):
+    if isinstance(value, dict):
+        return ReplayReport((k, _wrap(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return [_wrap(v) for v in value]
+    return value
+
+
+class ReplaySession:
+    """Stand-in for gps.gps that feeds a recording back at 1x, Nx or maximum speed.
+
+    A speed of 0 replays as fast as possible. Lines that are not valid JSON
+    raise ValueError from next() exactly like a garbled live stream does, and
+    the session keeps its position so the ingest loop can "reconnect" to it.
+    A truncated recording ends the replay at its last complete record.
+    `devices` follows the session headers, so it changes where the recorded
+    device list did.
+    """
+
+    def __init__(self, path, speed=1.0):
+        self.path = path
+        self.speed = speed
+        self.file = open_recording(path, 'r')
+        self.devices = []
+        self.response = None
+        self.received = None
+        self.finished = False
+        self.count = 0
+        self.errors = 0
+        self._session_start = None
+        self._last_received = None
+        self._clock_offset = 0.0
+        self._wall_start = None
+        self._first_received = None
+        self._peek = self._read_line()
+        if self._peek and self._peek.startswith(RECORD_MAGIC):
+            self.devices = self._parse_header(self._peek)
+        logger.info(f"Replaying {path} at {'max' if not speed else f'{speed}x'} speed, devices: {self.devices}")
+
+    def _read_line(self):
+        try:
+            line = self.file.readline()
+        except (EOFError, OSError, zlib.error) as e:
+            logger.warning(f"Recording {self.path} is truncated, ending replay: {e}")
+            return None
+        if line and not line.endswith('\n'):
+            logger.warning(f"Recording {self.path} ends in a partial record, ending replay")
+            return None
+        return line if line else None
+
+    def _parse_header(self, line):
+        parts = line.split()
+        if len(parts) < 3 or parts[1] != str(RECORD_VERSION):
+            raise ValueError(f"Unsupported recording header in {self.path}: {line.strip()}")
+        start = float(parts[2])
+        if self._last_received is not None:
+            # Collapse the downtime between two recorded sessions.
+            gap = min(max(start - self._last_received, 0), REPLAY_MAX_GAP)
+            self._clock_offset += (self._last_received + gap) - start
+        self._session_start = start
+        return parts[3].split(',') if len(parts) > 3 and parts[3] else []
+
+    def _pace(self, received):
+        if self._first_received is None:
+            self._first_received = received
+            self._wall_start = time.monotonic()
+            return
+        if not self.speed:
+            return
+        due = self._wall_start + (received - self._first_received) / self.speed
+        delay = due - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def next(self):
+        """Return the next recorded report, sleeping to honour the replay speed."""
+        while True:
+            line = self._peek if self._peek is not None else self._read_line()
+            self._peek = None
+            if line is None:
+                self.finished = True
+                raise StopIteration
+            if line.startswith(RECORD_MAGIC):
+                self.devices = self._parse_header(line)
+                continue
+            offset, _, raw = line.rstrip('\n').partition('\t')
+            try:
+                received = self._session_start + int(offset) / 1000 + self._clock_offset
+            except (TypeError, ValueError):
+                self.errors += 1
+                logger.debug(f"Skipping malformed recording line: {line!r}")
+                continue
+            self._pace(received)
+            self.response = raw
+            self.received = received
+            self._last_received = received - self._clock_offset
+            self.count += 1
+            try:
+                return _wrap(json.loads(raw))
+            except ValueError:
+                self.errors += 1
+                raise
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.next()
+
+    def stats(self):
+        """Return (reports, errors, wall seconds, reports per second) so far."""
+        elapsed = time.monotonic() - self._wall_start if self._wall_start else 0.0
+        rate = self.count / elapsed if elapsed > 0 else 0.0
+        return self.count, self.errors, elapsed, rate
+
+    def close(self):
+        """Close the recording once replay has finished; otherwise keep the position."""
+        if self.finished and not self.file.closed:
+            self.file.close()
+
+
+def summarize(path):
+    """Print devices, report counts and recorded duration for a recording."""
+    sessions = 0
+    start_devices = None  # From the first session header
+    devices = set()
+    classes = {}
+    garbage = 0
+    first = last = None
+    truncated = False
+    with open_recording(path, 'r') as f:
+        start = 0.0
+        lines = iter(f)
+        while True:
+            try:
+                line = next(lines)
+            except StopIteration:
+                break
+            except (EOFError, OSError, zlib.error):
+                truncated = True
+                break
+            if not line.endswith('\n'):
+                truncated = True
+                break
+            if line.startswith(RECORD_MAGIC):
+                parts = line.split()
+                sessions += 1
+                start = float(parts[2])
+                header_devices = parts[3].split(',') if len(parts) > 3 and parts[3] else []
+                if start_devices is None:
+                    start_devices = header_devices
+                devices.update(header_devices)
+                continue
+            offset, _, raw = line.rstrip('\n').partition('\t')
+            try:
+                received = start + int(offset) / 1000
+                report = json.loads(raw)
+            except ValueError:
+                garbage += 1
+                continue
+            first = received if first is None else first
+            last = received
+            key = f"{report.get('class', '?')}@{report.get('device', '?')}"
+            classes[key] = classes.get(key, 0) + 1
+    print(f"Recording: {path}")
+    print(f"Sessions: {sessions}, devices at start: {start_devices or []}")
+    if devices != set(start_devices or []):
+        print(f"Devices over all sessions: {sorted(devices)}")
+    if first is not None:
+        print(f"Duration: {last - first:.1f} s")
+    for key, count in sorted(classes.items()):
+        print(f"  {key}: {count}")
+    print(f"Unparseable lines: {garbage}")
+    if truncated:
+        print("Truncated: yes, the last records were not written completely")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print(f"Usage: {sys.argv[0]} <recording>")
+        sys.exit(1)
+    summarize(sys.argv[1])
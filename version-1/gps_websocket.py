@@ -6,8 +6,7 @@ import os
 import asyncio
 import websockets
 import json
-import pytz
-from datetime import datetime
+from datetime import datetime, timezone
 from aiohttp import web
 from queue import Queue
 
@@ -33,6 +32,7 @@ TIMEOUT = 10
 MAX_ATTEMPTS = 5
 RECONNECT_DELAY = 2
 DATA_TIMEOUT = 30  # seconds
+DEVICE_ID = os.environ.get('GPS_DEVICE_ID', '10000000e123456be')  # Set GPS_DEVICE_ID per unit; the default is a placeholder
 
 # Global variables
 latest_gps_data = None
@@ -74,7 +74,7 @@ async def parse_gps_data(gps_text):
     try:
         data = {
             "timestamp": "",
-            "device_id": "10000000e123456be",
+            "device_id": DEVICE_ID,
             "heading": None,
             "gps_data": [
                 {"gps": "top_gps", "latitude": None, "longitude": None, "altitude": None, "speed": None, "satellites": None},
@@ -254,7 +254,7 @@ def process_gps_data():
                     logger.debug(f"Ignoring TPV report for unknown device: {device}")
                     continue
                 last_data_time[device] = current_time
-                timestamp = datetime.now(pytz.UTC).strftime('%Y-%m-%d %H:%M:%S.%f')
+                timestamp = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S.%f')
                 lat = report.get('lat', None)
                 lon = report.get('lon', None)
                 alt = report.get('alt', None)
@@ -279,7 +279,7 @@ def process_gps_data():
 
                 output = [
                     f"GPS Data (Real-Time): {timestamp}",
-                    f"Device ID: 10000000e123456be",
+                    f"Device ID: {DEVICE_ID}",
                     f"Heading: {current_heading if current_heading is not None else 'Unknown'}"
                 ]
                 for device in SERIAL_DEVICES:
@@ -1,50 +1,157 @@
-import gps
 import time
 import logging
 import subprocess
 import os
-import glob
 import asyncio
-import websockets
 import json
-import pytz
 import socket
-from datetime import datetime
-from aiohttp import web
+import argparse
+import functools
+import signal
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import anchor_watch
+import device_watcher
+import fix_feed
+import fix_records
+import fix_ring
+import geodesy
+import gps_config
+import receiver_health
+import sky_model
+import startup
+import uplink_codec
+import uplink_rate
+from datetime import datetime, timezone
 from queue import Queue, Empty
 
+# gps, websockets, aiohttp.web and the helper modules of optional components are
+# imported by load_components(), only for the components that need them, so a
+# slim profile does not pay for them. The modules imported above are used by the
+# gpsd ingest itself, or tuned by config sections before the profile is known.
+gps = None
+websockets = None
+web = None
+gps_archive = None  # archive
+fix_rollups = None  # archive
+track_export = None  # http with archive
+viewer_subscriptions = None  # local_ws
+gps_replay = None  # RECORD_FILE or REPLAY_FILE
+
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('/home/mdt/gps_websocket.log'),
-        logging.StreamHandler()
-    ]
+    handlers=[logging.StreamHandler()]  # SERVICE_LOG_FILE is added once the configuration is loaded
 )
 logger = logging.getLogger(__name__)
 
-# Configuration
+# Configuration. These are defaults: gps_config layers CONFIG_FILE and GPS_<NAME>
+# environment variables over them at startup, and HOT_SETTINGS are re-applied
+# when the file changes.
+CONFIG_FILE = os.environ.get('GPS_CONFIG', '/home/mdt/gps_config.json')
+CONFIG_RELOAD_INTERVAL = 10  # Seconds between checks for an edited CONFIG_FILE
+SERVICE_LOG_FILE = '/home/mdt/gps_websocket.log'  # This service's log, besides stderr; '' for stderr only
 OUTPUT_FILE = '/home/mdt/GPS/gps_output.txt'
 JSON_LOG_FILE = '/home/mdt/gps_offline_data.json'
+ARCHIVE_DIR = '/home/mdt/gps_archive'  # Every parsed fix, one JSONL segment per UTC day
 GPSD_HOST = '127.0.0.1'
 GPSD_PORT = 2947
+GPSD_SOCKET = '/var/run/gpsd.sock'  # gpsd control socket, used to add and remove devices at runtime
+MAX_RECEIVERS = 2  # GPS devices used at once
+DEVICE_HOTPLUG = True  # Watch /dev and add, remove or rebind receivers without a restart
+GPSD_START_TIMEOUT = 10  # Seconds to wait for a freshly started gpsd to accept connections
 WEBSOCKET_PORT = 8765
 HTTP_PORT = 8080
 EXTERNAL_WEBSOCKET_URL = 'ws://192.168.0.164:4001'
+# Each destination gets its own connection, archive cursor and rate controller.
+# "url" may be a list of addresses tried in turn when the current one fails.
+# None means a single "primary" destination at EXTERNAL_WEBSOCKET_URL, resolved
+# by uplink_destinations() once the configuration is loaded. For example:
+#   [{"name": "primary", "url": "ws://192.168.0.164:4001"},
+#    {"name": "backup", "url": ["ws://backup-shore:4001", "ws://10.0.0.2:4001"]},
+#    {"name": "logger", "url": "ws://127.0.0.1:4002"}]
+UPLINK_DESTINATIONS = None
+CURSOR_SAVE_INTERVAL = 1.0  # Seconds between persisting each destination's archive cursor
+UPLINK_YIELD_EVERY = 200  # Archive reads between yields to the event loop while an uplink catches up
+UPLINK_LAG_INTERVAL = 5.0  # Seconds between backlog estimates for the rate controller (a listdir and stats)
 TIMEOUT = 10
 RECONNECT_DELAY = 2
-DATA_TIMEOUT = 30
+DATA_TIMEOUT = 30  # Seconds without reports before a receiver is marked stale
 SHIP_ID = "SHIP123"  # Replace with actual ship ID
+DEVICE_ID = ""  # Empty = the Raspberry Pi serial number from /proc/cpuinfo
 BATCH_SEND_DELAY = 0.1  # Delay between sending batched offline data (seconds)
+RECORD_FILE = None  # Record raw gpsd JSON here, e.g. '/home/mdt/gps_sessions/session.rec.gz'
+REPLAY_FILE = None  # Replay a recording instead of reading from gpsd
+REPLAY_SPEED = 1.0  # Replay speed multiplier, 0 = as fast as possible
+UPLINK_ENCODING = uplink_codec.ENCODING_JSON  # Set to uplink_codec.ENCODING_COMPACT to offer the binary format
+NEGOTIATE_TIMEOUT = 2  # Seconds to wait for the server to accept an encoding
+UPLINK_RATE_CONTROL = True  # Thin out uplink fixes by vessel motion and link health
+UPLINK_BATCH_MAX_FIXES = 50  # Fixes per uplink message once the server accepts batches, 1 = no batching
+UPLINK_BATCH_MAX_DELAY = 1.0  # Longest time (seconds) a fix waits in a partial batch
+UPLINK_COMPRESSION = True  # Negotiate permessage-deflate on the uplink
+UPLINK_DEFLATE_WINDOW_BITS = 12  # LZ77 window (9-15); smaller uses less memory on both ends
+UPLINK_DEFLATE_CONTEXT_TAKEOVER = True  # Keep the dictionary across messages; False makes each message standalone
+UPLINK_DEFLATE_LEVEL = 6  # zlib compression level (1-9)
+UPLINK_DEFLATE_MEM_LEVEL = 5  # zlib memLevel (1-9)
+ANCHOR_WATCH = True  # Arm a drift alarm whenever the vessel settles, see anchor_watch.py
+ANCHOR_WATCH_SOURCE = fix_ring.FUSED  # "fused" (mean of the receivers) or one receiver label, e.g. "top_gps"
+FIX_HISTORY_CAPACITY = fix_ring.RING_CAPACITY  # Fixes kept in memory per receiver
+# Optional components. The gpsd ingest always runs; "uplink" implies "archive",
+# which the uplinks read from.
+#   local_ws  WebSocket server for local clients (port WEBSOCKET_PORT)
+#   http      HTTP API (port HTTP_PORT)
+#   uplink    Forward fixes to UPLINK_DESTINATIONS
+#   archive   Keep every fix in ARCHIVE_DIR
+PROFILES = {
+    "full": ("local_ws", "http", "uplink", "archive"),
+    "uplink": ("uplink", "archive"),  # Headless node, e.g. a Pi Zero that only forwards to shore
+    "local": ("local_ws", "http", "archive"),  # No shore link
+}
+PROFILE = "full"
+HEALTH_INTERVAL = 1.0  # Seconds between receiver health evaluations
+HEALTH_PUBLISH_INTERVAL = 10  # Longest time between receiver health messages to local clients
+LONG_POLL_TIMEOUT = 25  # Default seconds GET /gps?since=<seq> waits for a newer fix before answering 204
+LONG_POLL_MAX_TIMEOUT = 60  # Upper limit for the timeout a long-poll client may ask for
+SSE_KEEPALIVE = 15  # Seconds of silence before /gps/stream sends a comment line to keep proxies from closing it
+SSE_RETRY_MS = 2000  # Reconnect delay suggested to EventSource clients
+HTTP_GZIP = True  # Serve GET /gps gzip-compressed to clients that accept it
+# Read where they are used, so a config file change applies without a restart.
+# Uplink settings take effect on the next connection.
+HOT_SETTINGS = (
+    'SHIP_ID', 'OUTPUT_FILE', 'TIMEOUT', 'RECONNECT_DELAY', 'BATCH_SEND_DELAY', 'CURSOR_SAVE_INTERVAL',
+    'EXTERNAL_WEBSOCKET_URL', 'UPLINK_DESTINATIONS',
+    'UPLINK_YIELD_EVERY', 'UPLINK_LAG_INTERVAL',
+    'NEGOTIATE_TIMEOUT', 'UPLINK_ENCODING', 'UPLINK_RATE_CONTROL', 'UPLINK_BATCH_MAX_FIXES', 'UPLINK_BATCH_MAX_DELAY',
+    'UPLINK_COMPRESSION', 'UPLINK_DEFLATE_WINDOW_BITS', 'UPLINK_DEFLATE_CONTEXT_TAKEOVER', 'UPLINK_DEFLATE_LEVEL',
+    'UPLINK_DEFLATE_MEM_LEVEL', 'HEALTH_INTERVAL', 'HEALTH_PUBLISH_INTERVAL', 'CONFIG_RELOAD_INTERVAL',
+    'LONG_POLL_TIMEOUT', 'LONG_POLL_MAX_TIMEOUT', 'SSE_KEEPALIVE', 'SSE_RETRY_MS', 'HTTP_GZIP',
+)
 
 # Global variables
 latest_gps_data = None
+gps_feed = fix_feed.FixFeed()  # Published fixes with sequence numbers, shared by WebSocket, SSE and long-poll clients
 connected_clients = set()
+client_subscriptions = {}  # websocket -> viewer_subscriptions.Subscription
+sky_models = {}  # receiver label -> sky_model.SkyModel, updated by process_gps_data
+fix_history = None  # fix_ring.FixHistory of recent fixes per receiver, created by main(), appended by broadcast_gps_data
+anchor_watcher = None  # anchor_watch.AnchorWatch when ANCHOR_WATCH is enabled, created by main()
+health_monitor = None  # receiver_health.HealthMonitor, created once process_gps_data knows the devices
+readiness = startup.Readiness()  # Startup milestones, served on GET /ready
 gps_data_queue = Queue()
+archive_wakeups = []  # One asyncio.Event per uplink destination, set when a fix is archived
+fix_archive = None  # gps_archive.FixArchive when the archive component runs, created by main()
+fix_rollup_store = None  # fix_rollups.RollupStore next to the archive, created by main(), fed by broadcast_gps_data
+session_recorder = None  # gps_replay.SessionRecorder when RECORD_FILE is set, created by process_gps_data
+shutting_down = threading.Event()  # Set by main() on SIGTERM or Ctrl-C; process_gps_data returns when it sees it
+gpsd_setup_lock = threading.Lock()  # Held while gpsd starts, so device changes wait and then go through its control socket
 
+@functools.lru_cache(maxsize=None)
 def get_device_id():
-    """Retrieve the Raspberry Pi's serial number as the device ID."""
+    """Retrieve the Raspberry Pi's serial number as the device ID, unless DEVICE_ID is configured."""
+    if DEVICE_ID:
+        return DEVICE_ID
     try:
         with open('/proc/cpuinfo', 'r') as f:
             for line in f:
@@ -70,13 +177,12 @@ def is_port_free(port):
 
 def detect_gps_devices():
     """Detect connected GPS devices."""
-    devices = glob.glob('/dev/ttyACM*') + glob.glob('/dev/ttyUSB*')
+    devices = device_watcher.scan_devices(MAX_RECEIVERS)  # Sorted for a consistent order
     if not devices:
         logger.error("No GPS devices detected")
         return []
     logger.info(f"Detected GPS devices: {devices}")
-    devices.sort()  # Ensure consistent order
-    return devices[:2]  # Limit to two devices
+    return devices
 
 def run_command(cmd):
     """Run a shell command and return success status, stdout, and stderr."""
@@ -89,10 +195,15 @@ def run_command(cmd):
         return False, "", str(e)
 
 def ensure_gpsd_running(devices):
-    """Ensure gpsd is running."""
-    run_command(['sudo', 'pkill', '-9', 'gpsd'])
-    time.sleep(1)  # Wait for termination
-    socket_path = '/var/run/gpsd.sock'
+    """Ensure gpsd is running with the given devices, reusing a running gpsd through its control socket."""
+    socket_path = GPSD_SOCKET
+    if devices and device_watcher.gpsd_listening(socket_path):
+        logger.info(f"gpsd already running, adding devices through {socket_path}: {devices}")
+        added = [device for device in devices if device_watcher.gpsd_control(socket_path, '+', device)]
+        if added:
+            return True
+        logger.warning("gpsd did not accept any device, restarting it")
+        run_command(['sudo', 'pkill', 'gpsd'])
     if os.path.exists(socket_path):
         logger.info(f"Removing stale gpsd socket: {socket_path}")
         run_command(['sudo', 'rm', '-f', socket_path])
@@ -100,38 +211,74 @@ def ensure_gpsd_running(devices):
         logger.error("No devices provided for gpsd")
         return False
     logger.info(f"Starting gpsd with devices: {devices}")
-    cmd = ['sudo', 'gpsd', '-n', '-F', '/var/run/gpsd.sock', '-G', '127.0.0.1', '-b'] + devices
-    try:
-        process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
-        stdout, stderr = process.communicate(timeout=5)
-        if process.returncode == 0 or process.poll() is None:
-            logger.info("gpsd started successfully")
-            return True
+    cmd = ['sudo', 'gpsd', '-n', '-F', socket_path, '-G', '127.0.0.1', '-b'] + devices
+    # gpsd daemonizes, so this returns as soon as it has forked; then poll until it accepts clients.
+    success, stdout, stderr = run_command(cmd)
+    if not success:
         logger.error(f"Failed to start gpsd: stdout={stdout}, stderr={stderr}")
         return False
-    except subprocess.TimeoutExpired:
-        if process.poll() is None:
-            logger.info("gpsd is running in background")
-            return True
-    except Exception as e:
-        logger.error(f"Failed to start gpsd: {e}")
+    waited = startup.wait_for_port(GPSD_HOST, GPSD_PORT, GPSD_START_TIMEOUT)
+    if waited is None:
+        logger.error(f"gpsd did not accept connections within {GPSD_START_TIMEOUT} seconds")
         return False
+    logger.info(f"gpsd started successfully, accepting clients after {waited:.2f} s")
+    return True
+
+def encode_uplink(fixes, encoder=None):
+    """Serialize one or more fixes as a single uplink message."""
+    if encoder:
+        return b''.join(encoder.encode(gps_data) for gps_data in fixes)
+    if len(fixes) == 1:
+        return json.dumps(fixes[0])
+    return json.dumps({"type": "batch", "fixes": fixes})
 
-def log_offline_data(gps_data):
-    """Log GPS data to JSON file when no clients are connected or external server is unreachable."""
+async def negotiate_uplink(websocket):
+    """Offer an encoding and batching to the server; return (encoder or None, batching)."""
+    want_batch = UPLINK_BATCH_MAX_FIXES > 1
+    if UPLINK_ENCODING == uplink_codec.ENCODING_JSON and not want_batch:
+        return None, False
+    await websocket.send(json.dumps({
+        "type": "hello",
+        "ship_id": SHIP_ID,
+        "encodings": [UPLINK_ENCODING, uplink_codec.ENCODING_JSON],
+        "batch": want_batch
+    }))
+    async def wait_for_hello():
+        while True:
+            message = await websocket.recv()
+            try:
+                reply = json.loads(message)
+            except (TypeError, json.JSONDecodeError):
+                continue
+            if isinstance(reply, dict) and reply.get("type") == "hello":
+                return reply
     try:
-        os.makedirs(os.path.dirname(JSON_LOG_FILE), exist_ok=True)
-        with open(JSON_LOG_FILE, 'a') as f:
-            json.dump(gps_data, f)
-            f.write('\n')  # Newline-separated JSON
-        logger.info(f"Logged offline GPS data to {JSON_LOG_FILE}")
-    except Exception as e:
-        logger.error(f"Failed to log offline data: {e}")
+        reply = await asyncio.wait_for(wait_for_hello(), NEGOTIATE_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.info("External server did not negotiate, falling back to one JSON message per fix")
+        return None, False
+    encoder = None
+    if reply.get("encoding") == uplink_codec.ENCODING_COMPACT:
+        logger.info("Using compact uplink encoding")
+        encoder = uplink_codec.CompactEncoder()
+    batching = want_batch and bool(reply.get("batch"))
+    if batching:
+        logger.info(f"Batching up to {UPLINK_BATCH_MAX_FIXES} fixes or {UPLINK_BATCH_MAX_DELAY} s per uplink message")
+    return encoder, batching
+
+def uplink_connect_options():
+    """Return websockets.connect() keyword arguments for the configured compression."""
+    if not UPLINK_COMPRESSION:
+        return {"compression": None}
+    from websockets.extensions.permessage_deflate import ClientPerMessageDeflateFactory
+    factory = ClientPerMessageDeflateFactory(
+        client_max_window_bits=UPLINK_DEFLATE_WINDOW_BITS,
+        server_max_window_bits=UPLINK_DEFLATE_WINDOW_BITS,
+        client_no_context_takeover=not UPLINK_DEFLATE_CONTEXT_TAKEOVER,
+        server_no_context_takeover=not UPLINK_DEFLATE_CONTEXT_TAKEOVER,
+        compress_settings={"level": UPLINK_DEFLATE_LEVEL, "memLevel": UPLINK_DEFLATE_MEM_LEVEL}
+    )
+    return {"compression": None, "extensions": [factory]}
 
 async def send_offline_data(websocket):
     """Send all offline data from JSON log file to the client."""
@@ -190,6 +337,8 @@ async def parse_gps_data(gps_text):
                 current_index = 0
             elif "Bottom GPS" in line:
                 current_index = 1
+            elif line.endswith("):"):
+                current_index = None  # Another receiver (gps_2, ...), not part of this shape
             elif "Latitude:" in line and current_index is not None:
                 lat_str = line.split(":", 1)[1].strip()
                 try:
@@ -228,40 +377,285 @@ async def parse_gps_data(gps_text):
         logger.error(f"Error parsing GPS data: {e}")
         return None
 
+def client_wants(client, parsed_data, now):
+    """Check a local client's subscription (if any) before sending it a fix."""
+    subscription = client_subscriptions.get(client)
+    if subscription is None:
+        return True
+    position = geodesy.primary_position(parsed_data)
+    lat, lon = position[:2] if position else (None, None)
+    if not subscription.matches(parsed_data.get("ship_id"), lat, lon) or not subscription.due(now):
+        return False
+    subscription.mark_sent(now)
+    return True
+
+async def send_to_all_clients(message):
+    """Send a status message to every local client regardless of subscriptions."""
+    for client in connected_clients.copy():
+        try:
+            await client.send(message)
+        except websockets.exceptions.ConnectionClosed:
+            connected_clients.discard(client)
+
+async def send_to_local_clients(parsed_data, message):
+    """Send a fix, already encoded as message, to each local client whose subscription wants it."""
+    now = time.monotonic()
+    for client in connected_clients.copy():
+        if not client_wants(client, parsed_data, now):
+            continue
+        try:
+            await client.send(message)
+        except websockets.exceptions.ConnectionClosed:
+            connected_clients.discard(client)
+
 async def websocket_handler(websocket, path=None):
     """Handle WebSocket connections."""
     logger.info("WebSocket client connected")
     connected_clients.add(websocket)
     try:
         await send_offline_data(websocket)
+        for model in list(sky_models.values()):
+            await websocket.send(json.dumps(model.snapshot()))
         async for message in websocket:
             try:
                 data = json.loads(message)
+                if data.get("type") == viewer_subscriptions.SUBSCRIBE_TYPE:
+                    try:
+                        client_subscriptions[websocket] = viewer_subscriptions.parse_subscription(data)
+                        logger.info(f"Local client subscribed: {data}")
+                    except ValueError as e:
+                        logger.error(f"Invalid subscription: {e}")
+                    continue
                 gps_text = data.get("gps_data", "")
                 parsed_data = await parse_gps_data(gps_text)
                 if parsed_data:
                     global latest_gps_data
                     latest_gps_data = parsed_data
-                    for client in connected_clients.copy():
-                        try:
-                            await client.send(json.dumps(parsed_data))
-                        except websockets.exceptions.ConnectionClosed:
-                            connected_clients.discard(client)
-                    logger.info(f"Broadcasted GPS data to local clients: {parsed_data}")
+                    gps_feed.publish(parsed_data)
+                    await send_to_local_clients(parsed_data, gps_feed.message)
             except json.JSONDecodeError:
                 logger.error("Invalid JSON received")
     except websockets.exceptions.ConnectionClosed:
         logger.info("WebSocket client disconnected")
     finally:
         connected_clients.discard(websocket)
+        client_subscriptions.pop(websocket, None)
+
+def record_fix_history(parsed_data):
+    micros = uplink_codec.parse_timestamp(parsed_data.get("timestamp"))
+    timestamp = micros / 1e6 if micros is not None else time.time()
+    fix_history.append_fix(parsed_data, timestamp)
+    if fix_rollup_store:
+        fix_rollup_store.add_fix(parsed_data, timestamp)
+
+async def update_anchor_watch():
+    """Evaluate the newest fix and push any anchor watch state change to local clients at once."""
+    if anchor_watcher.update():
+        await send_to_all_clients(json.dumps(anchor_watcher.status()))
+
+async def get_anchor_watch(request):
+    """Handle HTTP GET /anchor requests."""
+    if anchor_watcher is None:
+        return web.json_response({"error": "Anchor watch disabled"}, status=404)
+    return web.json_response(anchor_watcher.status())
+
+async def acknowledge_anchor_alarm(request):
+    """Handle HTTP POST /anchor/acknowledge: clear a latched drift alarm."""
+    if anchor_watcher is None:
+        return web.json_response({"error": "Anchor watch disabled"}, status=404)
+    if anchor_watcher.acknowledge():
+        await send_to_all_clients(json.dumps(anchor_watcher.status()))
+    return web.json_response(anchor_watcher.status())
+
+async def get_gps_history(request):
+    """Handle HTTP GET /gps/history?receiver=fused&seconds=600 with column arrays, oldest first."""
+    receiver = request.query.get("receiver", fix_ring.FUSED)
+    ring = fix_history.rings.get(receiver)
+    if ring is None:
+        return web.json_response({"error": f"No history for receiver {receiver}"}, status=404)
+    try:
+        seconds = float(request.query.get("seconds", 600))
+    except ValueError:
+        return web.json_response({"error": "seconds must be a number"}, status=400)
+    slot = ring.newest_slot()
+    n = ring.count_since(ring.time[slot] - seconds) if slot is not None else 0
+    columns = {name: ring.values(name, n) for name, _, _ in fix_ring.COLUMNS}
+    # NaN is not valid JSON; unknown values go out as null.
+    for name in ("altitude", "speed", "heading"):
+        columns[name] = [None if value != value else round(value, 2) for value in columns[name]]
+    columns["satellites"] = [None if value < 0 else value for value in columns["satellites"]]
+    return web.json_response({"receiver": receiver, "count": len(columns["time"]), **columns})
+
+def query_time(request, name):
+    """Epoch seconds of an ISO-8601 query parameter (UTC unless it has an offset), or None if absent."""
+    value = request.query.get(name)
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return (parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)).timestamp()
+
+async def get_gps_rollups(request):
+    """Handle HTTP GET /gps/rollups?level=1h&receiver=fused&start=2025-06-03&end=2025-06-04.
+
+    Returns the per-minute or per-hour summary rows whose period starts in
+    [start, end), including the periods still filling, oldest first.
+    """
+    if fix_rollup_store is None:
+        return web.json_response({"error": "Archive is not enabled"}, status=404)
+    level = request.query.get("level", fix_rollups.ROLLUP_NAMES[-1])
+    if level not in fix_rollups.ROLLUP_NAMES:
+        return web.json_response({"error": f"level must be one of {', '.join(fix_rollups.ROLLUP_NAMES)}"}, status=400)
+    receiver = request.query.get("receiver", fix_ring.FUSED)
+    try:
+        start = query_time(request, "start")
+        end = query_time(request, "end")
+    except ValueError:
+        return web.json_response({"error": "start and end must be ISO-8601 times"}, status=400)
+    rows = await asyncio.get_running_loop().run_in_executor(
+        None, fix_rollups.read_rollups, fix_rollup_store.directory, level, receiver, start, end)
+    rows = fix_rollups.merge_rows(rows + fix_rollup_store.open_rows(level, receiver, start, end))
+    return web.json_response({"level": level, "receiver": receiver, "count": len(rows), "rows": rows})
+
+async def export_track(request):
+    """Handle HTTP GET /export?format=gpx&start=2025-06-03&end=2025-06-04[&receiver=top_gps][&simplify=5].
+
+    The archive is read and encoded chunk by chunk in the executor and sent
+    with chunked transfer encoding, so long ranges stream in constant memory.
+    """
+    if fix_archive is None:
+        return web.json_response({"error": "Archive is not enabled"}, status=404)
+    fmt = request.query.get("format", "geojson")
+    try:
+        simplify = float(request.query["simplify"]) if "simplify" in request.query else None
+    except ValueError:
+        return web.json_response({"error": "simplify must be a number"}, status=400)
+    try:
+        chunks = track_export.export(fix_archive, fmt, request.query.get("start"), request.query.get("end"),
+                                     request.query.get("receiver"), simplify)
+    except ValueError as e:
+        return web.json_response({"error": str(e)}, status=400)
+    _, content_type, extension = track_export.EXPORT_FORMATS[fmt]
+    response = web.StreamResponse(headers={"Content-Type": content_type,
+                                           "Content-Disposition": f'attachment; filename="track.{extension}"'})
+    response.enable_chunked_encoding()
+    await response.prepare(request)
+    loop = asyncio.get_running_loop()
+    reading = None
+    try:
+        while True:
+            # Shielded so that on cancellation the future still tracks the executor thread.
+            reading = loop.run_in_executor(None, next, chunks, None)
+            chunk = await asyncio.shield(reading)
+            if chunk is None:
+                break
+            await response.write(chunk)
+        await response.write_eof()
+    except ConnectionResetError:
+        logger.debug("Export client disconnected")
+    finally:
+        # Close the open archive segment now rather than at garbage collection; a
+        # generator still running in the executor can only be closed once it yields.
+        if reading is not None and not reading.done():
+            reading.add_done_callback(lambda _: chunks.close())
+        else:
+            chunks.close()
+    return response
+
+async def get_sky(request):
+    """Handle HTTP GET /sky[?receiver=top_gps][&history=1] with full sky snapshots."""
+    history = request.query.get("history") in ("1", "true")
+    receiver = request.query.get("receiver")
+    if receiver:
+        model = sky_models.get(receiver)
+        if model is None:
+            return web.json_response({"error": f"No sky data for receiver {receiver}"}, status=404)
+        return web.json_response(model.snapshot(history))
+    return web.json_response({"receivers": {label: model.snapshot(history) for label, model in list(sky_models.items())}})
+
+async def get_receiver_health(request):
+    """Handle HTTP GET /health requests."""
+    if health_monitor is None:
+        return web.json_response({"error": "No receivers yet"}, status=503)
+    return web.json_response(health_monitor.status())
+
+async def monitor_receiver_health():
+    """Score the receivers every HEALTH_INTERVAL and push the status to local clients when it changes."""
+    published = 0
+    while True:
+        await asyncio.sleep(HEALTH_INTERVAL)
+        if health_monitor is None:
+            continue
+        try:
+            now = time.time()
+            if health_monitor.evaluate(now) or now - published >= HEALTH_PUBLISH_INTERVAL:
+                await send_to_all_clients(json.dumps(health_monitor.status(), separators=(',', ':')))
+                published = now
+        except Exception as e:
+            logger.error(f"Error evaluating receiver health: {e}")
+
+async def get_ready(request):
+    """Handle HTTP GET /ready: 200 once the servers and gpsd are up, 503 before, with startup milestones."""
+    status = readiness.status()
+    return web.json_response(status, status=200 if status["ready"] else 503)
+
+def fix_response(request):
+    """Response for the newest fix from its pre-encoded body: 304 for a matching If-None-Match, gzip if accepted."""
+    headers = {"ETag": gps_feed.etag, "Last-Modified": gps_feed.last_modified, "X-GPS-Seq": str(gps_feed.seq),
+               "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if gps_feed.not_modified(request.headers.get("If-None-Match")):
+        return web.Response(status=304, headers=headers)
+    if HTTP_GZIP and 'gzip' in request.headers.get("Accept-Encoding", ""):
+        body = gps_feed.gzip_body()
+        if body is not None:
+            headers["Content-Encoding"] = "gzip"
+            return web.Response(body=body, content_type='application/json', headers=headers)
+    return web.Response(body=gps_feed.body, content_type='application/json', headers=headers)
 
 async def get_gps_data(request):
-    """Handle HTTP GET /gps requests."""
-    global latest_gps_data
-    if latest_gps_data:
-        return web.json_response(latest_gps_data)
+    """Handle HTTP GET /gps requests; with ?since=<seq>[&timeout=<s>] wait for a fix newer than seq (long poll).
+
+    The newest fix is served with its "seq" from bytes encoded once per fix,
+    with an ETag so pollers get 304 Not Modified until the next fix.
+    """
+    if "since" in request.query:
+        try:
+            since = int(request.query["since"])
+            timeout = min(float(request.query.get("timeout", LONG_POLL_TIMEOUT)), LONG_POLL_MAX_TIMEOUT)
+        except ValueError:
+            return web.json_response({"error": "since must be an integer and timeout a number"}, status=400)
+        if not await gps_feed.wait_newer(since, max(timeout, 0)):
+            return web.Response(status=204, headers={"X-GPS-Seq": str(gps_feed.seq)})
+        # The newest fix; fixes published between two polls are skipped.
+        return fix_response(request)
+    if gps_feed.body is not None:
+        return fix_response(request)
     return web.json_response({"error": "No GPS data available"}, status=404)
 
+async def stream_gps_data(request):
+    """Handle HTTP GET /gps/stream: Server-Sent Events, one "fix" event (id = seq) per published fix.
+
+    A client that falls behind gets the newest fix next. EventSource resumes
+    with Last-Event-ID, which skips the fix it already has.
+    """
+    try:
+        seq = int(request.headers.get("Last-Event-ID", -1))
+    except ValueError:
+        seq = -1
+    response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache",
+                                           "X-Accel-Buffering": "no"})
+    await response.prepare(request)
+    try:
+        await response.write(b"retry: %d\n\n" % SSE_RETRY_MS)
+        while True:
+            if await gps_feed.wait_newer(seq, SSE_KEEPALIVE):
+                seq = gps_feed.seq
+                await response.write(gps_feed.event)
+            else:
+                await response.write(b": keepalive\n\n")
+    except ConnectionResetError:
+        logger.debug("SSE client disconnected")
+    return response
+
 async def start_websocket_server():
     """Start the WebSocket server."""
     if not is_port_free(WEBSOCKET_PORT):
@@ -275,61 +669,147 @@ async def start_http_server():
     """Start the HTTP server."""
     app = web.Application()
     app.router.add_get('/gps', get_gps_data)
+    app.router.add_get('/gps/stream', stream_gps_data)
+    app.router.add_get('/anchor', get_anchor_watch)
+    app.router.add_post('/anchor/acknowledge', acknowledge_anchor_alarm)
+    app.router.add_get('/gps/history', get_gps_history)
+    app.router.add_get('/gps/rollups', get_gps_rollups)
+    app.router.add_get('/export', export_track)
+    app.router.add_get('/sky', get_sky)
+    app.router.add_get('/health', get_receiver_health)
+    app.router.add_get('/ready', get_ready)
     runner = web.AppRunner(app)
     await runner.setup()
     site = web.TCPSite(runner, '0.0.0.0', HTTP_PORT)
     await site.start()
     logger.info(f"HTTP server started on http://0.0.0.0:{HTTP_PORT}")
 
-async def send_to_external_websocket():
-    """Connect to external WebSocket server and send GPS data."""
-    while True:
-        try:
-            async with websockets.connect(EXTERNAL_WEBSOCKET_URL) as websocket:
-                logger.info(f"Connected to external WebSocket server: {EXTERNAL_WEBSOCKET_URL}")
-                await send_offline_data(websocket)  # Send any offline data
-                while True:
-                    try:
-                        gps_text = gps_data_queue.get_nowait()
-                        parsed_data = await parse_gps_data(gps_text)
-                        if parsed_data:
-                            global latest_gps_data
-                            latest_gps_data = parsed_data
-                            try:
-                                await websocket.send(json.dumps(parsed_data))
-                                logger.info(f"Sent GPS data to external server: {parsed_data}")
-                            except Exception as e:
-                                logger.error(f"Failed to send to external server: {e}")
-                                log_offline_data(parsed_data)
-                                raise
-                        gps_data_queue.task_done()
-                    except Empty:
-                        await asyncio.sleep(0.1)
-                    except Exception as e:
-                        logger.error(f"Error processing GPS data for external server: {e}")
-                        raise
-        except Exception as e:
-            logger.error(f"Failed to connect to external WebSocket server: {e}")
-            await asyncio.sleep(RECONNECT_DELAY)
+async def wait_for_archive(wakeup, timeout):
+    """Wait until the archive grows or timeout seconds pass (None = no limit)."""
+    if timeout is not None and timeout <= 0:
+        return
+    try:
+        await asyncio.wait_for(wakeup.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+
+def uplink_destinations():
+    """UPLINK_DESTINATIONS as configured, or the single primary destination at EXTERNAL_WEBSOCKET_URL."""
+    destinations = UPLINK_DESTINATIONS
+    if isinstance(destinations, str):  # Set from the environment
+        destinations = json.loads(destinations)
+    if destinations is None:
+        return [{"name": "primary", "url": EXTERNAL_WEBSOCKET_URL}]
+    if not isinstance(destinations, list) or not all(isinstance(destination, dict) and "name" in destination
+                                                     and "url" in destination for destination in destinations):
+        raise ValueError(f"UPLINK_DESTINATIONS must be a list of {{\"name\", \"url\"}} objects, got {destinations!r}")
+    return destinations
 
-async def broadcast_gps_data():
-    """Broadcast GPS data to local WebSocket clients."""
+def uplink_urls(destination):
+    """Addresses to try for a destination as currently configured, so a reloaded URL applies on the next connection."""
+    try:
+        destination = next((current for current in uplink_destinations() if current["name"] == destination["name"]),
+                           destination)
+    except ValueError as e:
+        logger.error(f"{e}; keeping {destination['url']}")
+    url = destination["url"]
+    return url if isinstance(url, list) else [url]
+
+async def send_to_external_websocket(destination, archive):
+    """Deliver archived fixes to one external WebSocket server from its own cursor."""
+    name = destination["name"]
+    urls = uplink_urls(destination)
+    reader = gps_archive.ArchiveReader(archive, os.path.join(ARCHIVE_DIR, 'cursors', f"{name}.json"))
+    rate_controller = uplink_rate.UplinkRateController() if UPLINK_RATE_CONTROL else None
+    wakeup = asyncio.Event()
+    archive_wakeups.append(wakeup)
+    loop = asyncio.get_running_loop()
+    attempt = 0
+    try:
+        while True:
+            if attempt % len(urls) == 0:
+                urls = uplink_urls(destination)
+            url = urls[attempt % len(urls)]
+            try:
+                async with websockets.connect(url, **uplink_connect_options()) as websocket:
+                    lag = reader.lag_fixes()
+                    logger.info(f"[{name}] Connected to external WebSocket server {url}, about {lag} fixes behind")
+                    encoder, batching = await negotiate_uplink(websocket)
+                    max_fixes = UPLINK_BATCH_MAX_FIXES if batching else 1
+                    batch = []
+                    deadline = None
+                    last_save = last_lag = loop.time()
+                    reads = 0
+                    while True:
+                        wakeup.clear()
+                        parsed_data = reader.read()
+                        reads += 1
+                        if reads % UPLINK_YIELD_EVERY == 0:
+                            # A backlog is read without waiting on the archive; let the other tasks run.
+                            await asyncio.sleep(0)
+                        if parsed_data is None:
+                            if not batch or loop.time() < deadline:
+                                await wait_for_archive(wakeup, deadline - loop.time() if batch else None)
+                                continue
+                        # Fixes the rate controller skips stay in the archive.
+                        elif rate_controller is None or rate_controller.should_send(parsed_data):
+                            if not batch:
+                                deadline = loop.time() + UPLINK_BATCH_MAX_DELAY
+                            batch.append(parsed_data)
+                        if not batch or (len(batch) < max_fixes and loop.time() < deadline):
+                            continue
+                        started = time.monotonic()
+                        await websocket.send(encode_uplink(batch, encoder))
+                        logger.info(f"[{name}] Sent {len(batch)} GPS fixes to external server")
+                        batch = []
+                        reader.commit()
+                        if loop.time() - last_save >= CURSOR_SAVE_INTERVAL:
+                            reader.save()
+                            last_save = loop.time()
+                        if rate_controller:
+                            if loop.time() - last_lag >= UPLINK_LAG_INTERVAL:
+                                lag = reader.lag_fixes()
+                                last_lag = loop.time()
+                            rate_controller.record_send(time.monotonic() - started, lag)
+            except Exception as e:
+                logger.error(f"[{name}] Lost external WebSocket server {url}: {e}")
+                reader.rewind()
+                reader.save()
+                if rate_controller:
+                    # Rewound fixes must be judged again from a clean slate.
+                    rate_controller = uplink_rate.UplinkRateController()
+                attempt += 1
+                await asyncio.sleep(RECONNECT_DELAY)
+    finally:
+        reader.save()
+        reader.close()
+
+async def broadcast_gps_data(archive):
+    """Convert queued fixes once and fan them out to the archive, local clients and the uplinks."""
     while True:
         try:
-            gps_text = gps_data_queue.get_nowait()
-            parsed_data = await parse_gps_data(gps_text)
+            item = gps_data_queue.get_nowait()
+            if isinstance(item, dict):
+                # Sky model deltas only go to local clients, unthrottled so none are skipped.
+                await send_to_all_clients(json.dumps(item, separators=(',', ':')))
+                gps_data_queue.task_done()
+                continue
+            parsed_data = item.to_dict() if isinstance(item, fix_records.Fix) else await parse_gps_data(item)
             if parsed_data:
                 global latest_gps_data
                 latest_gps_data = parsed_data
-                if connected_clients:
-                    for client in connected_clients.copy():
-                        try:
-                            await client.send(json.dumps(parsed_data))
-                            logger.info(f"Broadcasted GPS data to local clients: {parsed_data}")
-                        except websockets.exceptions.ConnectionClosed:
-                            connected_clients.discard(client)
-                else:
-                    log_offline_data(parsed_data)
+                gps_feed.publish(parsed_data)
+                message = gps_feed.message
+                if archive:
+                    archive.append(parsed_data)
+                    for wakeup in archive_wakeups:
+                        wakeup.set()
+                record_fix_history(parsed_data)
+                if 'first_fix' not in readiness.milestones and geodesy.primary_position(parsed_data):
+                    readiness.mark('first_fix')
+                if anchor_watcher:
+                    await update_anchor_watch()
+                await send_to_local_clients(parsed_data, message)
             gps_data_queue.task_done()
         except Empty:
             await asyncio.sleep(0.1)
@@ -337,94 +817,141 @@ async def broadcast_gps_data():
             logger.error(f"Error broadcasting GPS data to local clients: {e}")
             await asyncio.sleep(0.1)
 
+def configure_serial_device(device):
+    """Set the receiver's baud rate before gpsd opens it."""
+    success, _, _ = run_command(['sudo', 'stty', '-F', device, '9600'])
+    if not success:
+        logger.warning(f"Failed to set baud rate for {device}")
+
+def configure_serial_devices(devices):
+    """Set the baud rate of all receivers concurrently rather than one sudo stty after another."""
+    if devices:
+        with ThreadPoolExecutor(max_workers=len(devices)) as pool:
+            list(pool.map(configure_serial_device, devices))
+
+def on_gps_devices_changed(devices, added, removed, device_changes):
+    """Device watcher callback: reconfigure gpsd, then let the reader thread rebind receivers."""
+    with gpsd_setup_lock:
+        if 'gpsd' in readiness.milestones:
+            for device in removed:
+                device_watcher.gpsd_control(GPSD_SOCKET, '-', device)
+            for device in added:
+                configure_serial_device(device)
+                device_watcher.gpsd_control(GPSD_SOCKET, '+', device)
+        # Otherwise process_gps_data is still waiting for a first receiver and starts gpsd with these.
+        device_changes.put(devices)
+
+def wait_for_devices(device_changes):
+    """Block until the device watcher reports at least one receiver; returns the devices, or None on shutdown."""
+    while not shutting_down.is_set():
+        try:
+            devices = device_changes.get(timeout=1)
+        except Empty:
+            continue
+        while not device_changes.empty():
+            devices = device_changes.get_nowait()
+        if devices:
+            return devices
+    return None
+
 def process_gps_data():
     """Process GPS data and put it into the queue."""
     logger.info("Starting GPS data processing")
-    SERIAL_DEVICES = detect_gps_devices()
-    if not SERIAL_DEVICES:
-        logger.error("No GPS devices found, exiting")
-        return
-    for device in SERIAL_DEVICES:
-        success, _, _ = run_command(['sudo', 'stty', '-F', device, '9600'])
-        if not success:
-            logger.warning(f"Failed to set baud rate for {device}")
-    if not ensure_gpsd_running(SERIAL_DEVICES):
-        logger.error("Cannot proceed without gpsd running")
-        return
-    device_data = {device: {
-        'latitude': None,
-        'longitude': None,
-        'altitude': None,
-        'speed': None,
-        'satellites': None,
-        'timestamp': None,
-        'heading': None,
-        'satellite_prns': []
-    } for device in SERIAL_DEVICES}
-    last_data_time = {device: time.time() for device in SERIAL_DEVICES}
-    while True:
+    replay = None
+    watcher = None
+    device_changes = Queue()  # Device lists from the watcher, applied here so only this thread touches the receivers
+    if REPLAY_FILE:
+        replay = gps_replay.ReplaySession(REPLAY_FILE, speed=REPLAY_SPEED)
+        SERIAL_DEVICES = replay.devices
+        if not SERIAL_DEVICES:
+            logger.error(f"No devices recorded in {REPLAY_FILE}, exiting")
+            return
+    else:
+        SERIAL_DEVICES = detect_gps_devices()
+        if not SERIAL_DEVICES and DEVICE_HOTPLUG:
+            logger.warning("No GPS devices found, waiting for one to be plugged in")
+            readiness.mark(startup.WAITING_MILESTONE)
+            watcher = device_watcher.DeviceWatcher([], functools.partial(on_gps_devices_changed, device_changes=device_changes),
+                                                   limit=MAX_RECEIVERS).start()
+            SERIAL_DEVICES = wait_for_devices(device_changes)
+            if shutting_down.is_set():
+                return
+        if not SERIAL_DEVICES:
+            logger.error("No GPS devices found, exiting")
+            return
+        with gpsd_setup_lock:
+            # Lists the watcher queued before gpsd was up are started with it rather than added later.
+            while not device_changes.empty():
+                SERIAL_DEVICES = device_changes.get_nowait() or SERIAL_DEVICES
+            configure_serial_devices(SERIAL_DEVICES)
+            if not ensure_gpsd_running(SERIAL_DEVICES):
+                logger.error("Cannot proceed without gpsd running")
+                return
+        if DEVICE_HOTPLUG and watcher is None:
+            watcher = device_watcher.DeviceWatcher(SERIAL_DEVICES, functools.partial(on_gps_devices_changed, device_changes=device_changes),
+                                                   limit=MAX_RECEIVERS).start()
+    readiness.mark('gpsd')
+    global session_recorder
+    recorder = session_recorder = gps_replay.SessionRecorder(RECORD_FILE, SERIAL_DEVICES) if RECORD_FILE else None
+    roles = device_watcher.RoleMap()
+    bound = roles.assign(SERIAL_DEVICES)
+    device_order = [device for device, _ in bound]  # Role order: top_gps first
+    device_labels = dict(bound)
+    device_data = {device: fix_records.ReceiverState(device, label) for device, label in bound}
+    global health_monitor
+    health_monitor = receiver_health.HealthMonitor([label for _, label in bound], DATA_TIMEOUT)
+    while not shutting_down.is_set():
         try:
-            session = gps.gps(host=GPSD_HOST, port=GPSD_PORT, mode=gps.WATCH_ENABLE | gps.WATCH_JSON)
-            while True:
+            session = replay or gps.gps(host=GPSD_HOST, port=GPSD_PORT, mode=gps.WATCH_ENABLE | gps.WATCH_JSON)
+            while not shutting_down.is_set():
                 try:
-                    report = session.next()
+                    try:
+                        report = session.next()
+                    finally:
+                        current_time = replay.received if replay else time.time()
+                        if recorder:
+                            recorder.record(session.response, current_time)
                     if not report:
                         continue
-                    current_time = time.time()
-                    for device in SERIAL_DEVICES:
-                        if current_time - last_data_time[device] > DATA_TIMEOUT:
-                            logger.warning(f"No data received from {device} for {DATA_TIMEOUT} seconds")
+                    if replay and replay.devices != SERIAL_DEVICES:
+                        # A later session header: the recorded receivers changed here.
+                        device_changes.put(list(replay.devices))
+                    if not device_changes.empty():
+                        # gpsd announces added and removed devices, so this runs soon after a change.
+                        while not device_changes.empty():
+                            SERIAL_DEVICES = device_changes.get_nowait()
+                        bound = roles.assign(SERIAL_DEVICES)
+                        device_order = [device for device, _ in bound]
+                        device_labels = dict(bound)
+                        device_data = {device: device_data[device] if device in device_data and device_data[device].label == label
+                                       else fix_records.ReceiverState(device, label) for device, label in bound}
+                        health_monitor.set_receivers([label for _, label in bound])
+                        if recorder:
+                            recorder.set_devices(SERIAL_DEVICES)
+                        logger.info(f"Receivers rebound: {', '.join(f'{label}={device}' for device, label in bound)}")
                     device = getattr(report, 'device', None)
                     if device not in SERIAL_DEVICES:
                         logger.debug(f"Ignoring report for unknown device: {device}")
                         continue
-                    last_data_time[device] = current_time
-                    timestamp = datetime.now(pytz.UTC).strftime('%Y-%m-%d %H:%M:%S.%f')
+                    timestamp = datetime.fromtimestamp(current_time, timezone.utc).strftime('%Y-%m-%d %H:%M:%S.%f')
                     if report.get('class') == 'TPV':
-                        lat = getattr(report, 'lat', None)
-                        lon = getattr(report, 'lon', None)
-                        alt = getattr(report, 'alt', None)
-                        speed = getattr(report, 'speed', None)
-                        heading = getattr(report, 'track', None)
-                        if isinstance(speed, (int, float)):
-                            speed = round(speed * 3.6, 2)  # Convert m/s to km/h
-                        if isinstance(heading, (int, float)):
-                            heading = round(heading, 1)
-                        device_data[device].update({
-                            'timestamp': timestamp,
-                            'latitude': lat,
-                            'longitude': lon,
-                            'altitude': alt,
-                            'speed': speed,
-                            'heading': heading
-                        })
+                        device_data[device].update_tpv(report, timestamp)
+                        health_monitor.observe_tpv(device_labels[device], report, current_time, time.time())
                     elif report.get('class') == 'SKY':
-                        satellites = len([sat for sat in report.get('satellites', []) if sat.get('used', False)])
-                        prns = [str(sat.get('PRN', 'Unknown')) for sat in report.get('satellites', []) if sat.get('used', False)]
-                        device_data[device].update({
-                            'satellites': satellites,
-                            'satellite_prns': prns
-                        })
-                        logger.info(f"Device {device} using {satellites} satellites with PRNs: {prns}")
-                    output = [
-                        f"GPS Data (Real-Time): {timestamp}",
-                        f"Ship ID: {SHIP_ID}",
-                        f"Device ID: {get_device_id()}",
-                        f"Heading: {device_data[device].get('heading', 'Unknown') if device_data[device].get('heading') is not None else 'Unknown'}"
-                    ]
-                    for idx, dev in enumerate(sorted(SERIAL_DEVICES)):
-                        label = "Top GPS" if idx == 0 else "Bottom GPS"
-                        data = device_data.get(dev, {})
-                        output.extend([
-                            f"{label} ({dev}):",
-                            f"  Latitude: {data.get('latitude', 'Unknown') if data.get('latitude') is not None else 'Unknown'}",
-                            f"  Longitude: {data.get('longitude', 'Unknown') if data.get('longitude') is not None else 'Unknown'}",
-                            f"  Altitude (m): {data.get('altitude', 'Unknown') if data.get('altitude') is not None else 'Unknown'}",
-                            f"  Speed (km/h): {data.get('speed', 'Unknown') if data.get('speed') is not None else 'Unknown'}",
-                            f"  Satellites: {data.get('satellites', 'Unknown') if data.get('satellites') is not None else 'Unknown'}",
-                            f"  Satellite PRNs: {', '.join(data.get('satellite_prns', ['Unknown']))}"
-                        ])
-                    output_str = "\n".join(output) + "\n---------------------------\n"
+                        device_data[device].update_sky(report)
+                        health_monitor.observe_sky(device_labels[device], report, current_time, time.time())
+                        satellites = device_data[device].satellites
+                        logger.info(f"Device {device} using {len(satellites)} satellites with PRNs: {satellites.prns()}")
+                        label = device_labels[device]
+                        model = sky_models.get(label)
+                        if model is None:
+                            model = sky_models[label] = sky_model.SkyModel(label)
+                        delta = model.update(report, current_time)
+                        if delta:
+                            gps_data_queue.put(delta)
+                    fix = fix_records.Fix(timestamp, SHIP_ID, get_device_id(), device_data[device].heading,
+                                          tuple(device_data[dev].copy() for dev in device_order), health_monitor.primary)
+                    output_str = fix.to_text()
                     print(output_str)
                     logger.info(output_str)
                     try:
@@ -433,31 +960,129 @@ def process_gps_data():
                             f.write(output_str)
                     except Exception as e:
                         logger.error(f"Failed to write to output file: {e}")
-                    gps_data_queue.put(output_str)
+                    gps_data_queue.put(fix)
+                except StopIteration:
+                    break
                 except Exception as e:
                     logger.error(f"Error processing report: {e}")
                     break
             session.close()
+            if replay and replay.finished:
+                count, errors, elapsed, rate = replay.stats()
+                logger.info(f"Replay finished: {count} reports ({errors} unparseable) in {elapsed:.2f} s, {rate:.0f} reports/s")
+                break
         except Exception as e:
             logger.error(f"Failed to connect to gpsd: {e}")
             time.sleep(RECONNECT_DELAY)
+    if recorder:
+        recorder.close()
+
+def load_components(components):
+    """Import the modules the enabled components need; returns the normalised component set."""
+    global gps, websockets, web, gps_archive, fix_rollups, track_export, viewer_subscriptions, gps_replay
+    components = set(components)
+    if "uplink" in components:
+        components.add("archive")
+    if not REPLAY_FILE:
+        import gps
+    if REPLAY_FILE or RECORD_FILE:
+        import gps_replay
+    if components & {"local_ws", "uplink"}:
+        import websockets
+    if "local_ws" in components:
+        import viewer_subscriptions
+    if "http" in components:
+        from aiohttp import web
+    if "archive" in components:
+        import gps_archive
+        import fix_rollups
+        if "http" in components:
+            import track_export
+    return components
 
-async def main():
-    """Run WebSocket and HTTP servers with GPS data processing concurrently."""
-    server = await start_websocket_server()
-    await start_http_server()
+async def watch_config(config, uplinks):
+    """Re-apply hot settings whenever the config file changes."""
+    while True:
+        await asyncio.sleep(CONFIG_RELOAD_INTERVAL)
+        try:
+            applied = config.reload_if_changed()
+            if uplinks and {'EXTERNAL_WEBSOCKET_URL', 'UPLINK_DESTINATIONS'} & set(applied):
+                # URLs are re-read when each uplink reconnects; its task only exists for the destinations at startup.
+                names = {destination["name"] for destination in uplink_destinations()}
+                if names != {destination["name"] for destination in uplinks}:
+                    logger.warning(f"Uplink destinations changed to {sorted(names)}; restart to add or remove uplinks")
+        except Exception as e:
+            logger.error(f"Error reloading {config.path}: {e}")
+
+async def main(components=None, config=None):
+    """Run the enabled servers and uplinks with GPS data processing concurrently."""
+    global fix_history, anchor_watcher, fix_archive, fix_rollup_store
+    components = load_components(PROFILES[PROFILE] if components is None else components)
+    fix_history = fix_ring.FixHistory(FIX_HISTORY_CAPACITY)
+    anchor_watcher = anchor_watch.AnchorWatch(fix_history.ring(ANCHOR_WATCH_SOURCE)) if ANCHOR_WATCH else None
+    rss = startup.rss_kb()
+    logger.info(f"Profile {PROFILE}: {', '.join(sorted(components)) or 'ingest only'}; "
+                f"loaded {startup.process_age():.2f} s after process start, RSS {rss} kB")
     loop = asyncio.get_event_loop()
+    # systemctl stop sends SIGTERM; cancelling main() runs the cleanup below like Ctrl-C does.
+    loop.add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    # Device setup and gpsd start run in the executor while the servers come up.
+    gps_reader = loop.run_in_executor(None, process_gps_data)
+    servers = []
+    if "local_ws" in components:
+        servers.append(start_websocket_server())
+    if "http" in components:
+        servers.append(start_http_server())
+    server = (await asyncio.gather(*servers))[0] if servers else None
+    readiness.mark('servers')
+    archive = fix_archive = gps_archive.FixArchive(ARCHIVE_DIR) if "archive" in components else None
+    if archive:
+        fix_rollup_store = fix_rollups.RollupStore(os.path.join(ARCHIVE_DIR, 'rollups'))
+    uplinks = uplink_destinations() if "uplink" in components else []
     try:
         await asyncio.gather(
-            loop.run_in_executor(None, process_gps_data),
-            broadcast_gps_data(),
-            send_to_external_websocket(),
-            server.wait_closed()
+            gps_reader,
+            broadcast_gps_data(archive),
+            monitor_receiver_health(),
+            *([watch_config(config, uplinks)] if config else []),
+            *(send_to_external_websocket(destination, archive) for destination in uplinks),
+            *([server.wait_closed()] if "local_ws" in components else [])
         )
-    except KeyboardInterrupt:
+    except (KeyboardInterrupt, asyncio.CancelledError):
         logger.info("Shutting down")
-        server.close()
-        await server.wait_closed()
+        if "local_ws" in components:
+            server.close()
+            await server.wait_closed()
+    finally:
+        shutting_down.set()
+        if session_recorder:
+            session_recorder.close()
+        if fix_rollup_store:
+            fix_rollup_store.close()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="GPS WebSocket service")
+    parser.add_argument('--record', metavar='FILE', help="record the raw gpsd stream to FILE")
+    parser.add_argument('--replay', metavar='FILE', help="replay a recorded gpsd session instead of reading gpsd")
+    parser.add_argument('--speed', type=float, help=f"replay speed multiplier, 0 = as fast as possible (default {REPLAY_SPEED})")
+    parser.add_argument('--profile', choices=sorted(PROFILES), help=f"which optional components to run (default {PROFILE})")
+    parser.add_argument('--config', metavar='FILE', default=CONFIG_FILE, help="JSON settings file (default $GPS_CONFIG or %(default)s)")
+    args = parser.parse_args()
+    config = gps_config.Config(sys.modules[__name__], args.config, 'GPS_', HOT_SETTINGS, exclude=('CONFIG_FILE', 'HOT_SETTINGS'))
+    # Per-vessel tuning of the helper modules, e.g. {"anchor_watch": {"MAX_SWING_RADIUS_M": 80}}
+    # or GPS_ANCHOR_WATCH_MAX_SWING_RADIUS_M=80. HealthMonitor takes DATA_TIMEOUT, not STALE_AFTER.
+    config.add_section('uplink_rate', uplink_rate, uplink_rate.HOT_SETTINGS)
+    config.add_section('anchor_watch', anchor_watch, anchor_watch.HOT_SETTINGS,
+                       exclude=('STATE_IDLE', 'STATE_ARMED', 'STATE_ALARM'))
+    config.add_section('receiver_health', receiver_health, receiver_health.HOT_SETTINGS,
+                       exclude=('OK', 'DEGRADED', 'NO_FIX', 'STALE', 'STALE_AFTER'))
+    config.load()
+    gps_config.log_to_file(SERVICE_LOG_FILE)
+    # Command-line options win over the config file and the environment.
+    PROFILE = args.profile or PROFILE
+    if PROFILE not in PROFILES:
+        parser.error(f"unknown PROFILE {PROFILE!r}, expected one of {', '.join(sorted(PROFILES))}")
+    RECORD_FILE = args.record or RECORD_FILE
+    REPLAY_FILE = args.replay or REPLAY_FILE
+    REPLAY_SPEED = args.speed if args.speed is not None else REPLAY_SPEED
+    asyncio.run(main(config=config))
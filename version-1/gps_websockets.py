@@ -7,9 +7,9 @@ import glob
 import asyncio
 import websockets
 import json
-import pytz
 import socket
-from datetime import datetime
+import startup
+from datetime import datetime, timezone
 from aiohttp import web
 from queue import Queue, Empty
 
@@ -33,7 +33,7 @@ HTTP_PORT = 8080
 TIMEOUT = 10
 RECONNECT_DELAY = 5
 DATA_TIMEOUT = 30
-INITIAL_GPS_DELAY = 5  # Delay to allow GPS fix
+GPSD_START_TIMEOUT = 10  # Seconds to wait for gpsd to accept connections
 
 # Global variables
 latest_gps_data = None
@@ -283,7 +283,9 @@ def process_gps_data():
         logger.error("Cannot proceed without gpsd running")
         return
 
-    time.sleep(INITIAL_GPS_DELAY)  # Wait for GPS modules to acquire fix
+    # No need to wait for a fix here: the loop below simply gets no position until there is one.
+    if startup.wait_for_port(GPSD_HOST, GPSD_PORT, GPSD_START_TIMEOUT) is None:
+        logger.warning(f"gpsd not accepting connections after {GPSD_START_TIMEOUT} seconds, retrying in the read loop")
 
     device_data = {device: {
         'latitude': None,
@@ -315,7 +317,7 @@ def process_gps_data():
                         logger.debug(f"Ignoring report for unknown device: {device}")
                         continue
                     last_data_time[device] = current_time
-                    timestamp = datetime.now(pytz.UTC).strftime('%Y-%m-%d %H:%M:%S.%f')
+                    timestamp = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S.%f')
 
                     if report.get('class') == 'TPV':
                         lat = getattr(report, 'lat', None)
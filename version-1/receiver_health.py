@@ -0,0 +1,214 @@
+import logging
+import statistics
+
+import geodesy
+
+logger = logging.getLogger(__name__)
+
+# Receiver health scoring. The gpsd reader thread only records raw values per
+# receiver (observe_tpv / observe_sky, a few attribute writes); evaluate() runs
+# on a timer in the event loop, scores every receiver 0-100 and picks the
+# primary receiver used for the published position.
+#
+# Score weights (sum to 100):
+WEIGHT_FIX = 30  # 3D fix full, 2D fix half
+WEIGHT_SATELLITES = 20  # Satellites used, full at FULL_SATELLITES
+WEIGHT_SNR = 15  # Mean SNR of used satellites, from SNR_FLOOR to SNR_FULL dB-Hz
+WEIGHT_HDOP = 15  # Full at HDOP_GOOD or better, zero at HDOP_POOR
+WEIGHT_RATE = 10  # TPV reports per second relative to EXPECTED_RATE
+WEIGHT_AGREEMENT = 10  # Distance to the other receivers, full within AGREE_M, zero beyond DISAGREE_M
+FULL_SATELLITES = 12
+SNR_FLOOR = 20.0
+SNR_FULL = 40.0
+HDOP_GOOD = 1.0
+HDOP_POOR = 5.0
+EXPECTED_RATE = 1.0  # Hz
+AGREE_M = 10.0
+DISAGREE_M = 100.0
+STALE_AFTER = 30  # Seconds without a report before a receiver counts as stale
+HEALTHY_SCORE = 60  # Scores below this are "degraded"
+SWITCH_MARGIN = 10  # A receiver must beat the current primary by this much to replace it
+# Settings a config reload may change: read on each evaluation. STALE_AFTER is
+# bound when the monitor is created.
+HOT_SETTINGS = ('WEIGHT_FIX', 'WEIGHT_SATELLITES', 'WEIGHT_SNR', 'WEIGHT_HDOP', 'WEIGHT_RATE',
+                'WEIGHT_AGREEMENT', 'FULL_SATELLITES', 'SNR_FLOOR', 'SNR_FULL', 'HDOP_GOOD', 'HDOP_POOR',
+                'EXPECTED_RATE', 'AGREE_M', 'DISAGREE_M', 'HEALTHY_SCORE', 'SWITCH_MARGIN')
+
+OK = "ok"
+DEGRADED = "degraded"
+NO_FIX = "no_fix"
+STALE = "stale"
+
+
+def _ramp(value, low, high):
+    """0 at low, 1 at high, linear in between (low may exceed high for decreasing ramps)."""
+    if value is None:
+        return 0.0
+    fraction = (value - low) / (high - low)
+    return min(1.0, max(0.0, fraction))
+
+
+class ReceiverHealth:
+    """Raw observations and the latest score of one receiver."""
+    __slots__ = ('label', 'mode', 'latitude', 'longitude', 'last_report', 'reports', 'satellites', 'snr', 'hdop',
+                 'counted', 'rate', 'separation', 'score', 'state')
+
+    def __init__(self, label):
+        self.label = label
+        self.mode = 0  # gpsd TPV mode: 0/1 no fix, 2 2D, 3 3D
+        self.latitude = None
+        self.longitude = None
+        self.last_report = None  # Stream time of the last TPV or SKY report
+        self.reports = 0  # TPV reports seen, written only by the reader thread
+        self.satellites = None
+        self.snr = None
+        self.hdop = None
+        self.counted = 0  # Value of reports at the previous evaluation
+        self.rate = None
+        self.separation = None
+        self.score = 0
+        self.state = STALE
+
+    def score_now(self):
+        if self.state == STALE:
+            return 0
+        score = WEIGHT_FIX * (1.0 if self.mode >= 3 else 0.5 if self.mode == 2 else 0.0)
+        if self.satellites is not None:
+            score += WEIGHT_SATELLITES * min(1.0, self.satellites / FULL_SATELLITES)
+        score += WEIGHT_SNR * _ramp(self.snr, SNR_FLOOR, SNR_FULL)
+        score += WEIGHT_HDOP * _ramp(self.hdop, HDOP_POOR, HDOP_GOOD)
+        if self.rate is not None:
+            score += WEIGHT_RATE * min(1.0, self.rate / EXPECTED_RATE)
+        # A lone receiver has nothing to disagree with.
+        score += WEIGHT_AGREEMENT * (1.0 if self.separation is None else _ramp(self.separation, DISAGREE_M, AGREE_M))
+        return round(score)
+
+    def compact(self):
+        return {
+            "score": self.score,
+            "state": self.state,
+            "mode": self.mode,
+            "sats": self.satellites,
+            "snr": self.snr,
+            "hdop": self.hdop,
+            "hz": self.rate,
+            "sep_m": self.separation
+        }
+
+
+class HealthMonitor:
+    """Scores a set of receivers and keeps track of the primary one."""
+
+    def __init__(self, labels, stale_after=STALE_AFTER):
+        self.stale_after = stale_after
+        self.receivers = {label: ReceiverHealth(label) for label in labels}
+        self.primary = labels[0] if labels else None
+        self.latest = None  # Newest report time seen, in the reader's clock (replay time when replaying)
+        self.latest_wall = None  # Wall clock when that report was seen
+        self.evaluated = None  # Stream time of the previous evaluation
+
+    def set_receivers(self, labels):
+        """Track exactly these labels, keeping the history of ones already known."""
+        # Replaced rather than mutated, so evaluate() in the event loop never sees it change mid-iteration.
+        self.receivers = {label: self.receivers.get(label) or ReceiverHealth(label) for label in labels}
+        if self.primary not in self.receivers:
+            self.primary = labels[0] if labels else None
+
+    def observe_tpv(self, label, report, now, wall):
+        receiver = self.receivers[label]
+        mode = report.get('mode', 0)
+        receiver.mode = mode if isinstance(mode, int) else 0
+        lat = report.get('lat')
+        lon = report.get('lon')
+        if isinstance(lat, (int, float)) and isinstance(lon, (int, float)) and receiver.mode >= 2:
+            receiver.latitude, receiver.longitude = lat, lon
+        receiver.last_report = now
+        receiver.reports += 1
+        self.latest, self.latest_wall = now, wall
+
+    def observe_sky(self, label, report, now, wall):
+        receiver = self.receivers[label]
+        satellites = report.get('satellites')
+        if satellites is not None:
+            used = [sat.get('ss') for sat in satellites if sat.get('used', False)]
+            receiver.satellites = len(used)
+            snrs = [snr for snr in used if isinstance(snr, (int, float)) and snr > 0]
+            receiver.snr = round(sum(snrs) / len(snrs), 1) if snrs else None
+        hdop = report.get('hdop')
+        if isinstance(hdop, (int, float)):
+            receiver.hdop = round(hdop, 2)
+        receiver.last_report = now
+        self.latest, self.latest_wall = now, wall
+
+    def stream_time(self, wall):
+        """Current time in the reader's clock, so a replayed session is judged by its own timestamps."""
+        if self.latest is None:
+            return None
+        return self.latest + (wall - self.latest_wall)
+
+    def _update_separations(self, receivers):
+        positioned = [receiver for receiver in receivers.values()
+                      if receiver.state != STALE and receiver.mode >= 2 and receiver.latitude is not None]
+        for receiver in receivers.values():
+            others = [geodesy.haversine_m(receiver.latitude, receiver.longitude, other.latitude, other.longitude)
+                      for other in positioned if other is not receiver] if receiver in positioned else []
+            # With three or more receivers the median singles out the one that disagrees; the low
+            # median keeps an agreeing receiver's pair (one close, one outlier) from being averaged.
+            receiver.separation = round(statistics.median_low(others), 1) if others else None
+
+    def evaluate(self, wall):
+        """Rescore every receiver and reselect the primary; returns True if the primary or any state changed."""
+        now = self.stream_time(wall)
+        if now is None:
+            return False
+        elapsed = now - self.evaluated if self.evaluated is not None else None
+        self.evaluated = now
+        # One snapshot throughout: set_receivers() may replace the dict from the reader thread meanwhile.
+        receivers = self.receivers
+        previous = {label: receiver.state for label, receiver in receivers.items()}
+        for receiver in receivers.values():
+            reports = receiver.reports
+            if elapsed and elapsed > 0:
+                receiver.rate = round((reports - receiver.counted) / elapsed, 2)
+            receiver.counted = reports
+            if receiver.last_report is None:
+                receiver.last_report = now  # Silent since startup: start its timeout now
+            if now - receiver.last_report > self.stale_after:
+                receiver.state = STALE
+            elif receiver.mode < 2:
+                receiver.state = NO_FIX
+            else:
+                receiver.state = OK
+        self._update_separations(receivers)
+        changed = False
+        for receiver in receivers.values():
+            receiver.score = receiver.score_now()
+            if receiver.state == OK and receiver.score < HEALTHY_SCORE:
+                receiver.state = DEGRADED
+            if receiver.state != previous[receiver.label]:
+                changed = True
+                if receiver.state == STALE:
+                    logger.warning(f"No data received from {receiver.label} for {self.stale_after} seconds")
+                elif previous[receiver.label] == STALE and receiver.reports:
+                    logger.info(f"Receiver {receiver.label} is reporting again")
+        return self._select_primary(receivers) or changed
+
+    def _select_primary(self, receivers):
+        best = max(receivers.values(), key=lambda receiver: receiver.score, default=None)
+        if best is None or best.label == self.primary:
+            return False
+        current = receivers.get(self.primary)
+        if current is not None and current.state in (OK, DEGRADED) and best.score < current.score + SWITCH_MARGIN:
+            return False
+        if best.state in (STALE, NO_FIX) or receivers is not self.receivers:
+            return False  # Nothing usable, or rebound meanwhile and the next evaluation decides
+        logger.info(f"Primary receiver {self.primary} -> {best.label} (score {current.score if current else None} -> {best.score})")
+        self.primary = best.label
+        return True
+
+    def status(self):
+        return {
+            "type": "receiverHealth",
+            "primary": self.primary,
+            "receivers": {label: receiver.compact() for label, receiver in self.receivers.items()}
+        }
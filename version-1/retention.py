@@ -0,0 +1,414 @@
+import argparse
+import ctypes
+import ctypes.util
+import glob
+import gzip
+import json
+import logging
+import os
+import platform
+import shutil
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import fix_rollups
+import gps_archive
+import gps_config
+import uplink_codec
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler()]
+)
+logger = logging.getLogger(__name__)
+
+# Background retention for the files the GPS services leave on the Pi. Run it
+# as its own unit (gps_retention.service, idle CPU and IO scheduling) or from
+# cron with --once; either way it lowers its own priority first, so compaction
+# never competes with the ingest path for the SD card.
+#
+# Each pass, in order:
+#   1. Logs and other append-only files (FILE_STORES) larger than their
+#      rotate_mb are copied to <file>.<UTC time>.gz and truncated in place,
+#      so writers holding the file open in append mode carry on.
+#   2. Archive segments older than ARCHIVE_COMPRESS_AFTER_DAYS are gzipped,
+#      and after ARCHIVE_DOWNSAMPLE_AFTER_DAYS thinned to one fix per
+#      ARCHIVE_DOWNSAMPLE_SECONDS; the per-minute and per-hour rollups keep
+#      the summary of the dropped fixes.
+#   3. Files older than their store's max age are deleted, then the oldest
+#      files of any store over its quota.
+#   4. While the filesystem has less than MIN_FREE_MB free, the oldest
+#      deletable file of the lowest-priority store goes first.
+#
+# Live files are never deleted. Archive segments an uplink has not yet sent
+# (the day its cursor points into and later) and today's segment are never
+# compacted, and are deleted only as the last resort of step 4. A cursor of a
+# destination that was removed from UPLINK_DESTINATIONS keeps protecting the
+# archive until its file in <archive>/cursors is deleted.
+CONFIG_FILE = os.environ.get('RETENTION_CONFIG', '/home/mdt/retention_config.json')
+PASS_INTERVAL = 600  # Seconds between passes when running as a service
+FILE_STORES = [
+    # path: the live file; rotated copies sit next to it. Lower priority is deleted first under disk pressure.
+    {"name": "debug_log", "path": "/home/mdt/gps_debug.log", "rotate_mb": 5, "quota_mb": 20, "max_age_days": 7,
+     "priority": 0},
+    {"name": "output", "path": "/home/mdt/GPS/gps_output.txt", "rotate_mb": 20, "quota_mb": 100,
+     "max_age_days": 14, "priority": 1},
+    {"name": "service_log", "path": "/home/mdt/gps_websocket.log", "rotate_mb": 20, "quota_mb": 100,
+     "max_age_days": 30, "priority": 2},
+    {"name": "fleet_log", "path": "/home/mdt/ws_server.log", "rotate_mb": 20, "quota_mb": 100,
+     "max_age_days": 30, "priority": 2},
+    {"name": "offline_data", "path": "/home/mdt/gps_offline_data.json", "rotate_mb": 50, "quota_mb": 200,
+     "max_age_days": 90, "priority": 3},
+]
+ARCHIVE_DIR = '/home/mdt/gps_archive'  # As in gps_websocket_offline.py; cursors/ and rollups/ live inside it
+ARCHIVE_QUOTA_MB = 4096
+ARCHIVE_MAX_AGE_DAYS = 730  # 0 = keep forever
+ARCHIVE_COMPRESS_AFTER_DAYS = 2  # Gzip raw segments older than this
+ARCHIVE_DOWNSAMPLE_AFTER_DAYS = 90  # Thin compressed segments older than this, 0 = never
+ARCHIVE_DOWNSAMPLE_SECONDS = 60  # One fix kept per this many seconds
+ARCHIVE_PRIORITY = 5
+ROLLUP_MINUTE_MAX_AGE_DAYS = 400  # Hour rollups are kept as long as the archive
+MIN_FREE_MB = 500  # Free space below which files are deleted by priority, whatever their store's quota
+COPY_CHUNK = 1024 * 1024
+HOT_SETTINGS = (
+    'PASS_INTERVAL', 'FILE_STORES', 'ARCHIVE_QUOTA_MB', 'ARCHIVE_MAX_AGE_DAYS',
+    'ARCHIVE_COMPRESS_AFTER_DAYS', 'ARCHIVE_DOWNSAMPLE_AFTER_DAYS', 'ARCHIVE_DOWNSAMPLE_SECONDS', 'ARCHIVE_PRIORITY',
+    'ROLLUP_MINUTE_MAX_AGE_DAYS', 'MIN_FREE_MB',
+)
+
+IOPRIO_WHO_PROCESS = 1
+IOPRIO_CLASS_IDLE = 3
+IOPRIO_CLASS_SHIFT = 13
+IOPRIO_SET_SYSCALL = {'x86_64': 251, 'aarch64': 30, 'armv6l': 314, 'armv7l': 314, 'i686': 289}
+MB = 1024 * 1024
+
+
+def lower_priority():
+    """Put this process in the idle CPU and IO scheduling classes, as far as the platform allows."""
+    try:
+        os.nice(19)
+    except OSError as e:
+        logger.warning(f"Cannot lower CPU priority: {e}")
+    number = IOPRIO_SET_SYSCALL.get(platform.machine())
+    if number is None:
+        logger.warning(f"No ioprio_set syscall number for {platform.machine()}; IO priority unchanged")
+        return
+    libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+    if libc.syscall(number, IOPRIO_WHO_PROCESS, 0, IOPRIO_CLASS_IDLE << IOPRIO_CLASS_SHIFT) < 0:
+        logger.warning(f"ioprio_set failed: {os.strerror(ctypes.get_errno())}")
+
+
+class Candidate:
+    """A file that may be deleted to free space."""
+    __slots__ = ('path', 'size', 'age_key', 'priority', 'protected')
+
+    def __init__(self, path, size, age_key, priority, protected=False):
+        self.path = path
+        self.size = size
+        self.age_key = age_key  # Sorts oldest first
+        self.priority = priority
+        self.protected = protected  # Only deleted when the disk is about to fill up
+
+
+def file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def delete(path, reason):
+    try:
+        size = os.path.getsize(path)
+        os.remove(path)
+        logger.info(f"Deleted {path} ({size / MB:.1f} MB, {reason})")
+        return size
+    except FileNotFoundError:
+        return 0
+    except OSError as e:
+        logger.error(f"Cannot delete {path}: {e}")
+        return 0
+
+
+def rotate(path):
+    """Copy a live file to <path>.<UTC time>.gz and truncate it in place; returns the rotated path or None."""
+    rotated = f"{path}.{datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S')}.gz"
+    tmp_path = rotated + '.tmp'
+    try:
+        with open(path, 'rb') as source, gzip.open(tmp_path, 'wb') as target:
+            shutil.copyfileobj(source, target, COPY_CHUNK)
+            # Catch up with what was appended while compressing, then truncate
+            # straight away; only writes in between these two steps are lost.
+            shutil.copyfileobj(source, target, COPY_CHUNK)
+            os.truncate(path, 0)
+        os.replace(tmp_path, rotated)
+        logger.info(f"Rotated {path} to {rotated}")
+        return rotated
+    except OSError as e:
+        logger.error(f"Cannot rotate {path}: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return None
+
+
+def rotated_copies(path):
+    """Rotated copies of a live file, oldest first."""
+    return sorted(glob.glob(glob.escape(path) + '.*.gz'))
+
+
+def enforce_store(store, now):
+    """Rotate, age out and apply the quota of one file store; returns its remaining deletion candidates."""
+    path = store["path"]
+    for tmp_path in glob.glob(glob.escape(path) + '.*.gz.tmp'):
+        delete(tmp_path, "left by an interrupted rotation")
+    if file_size(path) > store.get("rotate_mb", 0) * MB > 0:
+        rotate(path)
+    copies = rotated_copies(path)
+    max_age = store.get("max_age_days", 0)
+    if max_age:
+        for copy in list(copies):
+            try:
+                old = now - os.path.getmtime(copy) > max_age * 86400
+            except OSError:
+                continue
+            if old:
+                delete(copy, f"older than {max_age} days")
+                copies.remove(copy)
+    quota = store.get("quota_mb", 0) * MB
+    if quota:
+        used = file_size(path) + sum(file_size(copy) for copy in copies)
+        while used > quota and copies:
+            used -= delete(copies.pop(0), f"{store['name']} over {store['quota_mb']} MB")
+    return [Candidate(copy, file_size(copy), os.path.basename(copy).rsplit('.', 2)[-2], store.get("priority", 0))
+            for copy in copies]
+
+
+def cursor_days(directory):
+    """The day each uplink cursor in <archive>/cursors points into; None for a cursor that will read from the start."""
+    days = []
+    for path in glob.glob(os.path.join(directory, 'cursors', '*.json')):
+        try:
+            with open(path, 'r') as f:
+                days.append(json.load(f).get("day"))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Unreadable cursor {path}, keeping the whole archive: {e}")
+            days.append(None)
+    return days
+
+
+def compress_segment(path):
+    """Gzip a raw segment next to it and remove the original; returns the new path or None."""
+    target = path + '.gz'
+    tmp_path = target + '.tmp'
+    try:
+        stat = os.stat(path)
+        with open(path, 'rb') as source, gzip.open(tmp_path, 'wb') as output:
+            shutil.copyfileobj(source, output, COPY_CHUNK)
+        # Same content, same mtime: voyage_analytics keeps using its cached rollups of the day.
+        os.utime(tmp_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        os.replace(tmp_path, target)
+        os.remove(path)
+        return target
+    except OSError as e:
+        logger.error(f"Cannot compress {path}: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return None
+
+
+def downsample_segment(path, day, seconds):
+    """Rewrite a compressed segment keeping the first fix of every `seconds`; returns the new path or None."""
+    target = os.path.join(os.path.dirname(path), f"{gps_archive.SEGMENT_PREFIX}{day}-{seconds}s"
+                                                 f"{gps_archive.COMPRESSED_SUFFIX}")
+    tmp_path = target + '.tmp'
+    kept = total = 0
+    try:
+        with gps_archive.open_segment(path) as source, gzip.open(tmp_path, 'wb') as output:
+            last_slot = None
+            for line in source:
+                total += 1
+                try:
+                    micros = uplink_codec.parse_timestamp(json.loads(line).get("timestamp"))
+                except (ValueError, AttributeError):
+                    continue
+                slot = micros // (seconds * 1_000_000) if micros is not None else None
+                if slot is not None and slot == last_slot:
+                    continue
+                last_slot = slot
+                output.write(line)
+                kept += 1
+        os.replace(tmp_path, target)
+        os.remove(path)
+        logger.info(f"Thinned {path} to {kept} of {total} fixes")
+        return target
+    except OSError as e:
+        logger.error(f"Cannot downsample {path}: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return None
+
+
+def archive_files(directory):
+    """Archive files per day: {day: {rank: path}}, rank as in gps_archive.parse_segment_name."""
+    files = {}
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return files
+    for name in names:
+        parsed = gps_archive.parse_segment_name(name)
+        if parsed is not None:
+            files.setdefault(parsed[0], {})[parsed[1]] = os.path.join(directory, name)
+    return files
+
+
+def finish_interrupted(ranks):
+    """Leave one file for a day that has several; returns the remaining {rank: path}.
+
+    A compacted file is complete once it exists (it is renamed into place), so
+    a less compacted one left beside it is removed, unless it was written to
+    later (the clock stepped back to that day); then its fixes are appended to
+    the compacted file as another gzip member first.
+    """
+    while len(ranks) > 1:
+        lower = min(ranks)
+        higher = min(rank for rank in ranks if rank > lower)
+        if os.path.getmtime(ranks[lower]) > os.path.getmtime(ranks[higher]):
+            with gps_archive.open_segment(ranks[lower]) as source, gzip.open(ranks[higher], 'ab') as output:
+                shutil.copyfileobj(source, output, COPY_CHUNK)
+        os.remove(ranks.pop(lower))
+    return ranks
+
+
+def enforce_archive(directory, today, now):
+    """Compact and age out archive segments and rollups; returns the deletion candidates left."""
+    for path in glob.glob(os.path.join(directory, gps_archive.SEGMENT_PREFIX + '*.tmp')):
+        delete(path, "left by an interrupted compaction")
+    cursors = cursor_days(directory)
+    # Days from the oldest unsent one on are needed raw by the uplinks.
+    protect_from = '' if None in cursors else min(cursors + [today])
+    compress_before = (now_day(now, ARCHIVE_COMPRESS_AFTER_DAYS) if ARCHIVE_COMPRESS_AFTER_DAYS else today)
+    thin_before = now_day(now, ARCHIVE_DOWNSAMPLE_AFTER_DAYS) if ARCHIVE_DOWNSAMPLE_AFTER_DAYS else ''
+    expire_before = now_day(now, ARCHIVE_MAX_AGE_DAYS) if ARCHIVE_MAX_AGE_DAYS else ''
+    candidates = []
+    for day, ranks in sorted(archive_files(directory).items()):
+        protected = day >= protect_from
+        try:
+            if not protected:
+                ranks = finish_interrupted(ranks)
+        except OSError as e:
+            logger.error(f"Cannot tidy archive day {day}: {e}")
+        if not protected and day < expire_before:
+            for path in ranks.values():
+                delete(path, f"older than {ARCHIVE_MAX_AGE_DAYS} days")
+            continue
+        if not protected and day < compress_before and 0 in ranks:
+            path = compress_segment(ranks[0])
+            if path:
+                ranks = {1: path}
+        if not protected and day < thin_before and 1 in ranks:
+            path = downsample_segment(ranks[1], day, ARCHIVE_DOWNSAMPLE_SECONDS)
+            if path:
+                ranks = {2: path}
+        for path in ranks.values():
+            candidates.append(Candidate(path, file_size(path), day, ARCHIVE_PRIORITY, protected or day >= today))
+    rollup_dir = os.path.join(directory, 'rollups')
+    minute_level = fix_rollups.ROLLUP_NAMES[0]
+    for path in sorted(glob.glob(os.path.join(rollup_dir, '*' + fix_rollups.ROLLUP_SUFFIX))):
+        level, _, day = os.path.basename(path)[:-len(fix_rollups.ROLLUP_SUFFIX)].partition('-')
+        if level == minute_level and ROLLUP_MINUTE_MAX_AGE_DAYS and day < now_day(now, ROLLUP_MINUTE_MAX_AGE_DAYS):
+            delete(path, f"{level} rollups older than {ROLLUP_MINUTE_MAX_AGE_DAYS} days")
+        elif ARCHIVE_MAX_AGE_DAYS and day < expire_before:
+            delete(path, f"older than {ARCHIVE_MAX_AGE_DAYS} days")
+    quota = ARCHIVE_QUOTA_MB * MB
+    used = sum(candidate.size for candidate in candidates)
+    deletable = [candidate for candidate in candidates if not candidate.protected]
+    while quota and used > quota and deletable:
+        candidate = deletable.pop(0)
+        used -= delete(candidate.path, f"archive over {ARCHIVE_QUOTA_MB} MB")
+        candidates.remove(candidate)
+    if quota and used > quota:
+        logger.warning(f"Archive uses {used / MB:.0f} MB, over its {ARCHIVE_QUOTA_MB} MB quota, "
+                       f"all in today's segment or ones the uplinks have not sent yet")
+    return candidates
+
+
+def now_day(now, days_ago):
+    """YYYYMMDD of the UTC day `days_ago` days before now."""
+    return (datetime.fromtimestamp(now, timezone.utc) - timedelta(days=days_ago)).strftime('%Y%m%d')
+
+
+def free_bytes(path):
+    while path and not os.path.exists(path):
+        path = os.path.dirname(path)
+    usage = shutil.disk_usage(path or '/')
+    return usage.free
+
+
+def relieve_disk_pressure(candidates, directory):
+    """Delete by priority, then age, while free space is below MIN_FREE_MB; protected files go last."""
+    if not MIN_FREE_MB:
+        return
+    order = sorted(candidates, key=lambda candidate: (candidate.protected, candidate.priority, candidate.age_key))
+    for candidate in order:
+        if free_bytes(directory) >= MIN_FREE_MB * MB:
+            return
+        if candidate.protected:
+            if candidate.age_key >= now_day(time.time(), 0):
+                continue  # Never today's segment
+            logger.warning(f"Disk nearly full: deleting unsent archive segment {candidate.path}")
+        delete(candidate.path, f"less than {MIN_FREE_MB} MB free")
+    if free_bytes(directory) < MIN_FREE_MB * MB:
+        logger.warning(f"Less than {MIN_FREE_MB} MB free and nothing left to delete")
+
+
+def run_pass():
+    """One retention pass over every store; returns the bytes freed on the archive's filesystem."""
+    now = time.time()
+    before = free_bytes(ARCHIVE_DIR)
+    candidates = []
+    for store in FILE_STORES:
+        try:
+            candidates.extend(enforce_store(store, now))
+        except Exception as e:
+            logger.error(f"Retention of {store.get('name')} failed: {e}")
+    try:
+        candidates.extend(enforce_archive(ARCHIVE_DIR, now_day(now, 0), now))
+    except Exception as e:
+        logger.error(f"Retention of {ARCHIVE_DIR} failed: {e}")
+    relieve_disk_pressure(candidates, ARCHIVE_DIR)
+    freed = free_bytes(ARCHIVE_DIR) - before
+    logger.info(f"Retention pass done in {time.time() - now:.1f} s, {freed / MB:+.1f} MB free space")
+    return freed
+
+
+def main(args, config):
+    lower_priority()
+    while True:
+        run_pass()
+        if args.once:
+            return
+        time.sleep(PASS_INTERVAL)
+        config.reload_if_changed()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rotate, compact and expire the GPS logs and archive")
+    parser.add_argument('--once', action='store_true', help="run one pass and exit (for cron or a timer)")
+    parser.add_argument('--config', metavar='FILE', default=CONFIG_FILE,
+                        help="JSON settings file (default $RETENTION_CONFIG or %(default)s)")
+    args = parser.parse_args()
+    config = gps_config.Config(sys.modules[__name__], args.config, 'RETENTION_', HOT_SETTINGS,
+                               exclude=('CONFIG_FILE', 'HOT_SETTINGS', 'IOPRIO_WHO_PROCESS',
+                                        'IOPRIO_CLASS_IDLE', 'IOPRIO_CLASS_SHIFT', 'IOPRIO_SET_SYSCALL', 'MB',
+                                        'COPY_CHUNK'))
+    config.load()
+    main(args, config)
@@ -3,8 +3,7 @@ import time
 import logging
 import subprocess
 import os
-from datetime import datetime
-import pytz
+from datetime import datetime, timezone
 import websocket
 import json
 import threading
@@ -140,7 +139,7 @@ def main():
                     device = report.get('device', 'Unknown')
                     if device not in SERIAL_DEVICES:
                         continue
-                    timestamp = datetime.now(pytz.UTC)
+                    timestamp = datetime.now(timezone.utc)
                     lat = report.get('lat', 'Unknown')
                     lon = report.get('lon', 'Unknown')
                     alt = report.get('alt', 'Unknown')
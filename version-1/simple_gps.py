@@ -1,8 +1,7 @@
 import gps
 import logging
 import time
-from datetime import datetime
-import pytz
+from datetime import datetime, timezone
 
 logging.basicConfig(
     level=logging.DEBUG,
@@ -19,7 +18,7 @@ try:
     logging.info("Connected to gpsd")
     print("Connected to gpsd")
     for report in client:
-        timestamp = datetime.now(pytz.UTC)
+        timestamp = datetime.now(timezone.utc)
         output = f"GPS Data (Real-Time): {timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')}\n"
         output += f"Device: {report.get('device', 'Unknown')}\n"
         if report['class'] == 'TPV':
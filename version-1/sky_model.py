@@ -0,0 +1,163 @@
+import array
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Per-receiver model of the visible sky, updated from gpsd SKY reports.
+# Changes go out as compact deltas:
+#   {"type": "skyDelta", "receiver": "top_gps", "seq": 42,
+#    "set": {"12": [el, az, snr, used, "GP"]}, "drop": ["5"], "dop": {"hdop": 0.9}}
+# where "set" only lists satellites that appeared or changed, "drop" those no
+# longer visible and "dop" only the DOP values that changed. A client applies
+# deltas in seq order on top of a full snapshot (GET /sky or the "sky"
+# message sent on connect); a gap in seq means it should refetch the snapshot.
+SNR_HISTORY = 120  # SNR samples kept per satellite
+DOP_FIELDS = ('hdop', 'vdop', 'pdop', 'tdop', 'gdop', 'xdop', 'ydop')
+
+# gpsd gnssid values, used when the receiver reports them.
+GNSS_BY_ID = {0: "GP", 1: "SB", 2: "GA", 3: "BD", 4: "IM", 5: "QZ", 6: "GL", 7: "IR"}
+GNSS_NAMES = {"GP": "GPS", "SB": "SBAS", "GA": "Galileo", "BD": "BeiDou", "IM": "IMES", "QZ": "QZSS",
+              "GL": "GLONASS", "IR": "NavIC", "??": "unknown"}
+
+
+def constellation(prn, gnssid=None):
+    """Two-letter constellation code from gpsd's gnssid, or from the NMEA-style PRN ranges gpsd uses."""
+    if gnssid is not None and gnssid in GNSS_BY_ID:
+        return GNSS_BY_ID[gnssid]
+    if 1 <= prn <= 32:
+        return "GP"
+    if 33 <= prn <= 64 or 120 <= prn <= 158:
+        return "SB"
+    if 65 <= prn <= 96:
+        return "GL"
+    if 193 <= prn <= 200:
+        return "QZ"
+    if 201 <= prn <= 237 or 401 <= prn <= 437:
+        return "BD"
+    if 301 <= prn <= 336:
+        return "GA"
+    return "??"
+
+
+class Satellite:
+    __slots__ = ('prn', 'gnss', 'el', 'az', 'snr', 'used', 'snr_history', 'snr_count')
+
+    def __init__(self, prn, gnss):
+        self.prn = prn
+        self.gnss = gnss
+        self.el = None
+        self.az = None
+        self.snr = None
+        self.used = False
+        self.snr_history = array.array('f', [0.0]) * SNR_HISTORY
+        self.snr_count = 0  # Samples written; the ring position is snr_count % SNR_HISTORY
+
+    def record_snr(self, snr):
+        self.snr_history[self.snr_count % SNR_HISTORY] = snr
+        self.snr_count += 1
+
+    def history(self):
+        """SNR samples, oldest first."""
+        if self.snr_count <= SNR_HISTORY:
+            return [round(value, 1) for value in self.snr_history[:self.snr_count]]
+        start = self.snr_count % SNR_HISTORY
+        return [round(value, 1) for value in self.snr_history[start:] + self.snr_history[:start]]
+
+    def compact(self):
+        return [self.el, self.az, self.snr, 1 if self.used else 0, self.gnss]
+
+
+class SkyModel:
+    """Visible satellites and DOPs for one receiver."""
+
+    def __init__(self, receiver):
+        self.receiver = receiver
+        self.satellites = {}  # prn -> Satellite
+        self.dop = dict.fromkeys(DOP_FIELDS)
+        self.seq = 0
+        self.updated = None
+
+    def update(self, report, now):
+        """Apply one SKY report and return its delta message, or None if nothing changed."""
+        changed_dop = {}
+        for field in DOP_FIELDS:
+            value = report.get(field)
+            if isinstance(value, (int, float)):
+                value = round(value, 2)
+                if value != self.dop[field]:
+                    self.dop[field] = value
+                    changed_dop[field] = value
+        changed = {}
+        dropped = []
+        reported = report.get('satellites')
+        # Some SKY reports carry only DOPs; keep the satellite list from the last full one.
+        if reported is not None:
+            seen = set()
+            for sat in reported:
+                prn = sat.get('PRN')
+                if not isinstance(prn, int):
+                    continue
+                seen.add(prn)
+                satellite = self.satellites.get(prn)
+                if satellite is None:
+                    satellite = self.satellites[prn] = Satellite(prn, constellation(prn, sat.get('gnssid')))
+                    fresh = True
+                else:
+                    fresh = False
+                el = sat.get('el')
+                az = sat.get('az')
+                snr = sat.get('ss')
+                used = bool(sat.get('used', False))
+                el = round(el) if isinstance(el, (int, float)) else None
+                az = round(az) if isinstance(az, (int, float)) else None
+                snr = round(snr, 1) if isinstance(snr, (int, float)) else None
+                if snr is not None:
+                    satellite.record_snr(snr)
+                if fresh or (el, az, snr, used) != (satellite.el, satellite.az, satellite.snr, satellite.used):
+                    satellite.el, satellite.az, satellite.snr, satellite.used = el, az, snr, used
+                    changed[str(prn)] = satellite.compact()
+            for prn in [prn for prn in self.satellites if prn not in seen]:
+                del self.satellites[prn]
+                dropped.append(str(prn))
+        self.updated = now
+        if not changed and not dropped and not changed_dop:
+            return None
+        self.seq += 1
+        delta = {"type": "skyDelta", "receiver": self.receiver, "seq": self.seq}
+        if changed:
+            delta["set"] = changed
+        if dropped:
+            delta["drop"] = dropped
+        if changed_dop:
+            delta["dop"] = changed_dop
+        return delta
+
+    def constellations(self):
+        """Visible and used counts and mean used SNR per constellation."""
+        summary = {}
+        for satellite in list(self.satellites.values()):
+            entry = summary.setdefault(GNSS_NAMES[satellite.gnss], {"visible": 0, "used": 0, "snr_sum": 0.0})
+            entry["visible"] += 1
+            if satellite.used:
+                entry["used"] += 1
+                entry["snr_sum"] += satellite.snr or 0.0
+        for entry in summary.values():
+            snr_sum = entry.pop("snr_sum")
+            entry["mean_used_snr"] = round(snr_sum / entry["used"], 1) if entry["used"] else None
+        return summary
+
+    def snapshot(self, history=False):
+        """Full state, the base that skyDelta messages apply to."""
+        satellites = list(self.satellites.values())
+        result = {
+            "type": "sky",
+            "receiver": self.receiver,
+            "seq": self.seq,
+            "satellites": {str(satellite.prn): satellite.compact() for satellite in satellites},
+            "dop": dict(self.dop),
+            "constellations": self.constellations(),
+            "updated": self.updated
+        }
+        if history:
+            result["snr_history"] = {str(satellite.prn): satellite.history() for satellite in satellites}
+        return result
@@ -0,0 +1,170 @@
+import math
+
+import geodesy
+
+# Fixed-size lat/lon grid buckets. Cells are CELL_DEG degrees on a side and are
+# keyed by (row, col); only occupied cells are stored.
+CELL_DEG = 1.0
+POINT_CELL_DEG = 0.1  # About 11 km; a 5 nm radius query touches a handful of cells
+MAX_BOX_CELLS = 400  # Boxes covering more cells than this are checked for every point
+
+
+def cell_of(lat, lon, cell_deg=CELL_DEG):
+    return (math.floor(lat / cell_deg), math.floor(lon / cell_deg))
+
+
+def lon_ranges(west, east):
+    """Split a west..east longitude span into ranges that do not cross the antimeridian."""
+    if west <= east:
+        return [(west, east)]
+    return [(west, 180.0), (-180.0, east)]
+
+
+def bbox_contains(bbox, lat, lon):
+    """True if (lat, lon) lies in bbox = (south, west, north, east); west > east wraps the antimeridian."""
+    south, west, north, east = bbox
+    if lat < south or lat > north:
+        return False
+    if west <= east:
+        return west <= lon <= east
+    return lon >= west or lon <= east
+
+
+class BoxIndex:
+    """Grid index of bounding boxes, answering "which boxes may contain this point"."""
+
+    def __init__(self, cell_deg=CELL_DEG):
+        self.cell_deg = cell_deg
+        self.cells = {}  # (row, col) -> set of keys
+        self.wide = set()  # keys whose boxes span too many cells to bucket
+        self.boxes = {}  # key -> (bbox, cells)
+
+    def _cells(self, bbox):
+        south, west, north, east = bbox
+        row_min, _ = cell_of(south, 0.0, self.cell_deg)
+        row_max, _ = cell_of(north, 0.0, self.cell_deg)
+        cells = []
+        for lo, hi in lon_ranges(west, east):
+            _, col_min = cell_of(0.0, lo, self.cell_deg)
+            _, col_max = cell_of(0.0, hi, self.cell_deg)
+            if (row_max - row_min + 1) * (col_max - col_min + 1) + len(cells) > MAX_BOX_CELLS:
+                return None
+            cells.extend((row, col) for row in range(row_min, row_max + 1) for col in range(col_min, col_max + 1))
+        return cells
+
+    def add(self, key, bbox):
+        self.remove(key)
+        cells = self._cells(bbox)
+        if cells is None:
+            self.wide.add(key)
+        else:
+            for cell in cells:
+                self.cells.setdefault(cell, set()).add(key)
+        self.boxes[key] = (bbox, cells)
+
+    def remove(self, key):
+        entry = self.boxes.pop(key, None)
+        if entry is None:
+            return
+        _, cells = entry
+        if cells is None:
+            self.wide.discard(key)
+            return
+        for cell in cells:
+            bucket = self.cells.get(cell)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self.cells[cell]
+
+    def containing(self, lat, lon):
+        """Yield the keys of boxes that contain (lat, lon)."""
+        bucket = self.cells.get(cell_of(lat, lon, self.cell_deg))
+        for candidates in (bucket or (), self.wide):
+            for key in candidates:
+                if bbox_contains(self.boxes[key][0], lat, lon):
+                    yield key
+
+    def __len__(self):
+        return len(self.boxes)
+
+
+class PointIndex:
+    """Grid index of the latest position per key, updated in place as fixes arrive."""
+
+    def __init__(self, cell_deg=POINT_CELL_DEG):
+        self.cell_deg = cell_deg
+        self.cells = {}  # (row, col) -> {key: (lat, lon)}
+        self.points = {}  # key -> cell
+
+    def update(self, key, lat, lon):
+        cell = cell_of(lat, lon, self.cell_deg)
+        old_cell = self.points.get(key)
+        if old_cell is not None and old_cell != cell:
+            self._discard(key, old_cell)
+        self.cells.setdefault(cell, {})[key] = (lat, lon)
+        self.points[key] = cell
+
+    def remove(self, key):
+        cell = self.points.pop(key, None)
+        if cell is not None:
+            self._discard(key, cell)
+
+    def _discard(self, key, cell):
+        bucket = self.cells[cell]
+        del bucket[key]
+        if not bucket:
+            del self.cells[cell]
+
+    def _buckets(self, bbox):
+        """Yield the occupied buckets that may hold points inside bbox."""
+        south, west, north, east = bbox
+        row_min, _ = cell_of(south, 0.0, self.cell_deg)
+        row_max, _ = cell_of(north, 0.0, self.cell_deg)
+        for lo, hi in lon_ranges(west, east):
+            _, col_min = cell_of(0.0, lo, self.cell_deg)
+            _, col_max = cell_of(0.0, hi, self.cell_deg)
+            if (row_max - row_min + 1) * (col_max - col_min + 1) > len(self.cells):
+                # Large boxes: walking the occupied cells is cheaper than the grid.
+                for (row, col), bucket in self.cells.items():
+                    if row_min <= row <= row_max and col_min <= col <= col_max:
+                        yield bucket
+                continue
+            for row in range(row_min, row_max + 1):
+                for col in range(col_min, col_max + 1):
+                    bucket = self.cells.get((row, col))
+                    if bucket:
+                        yield bucket
+
+    def within_bbox(self, bbox):
+        """Return [(key, lat, lon)] for points inside bbox = (south, west, north, east)."""
+        result = []
+        for bucket in self._buckets(bbox):
+            for key, (lat, lon) in bucket.items():
+                if bbox_contains(bbox, lat, lon):
+                    result.append((key, lat, lon))
+        return result
+
+    def near(self, lat, lon, radius_m, limit=None):
+        """Return [(distance_m, key)] for points within radius_m of (lat, lon), nearest first."""
+        dlat = math.degrees(radius_m / geodesy.EARTH_RADIUS_M)
+        south = max(-90.0, lat - dlat)
+        north = min(90.0, lat + dlat)
+        cos_lat = min(math.cos(math.radians(south)), math.cos(math.radians(north)))
+        if south <= -90.0 or north >= 90.0 or cos_lat <= 0 or dlat / cos_lat >= 180.0:
+            west, east = -180.0, 180.0
+        else:
+            dlon = dlat / cos_lat
+            west = (lon - dlon + 180.0) % 360.0 - 180.0
+            east = (lon + dlon + 180.0) % 360.0 - 180.0
+        result = []
+        for bucket in self._buckets((south, west, north, east)):
+            for key, (point_lat, point_lon) in bucket.items():
+                distance = geodesy.haversine_m(lat, lon, point_lat, point_lon)
+                if distance <= radius_m:
+                    result.append((distance, key))
+        result.sort()
+        return result[:limit] if limit else result
+
+    def __len__(self):
+        return len(self.points)
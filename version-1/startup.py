@@ -0,0 +1,135 @@
+import logging
+import os
+import socket
+import time
+
+logger = logging.getLogger(__name__)
+
+# Startup milestones and readiness signalling. Milestones are recorded as
+# seconds since this process started and, where /proc/uptime is readable,
+# seconds since boot, so cold-start regressions show up in the log and on
+# GET /ready. Readiness is reported to systemd through NOTIFY_SOCKET
+# (Type=notify units) as well as over HTTP.
+GPSD_POLL_INITIAL = 0.02  # First wait between gpsd connection attempts (seconds)
+GPSD_POLL_MAX = 0.25  # Longest wait between attempts
+READY_MILESTONES = ('servers', 'gpsd')  # Milestones that make the service ready
+# Stands in for 'gpsd' in the systemd notification while no receiver is
+# plugged in, so a Pi booted without its GPS does not hit TimeoutStartSec and
+# restart-loop. GET /ready stays 503 until gpsd is really up.
+WAITING_MILESTONE = 'waiting_for_receiver'
+
+
+def boot_uptime():
+    """Seconds since the machine booted, or None where /proc/uptime is missing."""
+    try:
+        with open('/proc/uptime', 'r') as f:
+            return float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def process_start_uptime():
+    """Boot-relative time this process was started (so interpreter start and imports count), or None."""
+    try:
+        with open('/proc/self/stat', 'r') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        return int(fields[19]) / os.sysconf('SC_CLK_TCK')  # Field 22, starttime, in clock ticks
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+PROCESS_START = time.monotonic()
+PROCESS_START_UPTIME = process_start_uptime()
+
+
+def process_age():
+    """Seconds since this process started, or since this module was imported where /proc is unavailable."""
+    uptime = boot_uptime()
+    if uptime is not None and PROCESS_START_UPTIME is not None:
+        return uptime - PROCESS_START_UPTIME
+    return time.monotonic() - PROCESS_START
+
+
+def rss_kb():
+    """Resident set size of this process in kB (VmRSS), or None where /proc is unavailable."""
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def sd_notify(message):
+    """Send a state string such as "READY=1" to systemd; a no-op outside a notify-type unit."""
+    address = os.environ.get('NOTIFY_SOCKET')
+    if not address:
+        return False
+    if address.startswith('@'):
+        address = '\0' + address[1:]  # Abstract namespace
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as notify:
+            notify.connect(address)
+            notify.sendall(message.encode('utf-8'))
+        return True
+    except OSError as e:
+        logger.warning(f"sd_notify {message!r} failed: {e}")
+        return False
+
+
+def wait_for_port(host, port, timeout):
+    """Poll until something accepts TCP connections on host:port; returns the seconds waited or None on timeout."""
+    started = time.monotonic()
+    delay = GPSD_POLL_INITIAL
+    while True:
+        try:
+            with socket.create_connection((host, port), timeout=GPSD_POLL_MAX):
+                return time.monotonic() - started
+        except OSError:
+            pass
+        if time.monotonic() - started + delay > timeout:
+            return None
+        time.sleep(delay)
+        delay = min(delay * 2, GPSD_POLL_MAX)
+
+
+class Readiness:
+    """Named startup milestones, each recorded once."""
+
+    def __init__(self, required=READY_MILESTONES):
+        self.required = tuple(required)
+        self.milestones = {}  # name -> {"process_s": ..., "boot_s": ...}
+        self.notified = False
+
+    def mark(self, name):
+        """Record a milestone; returns True the first time it is reached."""
+        if name in self.milestones:
+            return False
+        uptime = boot_uptime()
+        self.milestones[name] = {
+            "process_s": round(process_age(), 3),
+            "boot_s": round(uptime, 3) if uptime is not None else None
+        }
+        logger.info(f"Startup: {name} after {self.milestones[name]['process_s']:.3f} s"
+                    + (f" ({uptime:.1f} s since boot)" if uptime is not None else ""))
+        if not self.notified and self._serving():
+            self.notified = True
+            sd_notify("READY=1\nSTATUS=Serving, " + ("waiting for first fix" if self.ready() else "waiting for a GPS receiver"))
+        elif name == 'gpsd' and WAITING_MILESTONE in self.milestones:
+            sd_notify("STATUS=Serving, waiting for first fix")
+        if name == 'first_fix':
+            sd_notify(f"STATUS=Serving, first fix after {self.milestones[name]['process_s']:.1f} s")
+        return True
+
+    def ready(self):
+        return all(name in self.milestones for name in self.required)
+
+    def _serving(self):
+        """Ready, or ready but for a GPS receiver that has not been plugged in yet."""
+        return all(name in self.milestones or (name == 'gpsd' and WAITING_MILESTONE in self.milestones)
+                   for name in self.required)
+
+    def status(self):
+        return {"ready": self.ready(), "milestones": dict(self.milestones), "rss_kb": rss_kb()}
@@ -0,0 +1,52 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Import time and resident memory of gps_websocket_offline for each component
+# profile. Every profile runs in a fresh interpreter, which imports the service
+# module and calls load_components() the way main() does, without binding
+# ports or starting gpsd. Run on the target board; a warm page cache makes the
+# first run slower than the rest, so the fastest of --runs is reported.
+
+CHILD = """
+import json, sys, time
+started = time.perf_counter()
+import startup
+baseline = startup.rss_kb()
+import gps_websocket_offline as service
+if sys.argv[1] != "bare":
+    service.load_components(service.PROFILES[sys.argv[1]])
+print(json.dumps({"seconds": time.perf_counter() - started, "rss_kb": startup.rss_kb(), "baseline_kb": baseline,
+                  "modules": len(sys.modules)}))
+"""
+
+
+def measure(profile, runs):
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [here, os.environ.get('PYTHONPATH')])))
+    results = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', CHILD, profile], capture_output=True, text=True,
+                                env=env, check=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return min(results, key=lambda result: result["seconds"])
+
+
+def main(args):
+    import gps_websocket_offline as service
+    profiles = ["bare"] + sorted(service.PROFILES)
+    print(f"{'profile':<8} {'import s':>9} {'RSS kB':>8} {'+kB':>7} {'modules':>8}")
+    for profile in profiles:
+        result = measure(profile, args.runs)
+        print(f"{profile:<8} {result['seconds']:>9.3f} {result['rss_kb']:>8} "
+              f"{result['rss_kb'] - result['baseline_kb']:>7} {result['modules']:>8}")
+    print("bare = the service module alone (ingest, no gps/websockets/aiohttp); "
+          "+kB = growth over the interpreter before the service import")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import time and RSS per component profile")
+    parser.add_argument('--runs', type=int, default=3, help="fresh interpreters per profile")
+    main(parser.parse_args())
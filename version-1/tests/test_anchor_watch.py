@@ -0,0 +1,54 @@
+import anchor_watch
+import fix_ring
+
+ANCHOR = (10.0, 20.0)
+DRIFTED = (10.002, 20.0)  # About 220 m north
+
+
+class Feed:
+    def __init__(self):
+        self.ring = fix_ring.FixRing(1024)
+        self.watch = anchor_watch.AnchorWatch(self.ring, window=anchor_watch.SETTLE_FIXES)
+        self.now = 0.0
+
+    def fixes(self, count, position, speed=0.0):
+        changed = []
+        for _ in range(count):
+            self.now += 1.0
+            self.ring.append(self.now, position[0], position[1], speed=speed)
+            if self.watch.update():
+                changed.append(self.watch.state)
+        return changed
+
+
+def alarmed_feed():
+    feed = Feed()
+    assert feed.fixes(anchor_watch.SETTLE_FIXES, ANCHOR) == [anchor_watch.STATE_ARMED]
+    assert feed.watch.anchor == ANCHOR
+    assert feed.fixes(int(anchor_watch.SUSTAIN_SECONDS) + 5, DRIFTED) == [anchor_watch.STATE_ALARM]
+    return feed
+
+
+def test_alarm_stays_latched_while_moored():
+    feed = alarmed_feed()
+    assert feed.fixes(3 * anchor_watch.SETTLE_FIXES, DRIFTED) == []
+    status = feed.watch.status()
+    assert status["state"] == anchor_watch.STATE_ALARM
+    assert status["anchor"] == list(ANCHOR)
+    assert status["distance_m"] > 200
+
+
+def test_acknowledge_rearms_where_the_vessel_settles():
+    feed = alarmed_feed()
+    assert feed.watch.acknowledge()
+    assert not feed.watch.acknowledge()
+    assert feed.watch.state == anchor_watch.STATE_IDLE
+    assert feed.fixes(anchor_watch.SETTLE_FIXES, DRIFTED) == [anchor_watch.STATE_ARMED]
+    assert feed.watch.anchor == DRIFTED
+
+
+def test_getting_underway_clears_the_alarm():
+    feed = alarmed_feed()
+    assert feed.fixes(anchor_watch.SETTLE_FIXES, DRIFTED, speed=10.0) == [anchor_watch.STATE_IDLE]
+    assert feed.watch.anchor is None
+    assert feed.fixes(anchor_watch.SETTLE_FIXES, ANCHOR) == [anchor_watch.STATE_ARMED]
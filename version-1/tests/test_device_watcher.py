@@ -0,0 +1,90 @@
+import socket
+import threading
+
+import pytest
+
+import device_watcher
+
+
+@pytest.fixture
+def identities(monkeypatch):
+    """Map device paths to by-id names; devices not listed have no stable name."""
+    names = {}
+    monkeypatch.setattr(device_watcher, "device_identity", lambda device: names.get(device, device))
+    return names
+
+
+def test_role_map_keeps_labels_across_reenumeration(identities):
+    roles = device_watcher.RoleMap()
+    identities.update({"/dev/ttyACM0": "usb-ublox-top", "/dev/ttyACM1": "usb-ublox-bottom"})
+    assert roles.assign(["/dev/ttyACM0", "/dev/ttyACM1"]) == [("/dev/ttyACM0", "top_gps"),
+                                                              ("/dev/ttyACM1", "bottom_gps")]
+    # The top receiver is unplugged and comes back as ttyACM2.
+    identities.clear()
+    identities.update({"/dev/ttyACM1": "usb-ublox-bottom", "/dev/ttyACM2": "usb-ublox-top"})
+    assert roles.assign(["/dev/ttyACM1"]) == [("/dev/ttyACM1", "bottom_gps")]
+    assert roles.assign(["/dev/ttyACM1", "/dev/ttyACM2"]) == [("/dev/ttyACM2", "top_gps"),
+                                                              ("/dev/ttyACM1", "bottom_gps")]
+
+
+def test_role_map_reuses_labels_of_unnamed_devices(identities):
+    roles = device_watcher.RoleMap()
+    assert roles.assign(["/dev/ttyUSB0", "/dev/ttyUSB1"]) == [("/dev/ttyUSB0", "top_gps"),
+                                                              ("/dev/ttyUSB1", "bottom_gps")]
+    assert roles.assign(["/dev/ttyUSB1"]) == [("/dev/ttyUSB1", "bottom_gps")]
+    assert roles.assign(["/dev/ttyUSB1", "/dev/ttyUSB5", "/dev/ttyUSB6"]) == [
+        ("/dev/ttyUSB5", "top_gps"), ("/dev/ttyUSB1", "bottom_gps"), ("/dev/ttyUSB6", "gps_2")]
+
+
+def test_scan_devices(tmp_path, monkeypatch):
+    for name in ("ttyUSB0", "ttyACM1", "ttyACM0", "ttyS0"):
+        (tmp_path / name).touch()
+    monkeypatch.setattr(device_watcher, "DEVICE_PATTERNS", (str(tmp_path / "ttyACM*"), str(tmp_path / "ttyUSB*")))
+    assert [path.rsplit("/", 1)[1] for path in device_watcher.scan_devices()] == ["ttyACM0", "ttyACM1", "ttyUSB0"]
+    assert len(device_watcher.scan_devices(limit=2)) == 2
+
+
+def event(name, mask=device_watcher.IN_CREATE):
+    raw = name.encode() + b"\0" * (16 - len(name))
+    return device_watcher.EVENT_HEADER.pack(1, mask, 0, len(raw)) + raw
+
+
+def test_relevant_inotify_events():
+    watcher = device_watcher.DeviceWatcher.__new__(device_watcher.DeviceWatcher)
+    assert not watcher._relevant(event("tty5") + event("null"))
+    assert watcher._relevant(event("tty5") + event("ttyACM3"))
+    assert watcher._relevant(event("serial"))
+
+
+def serve_once(path, reply):
+    """Accept one control connection on a Unix socket, answer it and return what was sent."""
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen(1)
+    received = []
+
+    def answer():
+        connection, _ = server.accept()
+        with connection:
+            received.append(connection.recv(64))
+            connection.sendall(reply)
+        server.close()
+
+    thread = threading.Thread(target=answer)
+    thread.start()
+    return thread, received
+
+
+@pytest.mark.parametrize("reply, accepted", [(b"OK\n", True), (b"ERROR\n", False)])
+def test_gpsd_control(tmp_path, reply, accepted):
+    path = str(tmp_path / "gpsd.sock")
+    thread, received = serve_once(path, reply)
+    assert device_watcher.gpsd_control(path, "+", "/dev/ttyACM0") is accepted
+    thread.join()
+    assert received == [b"+/dev/ttyACM0\r\n"]
+
+
+def test_gpsd_unreachable(tmp_path):
+    path = str(tmp_path / "missing.sock")
+    assert not device_watcher.gpsd_listening(path)
+    assert not device_watcher.gpsd_control(path, "-", "/dev/ttyACM0")
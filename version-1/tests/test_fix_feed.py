@@ -0,0 +1,112 @@
+import asyncio
+import gzip
+import json
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer, make_mocked_request
+
+import fix_feed
+import gps_websocket_offline
+
+
+@pytest.fixture
+def feed(monkeypatch):
+    feed = fix_feed.FixFeed()
+    monkeypatch.setattr(gps_websocket_offline, "web", web)
+    monkeypatch.setattr(gps_websocket_offline, "gps_feed", feed)
+    return feed
+
+
+def test_wait_newer():
+    async def run():
+        feed = fix_feed.FixFeed()
+        assert not await feed.wait_newer(0, timeout=0.01)
+        waiter = asyncio.ensure_future(feed.wait_newer(0, timeout=1))
+        await asyncio.sleep(0)
+        feed.publish({"timestamp": "t"})
+        assert await waiter
+        assert not await feed.wait_newer(feed.seq, timeout=0.01)
+        assert await feed.wait_newer(feed.seq + 5, timeout=0.01)  # Seq of a previous run
+    asyncio.run(run())
+
+
+def test_long_poll(feed):
+    async def run():
+        get = gps_websocket_offline.get_gps_data
+        assert (await get(make_mocked_request('GET', '/gps'))).status == 404
+        assert (await get(make_mocked_request('GET', '/gps?since=x'))).status == 400
+        response = await get(make_mocked_request('GET', '/gps?since=0&timeout=0.01'))
+        assert (response.status, response.headers["X-GPS-Seq"]) == (204, "0")
+        waiter = asyncio.ensure_future(get(make_mocked_request('GET', '/gps?since=0&timeout=5')))
+        await asyncio.sleep(0)
+        feed.publish({"timestamp": "t1"})
+        response = await waiter
+        assert response.status == 200 and json.loads(response.body) == {"timestamp": "t1", "seq": 1}
+    asyncio.run(run())
+
+
+def test_event_stream_resumes_after_last_event_id(feed):
+    async def run():
+        app = web.Application()
+        app.router.add_get('/gps/stream', gps_websocket_offline.stream_gps_data)
+        async with TestClient(TestServer(app)) as client:
+            feed.publish({"timestamp": "t1"})
+            response = await client.get('/gps/stream', headers={"Last-Event-ID": "1"})
+            assert response.headers["Content-Type"] == "text/event-stream"
+            assert await response.content.readuntil(b"\n\n") == b"retry: %d\n\n" % gps_websocket_offline.SSE_RETRY_MS
+            feed.publish({"timestamp": "t2"})  # The client already has fix 1
+            event = await asyncio.wait_for(response.content.readuntil(b"\n\n"), 5)
+            assert event.startswith(b"id: 2\nevent: fix\ndata: ")
+            assert json.loads(event.split(b"data: ", 1)[1]) == {"timestamp": "t2", "seq": 2}
+            response.close()
+    asyncio.run(run())
+
+
+def test_etag_changes_per_fix():
+    feed = fix_feed.FixFeed()
+    assert not feed.not_modified('"anything"')
+    feed.publish({"timestamp": "t1"})
+    first = feed.etag
+    assert json.loads(feed.body)["seq"] == 1
+    assert feed.not_modified(first)
+    assert feed.not_modified(f'"other", W/{first}')
+    assert feed.not_modified('*')
+    assert not feed.not_modified(None)
+    feed.publish({"timestamp": "t2"})
+    assert feed.etag != first
+    assert not feed.not_modified(first)
+
+
+def test_gzip_body_is_cached_and_skipped_for_small_fixes():
+    feed = fix_feed.FixFeed()
+    feed.publish({"timestamp": "t"})
+    assert feed.gzip_body() is None
+    feed.publish({"timestamp": "t", "padding": "x" * fix_feed.GZIP_MIN_BYTES})
+    body = feed.gzip_body()
+    assert body is feed.gzip_body()
+    assert gzip.decompress(body) == feed.body
+
+
+def test_fix_response_304_and_gzip(feed, monkeypatch):
+    feed.publish({"timestamp": "t", "padding": "x" * fix_feed.GZIP_MIN_BYTES})
+    monkeypatch.setattr(gps_websocket_offline, "HTTP_GZIP", True)
+
+    response = gps_websocket_offline.fix_response(make_mocked_request('GET', '/gps'))
+    assert response.status == 200
+    assert response.headers["ETag"] == feed.etag
+    assert response.body == feed.body
+
+    request = make_mocked_request('GET', '/gps', headers={"If-None-Match": feed.etag})
+    response = gps_websocket_offline.fix_response(request)
+    assert response.status == 304
+    assert response.headers["X-GPS-Seq"] == "1"
+
+    request = make_mocked_request('GET', '/gps', headers={"Accept-Encoding": "gzip, deflate"})
+    response = gps_websocket_offline.fix_response(request)
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(response.body) == feed.body
+
+    monkeypatch.setattr(gps_websocket_offline, "HTTP_GZIP", False)
+    response = gps_websocket_offline.fix_response(request)
+    assert "Content-Encoding" not in response.headers and response.body == feed.body
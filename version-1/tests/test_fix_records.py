@@ -0,0 +1,45 @@
+from types import SimpleNamespace
+
+import fix_records
+
+SKY = {"satellites": [{"PRN": 12, "used": True}, {"PRN": 3, "used": True}, {"PRN": 7, "used": False},
+                      {"PRN": None, "used": True}]}
+
+
+def make_receiver(device, label=None):
+    receiver = fix_records.ReceiverState(device, label)
+    receiver.update_tpv(SimpleNamespace(lat=37.5, lon=-122.25, alt=12.0, speed=2.5, track=87.54), "t")
+    receiver.update_sky(SKY)
+    return receiver
+
+
+def test_satellite_set():
+    satellites = fix_records.SatelliteSet.from_sky(SKY["satellites"])
+    assert len(satellites) == 2
+    assert 12 in satellites and 7 not in satellites and -1 not in satellites
+    assert satellites.prns() == ["3", "12"]
+
+
+def test_receiver_state_units_and_copy():
+    receiver = make_receiver("/dev/ttyACM0")
+    assert (receiver.speed, receiver.heading) == (9.0, 87.5)  # m/s to km/h, heading to 0.1 degree
+    copy = receiver.copy()
+    receiver.update_tpv(SimpleNamespace(lat=38.0), "u")
+    assert (copy.latitude, copy.speed) == (37.5, 9.0)
+    assert (receiver.latitude, receiver.speed) == (38.0, None)
+
+
+def test_fix_to_dict_and_text():
+    fix = fix_records.Fix("2025-06-03 12:00:00.000000", "MV-TEST", "pi-1", 87.5,
+                          (make_receiver("/dev/ttyACM0"), fix_records.ReceiverState("/dev/ttyACM1"),
+                           make_receiver("/dev/ttyUSB0", "gps_2")), primary="top_gps")
+    data = fix.to_dict()
+    assert data["primary"] == "top_gps"
+    assert [gps["gps"] for gps in data["gps_data"]] == ["top_gps", "bottom_gps", "gps_2"]
+    assert data["gps_data"][0]["satellites"] == 2 and data["gps_data"][0]["satellite_prns"] == ["3", "12"]
+    assert data["gps_data"][1] == {"gps": "bottom_gps", "latitude": None, "longitude": None, "altitude": None,
+                                   "speed": None, "satellites": None, "satellite_prns": []}
+    text = fix.to_text()
+    assert "Top GPS (/dev/ttyACM0):" in text and "GPS 2 (/dev/ttyUSB0):" in text
+    assert "  Satellite PRNs: 3, 12" in text and "  Latitude: Unknown" in text
+    assert "primary" not in fix_records.Fix("t", "s", "d", None, ()).to_dict()
@@ -0,0 +1,57 @@
+import math
+
+import fix_ring
+
+
+def filled(capacity, count):
+    ring = fix_ring.FixRing(capacity)
+    for index in range(count):
+        ring.append(float(index), 10.0 + index, 20.0, speed=index)
+    return ring
+
+
+def test_wraps_and_reads_oldest_first():
+    ring = filled(4, 6)
+    assert len(ring) == 4
+    assert ring.newest_slot() == 1
+    assert ring.segments() == [(2, 4), (0, 2)]
+    assert ring.values("time") == [2.0, 3.0, 4.0, 5.0]
+    assert ring.values("latitude", 2) == [14.0, 15.0]
+    views, written = ring.views("speed", 3)
+    assert [value for view in views for value in view] == [3.0, 4.0, 5.0] and written == 6
+
+
+def test_empty_ring_and_unknown_columns():
+    ring = fix_ring.FixRing(4)
+    assert ring.newest_slot() is None and ring.segments() == [] and ring.values("time") == []
+    ring.append(1.0, 10.0, 20.0)
+    assert math.isnan(ring.speed[0]) and ring.satellites[0] == -1
+
+
+def test_valid_detects_overwritten_reads():
+    ring = filled(4, 4)
+    written = ring.written
+    assert ring.valid(written, 4)
+    ring.append(4.0, 0.0, 0.0)
+    assert not ring.valid(written, 4)  # The oldest of the four was overwritten
+    assert ring.valid(written, 3)
+
+
+def test_count_since():
+    ring = filled(4, 10)
+    assert ring.count_since(7.0) == 3
+    assert ring.count_since(0.0) == 4
+    assert ring.count_since(10.0) == 0
+
+
+def test_history_skips_repeated_positions_and_fuses():
+    history = fix_ring.FixHistory(8)
+    fix = {"heading": 45.0, "gps_data": [{"gps": "top", "latitude": 10.0, "longitude": 20.0, "speed": 3.0},
+                                         {"gps": "bottom", "latitude": 10.0002, "longitude": 20.0, "speed": 3.0},
+                                         {"gps": "lost", "latitude": None, "longitude": None}]}
+    history.append_fix(fix, 1.0)
+    history.append_fix(fix, 2.0)  # Re-emitted for a SKY report: nothing new
+    assert sorted(history.rings) == ["bottom", fix_ring.FUSED, "top"]
+    assert len(history.ring("top")) == 1
+    fused = history.ring(fix_ring.FUSED)
+    assert len(fused) == 1 and abs(fused.latitude[0] - 10.0001) < 1e-9
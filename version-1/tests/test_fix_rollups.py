@@ -0,0 +1,130 @@
+import asyncio
+import json
+from datetime import datetime, timezone
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import make_mocked_request
+
+import fix_ring
+import fix_rollups
+import gps_websocket_offline
+
+HOUR = 1_750_000_000 // 3600 * 3600  # 2025-06-15 15:00 UTC
+
+
+def hour_rows(directory):
+    return fix_rollups.merge_rows(fix_rollups.read_rollups(str(directory), "1h"))
+
+
+def add_fixes(store, first, last, receiver="top_gps"):
+    for second in range(first, last):
+        store.add(receiver, HOUR + second, 10.0 + second * 1e-5, 20.0, speed=second % 7, satellites=8)
+
+
+def crash(store):
+    """Stop without close(): the open buckets are lost, the written rows stay."""
+    for _, file in store.files.values():
+        file.close()
+
+
+def test_bucket_merge_matches_one_bucket():
+    whole = fix_rollups.RollupBucket("top_gps", HOUR, 3600)
+    first = fix_rollups.RollupBucket("top_gps", HOUR, 3600)
+    second = fix_rollups.RollupBucket("top_gps", HOUR, 3600)
+    for index in range(10):
+        args = (HOUR + index, 10.0 + index, 20.0 - index, float(index), index if index % 2 else None, 5.0)
+        whole.add(*args)
+        (first if index < 4 else second).add(*args)
+    merged = fix_rollups.merge_rows([first.to_dict(), second.to_dict()])
+    assert merged == [whole.to_dict()]
+    assert merged[0]["satellites_min"] == 1 and merged[0]["speed_max"] == 9.0
+    assert (merged[0]["first"], merged[0]["last"]) == (HOUR, HOUR + 9)
+
+
+def test_minutes_fold_into_hours(tmp_path, monkeypatch):
+    monkeypatch.setattr(fix_rollups.time, "time", lambda: HOUR + 7200)
+    store = fix_rollups.RollupStore(str(tmp_path))
+    add_fixes(store, 0, 3700)
+    assert [row["count"] for row in store.open_rows("1h")] == [100]
+    store.close()
+    minutes = fix_rollups.read_rollups(str(tmp_path), "1m")
+    assert len(minutes) == 62 and all(row["count"] == 60 for row in minutes[:61])
+    assert [row["count"] for row in hour_rows(tmp_path)] == [3600, 100]
+    assert fix_rollups.read_rollups(str(tmp_path), "1h", start=HOUR + 3600)[0]["count"] == 100
+
+
+def test_add_fix_counts_receivers_and_fused_position(tmp_path, monkeypatch):
+    monkeypatch.setattr(fix_rollups.time, "time", lambda: HOUR + 7200)
+    store = fix_rollups.RollupStore(str(tmp_path))
+    fix = {"gps_data": [{"gps": "top_gps", "latitude": 10.0, "longitude": 20.0, "speed": 3.0},
+                        {"gps": "bottom_gps", "latitude": 10.0001, "longitude": 20.0, "speed": 3.0}]}
+    store.add_fix(fix, HOUR)
+    store.add_fix(fix, HOUR + 1)  # Same positions again: not counted twice
+    rows = {row["receiver"]: row for row in store.open_rows("1m")}
+    assert set(rows) == {"top_gps", "bottom_gps", fix_ring.FUSED}
+    assert rows["top_gps"]["count"] == 1
+
+
+def test_backfill_rebuilds_missing_hours(tmp_path, monkeypatch):
+    monkeypatch.setattr(fix_rollups.time, "time", lambda: HOUR + 7200)
+    store = fix_rollups.RollupStore(str(tmp_path))
+    add_fixes(store, 0, 1210)
+    crash(store)
+    assert hour_rows(tmp_path) == []
+    fix_rollups.RollupStore(str(tmp_path)).close()
+    assert [row["count"] for row in hour_rows(tmp_path)] == [1200]  # The open minute was lost
+
+
+def test_backfill_after_restart_then_crash_in_the_same_hour(tmp_path, monkeypatch):
+    monkeypatch.setattr(fix_rollups.time, "time", lambda: HOUR + 7200)
+    store = fix_rollups.RollupStore(str(tmp_path))
+    add_fixes(store, 0, 630)
+    store.close()  # Clean restart halfway through a minute
+    store = fix_rollups.RollupStore(str(tmp_path))
+    add_fixes(store, 630, 1500)
+    crash(store)
+    assert [row["count"] for row in hour_rows(tmp_path)] == [630]
+    store = fix_rollups.RollupStore(str(tmp_path))
+    assert [row["count"] for row in hour_rows(tmp_path)] == [1440]
+    store.close()
+    fix_rollups.RollupStore(str(tmp_path)).close()  # Nothing is rebuilt twice
+    assert [row["count"] for row in hour_rows(tmp_path)] == [1440]
+    minutes = sum(row["count"] for row in fix_rollups.read_rollups(str(tmp_path), "1m"))
+    assert minutes == 1440
+
+
+def iso(seconds, offset=""):
+    return datetime.fromtimestamp(seconds, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S') + offset
+
+
+@pytest.fixture
+def served_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(fix_rollups.time, "time", lambda: HOUR + 7200)
+    store = fix_rollups.RollupStore(str(tmp_path))
+    monkeypatch.setattr(gps_websocket_offline, "web", web)
+    monkeypatch.setattr(gps_websocket_offline, "fix_rollups", fix_rollups)
+    monkeypatch.setattr(gps_websocket_offline, "fix_rollup_store", store)
+    yield store
+    store.close()
+
+
+def get_rollups(query):
+    response = asyncio.run(gps_websocket_offline.get_gps_rollups(make_mocked_request('GET', f'/gps/rollups?{query}')))
+    return response.status, json.loads(response.text)
+
+
+def test_http_rollups_include_open_periods(served_store):
+    add_fixes(served_store, 0, 3700)  # The first hour is written, the second is still open
+    status, body = get_rollups(f"level=1h&receiver=top_gps&start={iso(HOUR)}Z")
+    assert status == 200 and [row["count"] for row in body["rows"]] == [3600, 100]
+    # The offset is honoured: two hours later in +02:00 is the second hour in UTC.
+    status, body = get_rollups(f"level=1h&receiver=top_gps&start={iso(HOUR + 3600 + 7200)}%2B02:00")
+    assert [row["count"] for row in body["rows"]] == [100]
+    status, body = get_rollups("level=1m&receiver=bottom_gps")
+    assert (status, body["count"]) == (200, 0)
+
+
+@pytest.mark.parametrize("query", ["level=1d", "start=2025-13-99", "end=noon"])
+def test_http_rollups_reject_bad_queries(served_store, query):
+    assert get_rollups(query)[0] == 400
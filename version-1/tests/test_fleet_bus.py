@@ -0,0 +1,29 @@
+import json
+
+import fleet_bus
+
+
+def frame_payload(frame):
+    (length,) = fleet_bus.FRAME_HEADER.unpack_from(frame)
+    payload = frame[fleet_bus.FRAME_HEADER.size:]
+    assert len(payload) == length
+    return payload
+
+
+def test_ship_records_round_trip():
+    records = [("A", 10.5, -20.25, '{"ship_id":"A"}'), ("ß-2", None, None, '{"ship_id":"ß-2","x":"ü"}')]
+    payload = frame_payload(fleet_bus.encode_records(records))
+    assert fleet_bus.FRAME_KIND.unpack_from(payload)[0] == fleet_bus.KIND_SHIPS
+    assert list(fleet_bus.decode_records(payload)) == records
+
+
+def test_fence_state_frame():
+    state = {"events": [{"seq": 1, "event": "enter", "fence_id": "f", "ship_id": "A"}]}
+    payload = frame_payload(fleet_bus.encode_fence_state(state))
+    assert fleet_bus.FRAME_KIND.unpack_from(payload)[0] == fleet_bus.KIND_FENCES
+    assert json.loads(payload[fleet_bus.FRAME_KIND.size:]) == state
+
+
+def test_empty_batch():
+    payload = frame_payload(fleet_bus.encode_records([]))
+    assert list(fleet_bus.decode_records(payload)) == []
@@ -0,0 +1,75 @@
+import geofence
+
+HARBOUR = {"id": "harbour", "type": "polygon", "points": [[10.0, 20.0], [10.0, 20.1], [10.1, 20.1], [10.1, 20.0]]}
+BUOY = {"id": "buoy", "name": "Outer buoy", "type": "circle", "center": [10.05, 20.05], "radius_m": 500,
+        "dwell_seconds": 60}
+
+
+def make_engine():
+    engine = geofence.GeofenceEngine()
+    engine.set_fences([geofence.parse_fence(HARBOUR), geofence.parse_fence(BUOY)])
+    return engine
+
+
+def kinds(events):
+    return sorted((event["event"], event["fence_id"]) for event in events)
+
+
+def test_enter_dwell_exit():
+    engine = make_engine()
+    assert engine.evaluate("ship", 9.0, 20.05, 0) == []
+    assert kinds(engine.evaluate("ship", 10.01, 20.01, 10)) == [("enter", "harbour")]
+    assert kinds(engine.evaluate("ship", 10.05, 20.05, 20)) == [("enter", "buoy")]
+    assert engine.evaluate("ship", 10.05, 20.05, 50) == []
+    [dwell] = engine.evaluate("ship", 10.05, 20.05, 80)
+    assert (dwell["event"], dwell["dwell_seconds"]) == ("dwell", 60)
+    assert engine.evaluate("ship", 10.05, 20.05, 200) == []  # Dwell is reported once per visit
+    assert engine.ships_inside("buoy") == ["ship"]
+    assert kinds(engine.evaluate("ship", 9.0, 20.05, 210)) == [("exit", "buoy"), ("exit", "harbour")]
+    assert engine.inside == {}
+    assert [event["seq"] for event in engine.events_since(2, 10)] == [3, 4, 5]
+
+
+def test_removed_fence_drops_its_state():
+    engine = make_engine()
+    engine.evaluate("ship", 10.05, 20.05, 0)
+    engine.set_fences([geofence.parse_fence(HARBOUR)])
+    assert engine.ships_inside("buoy") == []
+    assert engine.ships_inside("harbour") == ["ship"]
+
+
+def test_follower_applies_snapshot_then_events():
+    owner = make_engine()
+    owner.evaluate("a", 10.01, 20.01, 0)
+    follower = make_engine()
+    assert follower.apply_state(owner.snapshot()) == []
+    assert follower.ships_inside("harbour") == ["a"]
+    events = owner.evaluate("b", 10.05, 20.05, 5) + owner.evaluate("a", 9.0, 20.0, 6)
+    new = follower.apply_state({"events": events})
+    assert [event["seq"] for event in new] == [event["seq"] for event in events]
+    assert follower.apply_state({"events": events}) == []  # Already seen
+    assert follower.ships_inside("harbour") == ["b"]
+    assert follower.ships_inside("buoy") == ["b"]
+    assert follower.seq == owner.seq
+
+
+def test_parse_fence_rejects_bad_definitions():
+    for definition in ({"type": "circle"}, {"id": "x", "type": "circle", "center": [0, 0], "radius_m": 0},
+                       {"id": "x", "type": "polygon", "points": [[0, 0], [1, 1], [0, 0]]},
+                       {"id": "x", "type": "square"}):
+        try:
+            geofence.parse_fence(definition)
+        except ValueError:
+            continue
+        raise AssertionError(f"accepted {definition}")
+
+
+def test_circle_across_the_antimeridian():
+    fence = geofence.parse_fence({"id": "dateline", "type": "circle", "center": [0.0, 179.99], "radius_m": 5000})
+    south, west, north, east = fence.bbox
+    assert west > east and west < 180.0 and east > -180.0
+    engine = geofence.GeofenceEngine()
+    engine.set_fences([fence])
+    assert kinds(engine.evaluate("east", 0.0, 179.999, 0)) == [("enter", "dateline")]
+    assert kinds(engine.evaluate("west", 0.0, -179.99, 0)) == [("enter", "dateline")]
+    assert engine.evaluate("far", 0.0, -179.5, 0) == []
@@ -0,0 +1,89 @@
+import json
+
+import gps_archive
+
+
+def fix(day, second):
+    return {"timestamp": f"{day[:4]}-{day[4:6]}-{day[6:]} 00:00:{second:02d}.000000", "n": second}
+
+
+def read_all(reader):
+    fixes = []
+    while True:
+        data = reader.read()
+        if data is None:
+            return fixes
+        fixes.append(data)
+
+
+def test_new_reader_starts_at_the_live_end(tmp_path):
+    archive = gps_archive.FixArchive(str(tmp_path))
+    archive.append(fix("20250603", 0))
+    reader = gps_archive.ArchiveReader(archive, str(tmp_path / "cursors" / "a.json"))
+    assert reader.read() is None
+    archive.append(fix("20250603", 1))
+    assert [data["n"] for data in read_all(reader)] == [1]
+
+
+def test_rewind_returns_to_the_last_commit(tmp_path):
+    archive = gps_archive.FixArchive(str(tmp_path))
+    cursor = tmp_path / "cursors" / "a.json"
+    cursor.parent.mkdir()
+    cursor.write_text(json.dumps({"day": None, "offset": 0}))
+    reader = gps_archive.ArchiveReader(archive, str(cursor))
+    for second in range(3):
+        archive.append(fix("20250603", second))
+    assert reader.read()["n"] == 0
+    reader.commit()
+    assert [data["n"] for data in read_all(reader)] == [1, 2]
+    reader.rewind()
+    assert [data["n"] for data in read_all(reader)] == [1, 2]
+
+
+def test_cursor_survives_a_restart_and_follows_segments(tmp_path):
+    archive = gps_archive.FixArchive(str(tmp_path))
+    cursor = tmp_path / "cursors" / "a.json"
+    cursor.parent.mkdir()
+    cursor.write_text(json.dumps({"day": "20250603", "offset": 0}))
+    for second in range(2):
+        archive.append(fix("20250603", second))
+    reader = gps_archive.ArchiveReader(archive, str(cursor))
+    assert reader.read()["n"] == 0
+    reader.commit()
+    assert reader.read()["n"] == 1  # Read but not committed: sent again after the restart
+    reader.save()
+    reader.close()
+    archive.append(fix("20250604", 5))
+    archive.close()
+
+    reader = gps_archive.ArchiveReader(archive, str(cursor))
+    assert [data["n"] for data in read_all(reader)] == [1, 5]
+    assert reader.day == "20250604"
+    assert reader.lag_fixes() == 0
+
+
+def test_partial_line_is_left_for_the_next_read(tmp_path):
+    archive = gps_archive.FixArchive(str(tmp_path))
+    archive.append(fix("20250603", 0))
+    cursor = tmp_path / "cursors" / "a.json"
+    cursor.parent.mkdir()
+    cursor.write_text(json.dumps({"day": "20250603", "offset": 0}))
+    reader = gps_archive.ArchiveReader(archive, str(cursor))
+    line = json.dumps(fix("20250603", 1))
+    with open(archive.segment_path("20250603"), 'a') as f:
+        f.write(line[:10])
+    assert [data["n"] for data in read_all(reader)] == [0]
+    with open(archive.segment_path("20250603"), 'a') as f:
+        f.write(line[10:] + "\n")
+    assert [data["n"] for data in read_all(reader)] == [1]
+
+
+def test_segments_prefers_the_least_compacted_file(tmp_path):
+    (tmp_path / "gps-20250601.jsonl.gz").write_bytes(b"")
+    (tmp_path / "gps-20250601.jsonl").write_text("")
+    (tmp_path / "gps-20250602-60s.jsonl.gz").write_bytes(b"")
+    (tmp_path / "notes.txt").write_text("")
+    archive = gps_archive.FixArchive(str(tmp_path))
+    assert archive.segments() == [("20250601", str(tmp_path / "gps-20250601.jsonl")),
+                                  ("20250602", str(tmp_path / "gps-20250602-60s.jsonl.gz"))]
+    assert archive.segments(start_day="20250602") == [("20250602", str(tmp_path / "gps-20250602-60s.jsonl.gz"))]
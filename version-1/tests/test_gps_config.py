@@ -0,0 +1,89 @@
+import json
+import os
+import types
+
+import pytest
+
+import gps_config
+import gps_websocket_offline as service
+
+
+def make_module(**settings):
+    module = types.ModuleType("settings")
+    vars(module).update(settings)
+    return module
+
+
+def write(path, data, mtime):
+    path.write_text(json.dumps(data))
+    os.utime(path, (mtime, mtime))
+
+
+@pytest.mark.parametrize("value, default, expected", [
+    ("yes", False, True), ("3", 1, 3), (4.0, 1, 4), ("2.5", 1.0, 2.5), ('["a"]', (), ("a",)),
+    ('{"k": 1}', {}, {"k": 1}), ("raw", None, "raw")])
+def test_coerce(value, default, expected):
+    assert gps_config.coerce("NAME", value, default) == expected
+
+
+@pytest.mark.parametrize("value, default", [("maybe", False), (True, 1), (2.5, 1), (3, "text"), ("{", []), ([], {})])
+def test_coerce_rejects(value, default):
+    with pytest.raises(ValueError):
+        gps_config.coerce("NAME", value, default)
+
+
+def test_layering_and_sections(tmp_path, monkeypatch):
+    module = make_module(SHIP_ID="SHIP123", TIMEOUT=10, PORT=8080, lower="ignored")
+    helper = make_module(RADIUS=15.0, LIMIT=5)
+    path = tmp_path / "config.json"
+    write(path, {"SHIP_ID": "MV-FILE", "TIMEOUT": "soon", "UNKNOWN": 1, "helper": {"RADIUS": 80, "LIMIT": 7}}, 1000)
+    monkeypatch.setenv("T_TIMEOUT", "30")
+    monkeypatch.setenv("T_HELPER_LIMIT", "9")
+    config = gps_config.Config(module, str(path), "T_", hot=("SHIP_ID",))
+    config.add_section("helper", helper)
+    changed = config.load()
+    assert (module.SHIP_ID, module.TIMEOUT, module.PORT) == ("MV-FILE", 30, 8080)  # Environment beats the file
+    assert (helper.RADIUS, helper.LIMIT) == (80.0, 9)
+    assert changed == {"SHIP_ID": "MV-FILE", "TIMEOUT": 30, "helper.RADIUS": 80.0, "helper.LIMIT": 9}
+
+
+def test_reload_applies_hot_settings_only(tmp_path):
+    module = make_module(SHIP_ID="SHIP123", PORT=8080)
+    helper = make_module(RADIUS=15.0, WINDOW=300)
+    path = tmp_path / "config.json"
+    config = gps_config.Config(module, str(path), "T_", hot=("SHIP_ID",))
+    config.add_section("helper", helper, hot=("RADIUS",))
+    assert config.load() == {}  # No file yet
+    write(path, {"SHIP_ID": "MV-NEW", "PORT": 9090, "helper": {"RADIUS": 40, "WINDOW": 10}}, 1000)
+    assert config.reload_if_changed() == ["SHIP_ID", "helper.RADIUS"]
+    assert (module.SHIP_ID, module.PORT, helper.RADIUS, helper.WINDOW) == ("MV-NEW", 8080, 40.0, 300)
+    assert config.reload_if_changed() == []  # Unchanged file
+    path.write_text("{not json")
+    os.utime(path, (2000, 2000))
+    assert config.reload_if_changed() == []
+    assert module.SHIP_ID == "MV-NEW"
+
+
+def test_unknown_hot_setting():
+    with pytest.raises(ValueError):
+        gps_config.Config(make_module(SHIP_ID="x"), "unused.json", "T_", hot=("MISSING",))
+
+
+def test_uplink_destinations_follow_the_configured_url(tmp_path, monkeypatch):
+    monkeypatch.setattr(service, "EXTERNAL_WEBSOCKET_URL", service.EXTERNAL_WEBSOCKET_URL)
+    monkeypatch.setattr(service, "UPLINK_DESTINATIONS", None)
+    path = tmp_path / "config.json"
+    write(path, {"EXTERNAL_WEBSOCKET_URL": "ws://shore:4001"}, 1000)
+    config = gps_config.Config(service, str(path), "GPS_TEST_", service.HOT_SETTINGS,
+                               exclude=("CONFIG_FILE", "HOT_SETTINGS"))
+    config.load()
+    assert service.uplink_destinations() == [{"name": "primary", "url": "ws://shore:4001"}]
+    primary = service.uplink_destinations()[0]
+    write(path, {"UPLINK_DESTINATIONS": [{"name": "primary", "url": ["ws://a:1", "ws://b:2"]},
+                                         {"name": "logger", "url": "ws://127.0.0.1:4002"}]}, 2000)
+    assert "UPLINK_DESTINATIONS" in config.reload_if_changed()
+    assert service.uplink_urls(primary) == ["ws://a:1", "ws://b:2"]  # Applied on the next connection
+    monkeypatch.setattr(service, "UPLINK_DESTINATIONS", '[{"name": "primary"}]')
+    with pytest.raises(ValueError):
+        service.uplink_destinations()
+    assert service.uplink_urls(primary) == ["ws://shore:4001"]
@@ -0,0 +1,102 @@
+import gzip
+import json
+
+import pytest
+
+import gps_replay
+
+
+def record_session(path, count, devices=("/dev/ttyACM0",), start=1000.0):
+    recorder = gps_replay.SessionRecorder(str(path), devices)
+    for index in range(count):
+        recorder.record(json.dumps({"class": "TPV", "n": index}), received=start + index)
+    return recorder
+
+
+def replay_all(path):
+    session = gps_replay.ReplaySession(str(path), speed=0)
+    reports = [report["n"] for report in session]
+    return session, reports
+
+
+@pytest.mark.parametrize("name", ["session.rec", "session.rec.gz"])
+def test_round_trip(tmp_path, name):
+    record_session(tmp_path / name, 20).close()
+    session, reports = replay_all(tmp_path / name)
+    assert reports == list(range(20))
+    assert session.finished
+    assert session.devices == ["/dev/ttyACM0"]
+
+
+def test_device_changes_start_a_new_header(tmp_path):
+    path = tmp_path / "session.rec"
+    recorder = record_session(path, 3)
+    recorder.set_devices(["/dev/ttyACM0", "/dev/ttyACM1"])
+    recorder.record(json.dumps({"class": "TPV", "n": 3}), received=1010.0)
+    recorder.close()
+    recorder.close()  # A second close (shutdown after the replay ended) is harmless
+    session = gps_replay.ReplaySession(str(path), speed=0)
+    seen = []
+    for report in session:
+        seen.append((report["n"], list(session.devices)))
+    assert seen[2] == (2, ["/dev/ttyACM0"])
+    assert seen[3] == (3, ["/dev/ttyACM0", "/dev/ttyACM1"])
+
+
+def test_gzip_recording_killed_before_close(tmp_path):
+    path = tmp_path / "session.rec.gz"
+    record_session(path, 120).close()
+    data = (path).read_bytes()
+    path.write_bytes(data[:len(data) // 2])  # No gzip trailer, cut inside a record
+    session, reports = replay_all(path)
+    assert session.finished
+    assert 0 < len(reports) < 120
+    assert reports == list(range(len(reports)))
+
+
+def test_partial_last_line_ends_the_replay(tmp_path):
+    path = tmp_path / "session.rec"
+    record_session(path, 5).close()
+    with open(path, 'a') as f:
+        f.write('5000\t{"class": "TPV", "n": 5')
+    session, reports = replay_all(path)
+    assert reports == list(range(5))
+    assert session.finished
+
+
+def test_garbled_line_raises_and_replay_continues(tmp_path):
+    path = tmp_path / "session.rec"
+    recorder = record_session(path, 2)
+    recorder.record("{not json", received=1002.0)
+    recorder.record(json.dumps({"class": "TPV", "n": 2}), received=1003.0)
+    recorder.close()
+    session = gps_replay.ReplaySession(str(path), speed=0)
+    assert session.next()["n"] == 0
+    assert session.next()["n"] == 1
+    with pytest.raises(ValueError):
+        session.next()
+    assert session.next()["n"] == 2
+    assert session.errors == 1
+
+
+def test_summarize_reports_truncation(tmp_path, capsys):
+    path = tmp_path / "session.rec.gz"
+    record_session(path, 50).close()
+    with gzip.open(path, 'rt') as f:
+        assert f.readline().startswith(gps_replay.RECORD_MAGIC)
+    data = path.read_bytes()
+    path.write_bytes(data[:-20])
+    gps_replay.summarize(str(path))
+    assert "Truncated: yes" in capsys.readouterr().out
+
+
+def test_summarize_reports_the_first_session_devices(tmp_path, capsys):
+    path = tmp_path / "session.rec"
+    recorder = record_session(path, 2, devices=("/dev/ttyACM1",))
+    recorder.set_devices(["/dev/ttyACM1", "/dev/ttyACM0"])
+    recorder.record(json.dumps({"class": "TPV", "n": 2}), received=1005.0)
+    recorder.close()
+    gps_replay.summarize(str(path))
+    out = capsys.readouterr().out
+    assert "Sessions: 2, devices at start: ['/dev/ttyACM1']" in out
+    assert "Devices over all sessions: ['/dev/ttyACM0', '/dev/ttyACM1']" in out
@@ -0,0 +1,39 @@
+import sys
+
+import pytest
+
+import gps_websocket_offline as service
+
+LAZY = ("websockets", "web", "gps_archive", "fix_rollups", "track_export", "viewer_subscriptions", "gps_replay")
+
+
+@pytest.fixture
+def unloaded(monkeypatch):
+    for name in LAZY:
+        monkeypatch.setattr(service, name, None)
+    monkeypatch.setattr(service, "REPLAY_FILE", "session.rec")  # gps itself is only needed for a live gpsd
+    monkeypatch.setattr(service, "RECORD_FILE", None)
+    return service
+
+
+def loaded(module):
+    return {name for name in LAZY if getattr(module, name) is not None}
+
+
+def test_uplink_profile_loads_only_what_it_uses(unloaded):
+    assert unloaded.load_components(unloaded.PROFILES["uplink"]) == {"uplink", "archive"}
+    assert loaded(unloaded) == {"websockets", "gps_archive", "fix_rollups", "gps_replay"}
+    assert unloaded.gps_archive is sys.modules["gps_archive"]
+
+
+def test_full_profile_loads_everything(unloaded):
+    unloaded.load_components(unloaded.PROFILES["full"])
+    assert loaded(unloaded) == set(LAZY)
+
+
+def test_http_without_archive_skips_export(unloaded, monkeypatch):
+    monkeypatch.setattr(unloaded, "REPLAY_FILE", None)
+    monkeypatch.setattr(unloaded, "gps", None)
+    monkeypatch.setitem(sys.modules, "gps", object())  # Stands in for the gpsd client library
+    assert unloaded.load_components(("http",)) == {"http"}
+    assert loaded(unloaded) == {"web"}
@@ -0,0 +1,65 @@
+import receiver_health
+
+GOOD_SKY = {"hdop": 0.8, "satellites": [{"PRN": prn, "ss": 42.0, "used": True} for prn in range(1, 13)]}
+POOR_SKY = {"hdop": 5.0, "satellites": [{"PRN": prn, "ss": 20.0, "used": True} for prn in range(1, 3)]}
+
+
+def run(monitor, seconds, skies, positions=None, start=0):
+    """Feed one TPV and SKY report per second per listed receiver and evaluate after each second."""
+    positions = positions or {}
+    changed = []
+    for now in range(start, start + seconds):
+        for label, sky in skies.items():
+            lat, lon = positions.get(label, (10.0, 20.0))
+            monitor.observe_tpv(label, {"mode": 3, "lat": lat, "lon": lon}, float(now), float(now))
+            monitor.observe_sky(label, sky, float(now), float(now))
+        changed.append(monitor.evaluate(float(now)))
+    return changed
+
+
+def test_scores_and_states():
+    monitor = receiver_health.HealthMonitor(["top_gps", "bottom_gps"])
+    run(monitor, 3, {"top_gps": GOOD_SKY, "bottom_gps": POOR_SKY})
+    top, bottom = monitor.receivers["top_gps"], monitor.receivers["bottom_gps"]
+    assert (top.score, top.state) == (100, receiver_health.OK)
+    assert bottom.state == receiver_health.DEGRADED and bottom.score < receiver_health.HEALTHY_SCORE
+    assert top.rate == 1.0 and top.separation == 0.0
+    assert monitor.status()["receivers"]["top_gps"]["sats"] == 12
+
+
+def test_disagreeing_receiver_loses_agreement():
+    monitor = receiver_health.HealthMonitor(["a", "b", "c"])
+    run(monitor, 3, {"a": GOOD_SKY, "b": GOOD_SKY, "c": GOOD_SKY}, {"c": (10.01, 20.0)})
+    assert [monitor.receivers[label].score for label in "abc"] == [100, 100, 90]
+    assert monitor.receivers["c"].separation > receiver_health.DISAGREE_M
+
+
+def test_primary_switches_only_by_a_margin():
+    monitor = receiver_health.HealthMonitor(["top_gps", "bottom_gps"])
+    run(monitor, 3, {"top_gps": POOR_SKY, "bottom_gps": GOOD_SKY})
+    assert monitor.primary == "bottom_gps"
+    # Now top is better, but bottom is still healthy and within SWITCH_MARGIN.
+    slightly_worse = dict(GOOD_SKY, hdop=1.4)
+    run(monitor, 3, {"top_gps": GOOD_SKY, "bottom_gps": slightly_worse}, start=3)
+    assert monitor.receivers["top_gps"].score > monitor.receivers["bottom_gps"].score
+    assert monitor.primary == "bottom_gps"
+
+
+def test_stale_primary_is_replaced():
+    monitor = receiver_health.HealthMonitor(["top_gps", "bottom_gps"], stale_after=5)
+    run(monitor, 3, {"top_gps": GOOD_SKY, "bottom_gps": POOR_SKY})
+    assert monitor.primary == "top_gps"
+    changed = run(monitor, 10, {"bottom_gps": POOR_SKY}, start=3)
+    assert any(changed)
+    assert monitor.receivers["top_gps"].state == receiver_health.STALE
+    assert monitor.primary == "bottom_gps"
+
+
+def test_set_receivers_keeps_known_history():
+    monitor = receiver_health.HealthMonitor(["top_gps", "bottom_gps"])
+    run(monitor, 2, {"top_gps": GOOD_SKY})
+    top = monitor.receivers["top_gps"]
+    monitor.set_receivers(["gps_2", "top_gps"])
+    assert monitor.receivers["top_gps"] is top and monitor.primary == "top_gps"
+    monitor.set_receivers(["gps_2"])
+    assert monitor.primary == "gps_2"
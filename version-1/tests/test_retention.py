@@ -0,0 +1,103 @@
+import gzip
+import json
+import os
+from datetime import datetime, timezone
+
+import pytest
+
+import fix_rollups
+import gps_archive
+import retention
+
+NOW = datetime(2025, 6, 30, 12, tzinfo=timezone.utc).timestamp()
+TODAY = "20250630"
+
+
+def write_segment(directory, day, seconds=600):
+    path = os.path.join(directory, f"{gps_archive.SEGMENT_PREFIX}{day}{gps_archive.SEGMENT_SUFFIX}")
+    with open(path, 'w') as f:
+        for second in range(seconds):
+            timestamp = f"{day[:4]}-{day[4:6]}-{day[6:]} 00:{second // 60:02d}:{second % 60:02d}.000000"
+            f.write(json.dumps({"timestamp": timestamp, "gps_data": []}) + "\n")
+    return path
+
+
+def write_cursor(directory, name, day):
+    os.makedirs(os.path.join(directory, "cursors"), exist_ok=True)
+    with open(os.path.join(directory, "cursors", f"{name}.json"), 'w') as f:
+        json.dump({"day": day, "offset": 0}, f)
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    monkeypatch.setattr(retention, "ARCHIVE_COMPRESS_AFTER_DAYS", 2)
+    monkeypatch.setattr(retention, "ARCHIVE_DOWNSAMPLE_AFTER_DAYS", 90)
+    monkeypatch.setattr(retention, "ARCHIVE_DOWNSAMPLE_SECONDS", 60)
+    monkeypatch.setattr(retention, "ARCHIVE_MAX_AGE_DAYS", 730)
+    monkeypatch.setattr(retention, "ROLLUP_MINUTE_MAX_AGE_DAYS", 400)
+    monkeypatch.setattr(retention, "ARCHIVE_QUOTA_MB", 4096)
+    for day in ("20230101", "20250301", "20250620", "20250626", "20250629", TODAY):
+        write_segment(str(tmp_path), day)
+    return tmp_path
+
+
+def files(directory):
+    return sorted(name for name in os.listdir(directory) if name.startswith(gps_archive.SEGMENT_PREFIX))
+
+
+def test_compaction_by_age(archive):
+    raw = os.path.join(archive, "gps-20250620.jsonl")
+    mtime = os.stat(raw).st_mtime_ns
+    retention.enforce_archive(str(archive), TODAY, NOW)
+    assert files(archive) == ["gps-20250301-60s.jsonl.gz", "gps-20250620.jsonl.gz", "gps-20250626.jsonl.gz",
+                              "gps-20250629.jsonl", "gps-20250630.jsonl"]
+    assert os.stat(os.path.join(archive, "gps-20250620.jsonl.gz")).st_mtime_ns == mtime
+    with gzip.open(os.path.join(archive, "gps-20250620.jsonl.gz"), 'rb') as f:
+        assert len(f.readlines()) == 600
+    with gzip.open(os.path.join(archive, "gps-20250301-60s.jsonl.gz"), 'rb') as f:
+        assert len(f.readlines()) == 10  # One fix per minute
+
+
+def test_cursor_protects_unsent_days(archive):
+    write_cursor(str(archive), "shore", "20250301")
+    write_cursor(str(archive), "backup", "20250626")
+    retention.enforce_archive(str(archive), TODAY, NOW)
+    # Everything from the oldest cursor's day on stays raw; older days still expire.
+    assert files(archive) == ["gps-20250301.jsonl", "gps-20250620.jsonl", "gps-20250626.jsonl",
+                              "gps-20250629.jsonl", "gps-20250630.jsonl"]
+
+
+def test_unreadable_cursor_protects_everything(archive):
+    os.makedirs(os.path.join(archive, "cursors"))
+    (archive / "cursors" / "broken.json").write_text("{")
+    retention.enforce_archive(str(archive), TODAY, NOW)
+    assert "gps-20230101.jsonl" in files(archive)
+    assert not any(name.endswith('.gz') for name in files(archive))
+
+
+def test_quota_spares_protected_segments(archive, monkeypatch):
+    write_cursor(str(archive), "shore", "20250626")
+    monkeypatch.setattr(retention, "MB", 1)
+    monkeypatch.setattr(retention, "ARCHIVE_QUOTA_MB", 1)
+    candidates = retention.enforce_archive(str(archive), TODAY, NOW)
+    assert files(archive) == ["gps-20250626.jsonl", "gps-20250629.jsonl", "gps-20250630.jsonl"]
+    assert all(candidate.protected for candidate in candidates)
+
+
+def test_interrupted_compression_is_finished(archive):
+    raw = os.path.join(archive, "gps-20250620.jsonl")
+    with open(raw, 'rb') as source, gzip.open(raw + '.gz', 'wb') as target:
+        target.write(source.read())
+    os.utime(raw, ns=(0, 0))  # Written before the compressed copy was made
+    (archive / "gps-20250620.jsonl.gz.tmp").write_bytes(b"partial")
+    retention.enforce_archive(str(archive), TODAY, NOW)
+    assert [name for name in os.listdir(archive) if "20250620" in name] == ["gps-20250620.jsonl.gz"]
+
+
+def test_old_minute_rollups_expire(archive):
+    rollups = archive / "rollups"
+    rollups.mkdir()
+    for level, day in (("1m", "20240101"), ("1m", "20250601"), ("1h", "20240101"), ("1h", "20230101")):
+        (rollups / f"{level}-{day}{fix_rollups.ROLLUP_SUFFIX}").write_text("")
+    retention.enforce_archive(str(archive), TODAY, NOW)
+    assert sorted(os.listdir(rollups)) == ["1h-20240101.jsonl", "1m-20250601.jsonl"]
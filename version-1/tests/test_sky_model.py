@@ -0,0 +1,41 @@
+import sky_model
+
+
+def report(*satellites, **dop):
+    return dict(dop, satellites=[{"PRN": prn, "el": el, "az": az, "ss": ss, "used": used}
+                                 for prn, el, az, ss, used in satellites])
+
+
+def test_constellation_codes():
+    assert sky_model.constellation(12) == "GP"
+    assert sky_model.constellation(70) == "GL"
+    assert sky_model.constellation(305) == "GA"
+    assert sky_model.constellation(5, gnssid=3) == "BD"
+    assert sky_model.constellation(999) == "??"
+
+
+def test_deltas_only_carry_changes():
+    sky = sky_model.SkyModel("top_gps")
+    first = sky.update(report((12, 45.2, 180.0, 38.04, True), (70, 10, 90, 20, False), hdop=0.91), 1.0)
+    assert first == {"type": "skyDelta", "receiver": "top_gps", "seq": 1,
+                     "set": {"12": [45, 180, 38.0, 1, "GP"], "70": [10, 90, 20, 0, "GL"]},
+                     "dop": {"hdop": 0.91}}
+    assert sky.update(report((12, 45, 180, 38, True), (70, 10, 90, 20, False), hdop=0.91), 2.0) is None
+    second = sky.update(report((12, 45, 180, 36.5, True), hdop=0.91, vdop=1.2), 3.0)
+    assert second == {"type": "skyDelta", "receiver": "top_gps", "seq": 2, "set": {"12": [45, 180, 36.5, 1, "GP"]},
+                      "drop": ["70"], "dop": {"vdop": 1.2}}
+    assert sky.update({"hdop": 0.8}, 4.0)["dop"] == {"hdop": 0.8}  # DOP-only reports keep the satellites
+    assert list(sky.satellites) == [12]
+
+
+def test_snapshot_constellations_and_history():
+    sky = sky_model.SkyModel("top_gps")
+    for index in range(sky_model.SNR_HISTORY + 5):
+        sky.update(report((12, 45, 180, float(index), True), (3, 20, 60, 30, False)), float(index))
+    snapshot = sky.snapshot(history=True)
+    assert snapshot["seq"] == sky.seq and set(snapshot["satellites"]) == {"12", "3"}
+    assert snapshot["constellations"] == {"GPS": {"visible": 2, "used": 1,
+                                                  "mean_used_snr": float(sky_model.SNR_HISTORY + 4)}}
+    history = snapshot["snr_history"]["12"]
+    assert len(history) == sky_model.SNR_HISTORY and history[0] == 5.0 and history[-1] == sky_model.SNR_HISTORY + 4
+    assert "snr_history" not in sky.snapshot()
@@ -0,0 +1,30 @@
+import spatial_index
+
+
+def test_box_index_across_the_antimeridian():
+    index = spatial_index.BoxIndex()
+    index.add("dateline", (-5.0, 179.0, 5.0, -179.0))
+    index.add("world", (-90.0, -180.0, 90.0, 180.0))  # Too many cells: kept in the wide set
+    assert sorted(index.containing(0.0, 179.5)) == ["dateline", "world"]
+    assert sorted(index.containing(0.0, -179.5)) == ["dateline", "world"]
+    assert list(index.containing(0.0, 0.0)) == ["world"]
+    index.remove("dateline")
+    assert list(index.containing(0.0, 179.5)) == ["world"]
+    assert len(index) == 1
+
+
+def test_point_index_near_and_bbox():
+    index = spatial_index.PointIndex()
+    index.update("a", 0.0, 179.99)
+    index.update("b", 0.0, -179.99)
+    index.update("c", 1.0, 0.0)
+    index.update("c", 0.5, 0.0)  # Moved: only the newest position is indexed
+    near = index.near(0.0, 179.999, 5000)
+    assert [key for _, key in near] == ["a", "b"]
+    assert near[0][0] < near[1][0]
+    assert index.near(0.0, 179.999, 5000, limit=1)[0][1] == "a"
+    assert sorted(key for key, _, _ in index.within_bbox((-1.0, 179.0, 1.0, -179.0))) == ["a", "b"]
+    assert [key for key, _, _ in index.within_bbox((0.0, -1.0, 1.0, 1.0))] == ["c"]
+    index.remove("a")
+    assert len(index) == 2
+    assert [key for _, key in index.near(0.0, 179.999, 5000)] == ["b"]
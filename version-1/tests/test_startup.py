@@ -0,0 +1,65 @@
+import socket
+
+import pytest
+
+import startup
+
+
+@pytest.fixture
+def notify_socket(tmp_path, monkeypatch):
+    """A datagram socket standing in for systemd's NOTIFY_SOCKET; returns a function reading what was sent."""
+    path = str(tmp_path / "notify")
+    receiver = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    receiver.bind(path)
+    receiver.setblocking(False)
+    monkeypatch.setenv("NOTIFY_SOCKET", path)
+
+    def messages():
+        received = []
+        while True:
+            try:
+                received.append(receiver.recv(1024).decode())
+            except BlockingIOError:
+                return received
+
+    yield messages
+    receiver.close()
+
+
+def test_ready_once_all_milestones_are_reached(notify_socket):
+    readiness = startup.Readiness()
+    assert readiness.mark("servers")
+    assert not readiness.ready() and notify_socket() == []
+    assert readiness.mark("gpsd")
+    assert not readiness.mark("gpsd")
+    assert readiness.ready()
+    assert notify_socket() == ["READY=1\nSTATUS=Serving, waiting for first fix"]
+    readiness.mark("first_fix")
+    [status] = notify_socket()
+    assert status.startswith("STATUS=Serving, first fix after")
+    assert set(readiness.status()["milestones"]) == {"servers", "gpsd", "first_fix"}
+
+
+def test_serving_while_waiting_for_a_receiver(notify_socket):
+    readiness = startup.Readiness()
+    readiness.mark("servers")
+    readiness.mark(startup.WAITING_MILESTONE)
+    assert not readiness.ready()
+    assert notify_socket() == ["READY=1\nSTATUS=Serving, waiting for a GPS receiver"]
+    readiness.mark("gpsd")
+    assert readiness.ready()
+    assert notify_socket() == ["STATUS=Serving, waiting for first fix"]
+
+
+def test_sd_notify_outside_systemd(monkeypatch):
+    monkeypatch.delenv("NOTIFY_SOCKET", raising=False)
+    assert not startup.sd_notify("READY=1")
+
+
+def test_wait_for_port():
+    with socket.socket() as listener:
+        listener.bind(("127.0.0.1", 0))
+        listener.listen(1)
+        port = listener.getsockname()[1]
+        assert startup.wait_for_port("127.0.0.1", port, 1.0) is not None
+    assert startup.wait_for_port("127.0.0.1", port, 0.05) is None
@@ -0,0 +1,101 @@
+import asyncio
+import csv
+import io
+import json
+import xml.etree.ElementTree as ElementTree
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import make_mocked_request
+
+import gps_archive
+import gps_websocket_offline
+import track_export
+
+
+def make_fix(timestamp, latitude, longitude=20.0):
+    return {"timestamp": timestamp, "primary": "top_gps", "heading": 90.0,
+            "gps_data": [{"gps": "top_gps", "latitude": latitude, "longitude": longitude, "altitude": 5.0,
+                          "speed": 10.0, "satellites": 9},
+                         {"gps": "bottom_gps", "latitude": latitude + 0.0002, "longitude": longitude,
+                          "altitude": None, "speed": 10.0, "satellites": None}]}
+
+
+@pytest.fixture
+def archive(tmp_path):
+    archive = gps_archive.FixArchive(str(tmp_path))
+    for day in ("2025-06-02", "2025-06-03"):
+        for hour in range(0, 24, 6):
+            archive.append(make_fix(f"{day} {hour:02d}:00:00.000000", 10.0 + hour / 100))
+    archive.close()
+    return archive
+
+
+def export_text(archive, fmt, start=None, end=None, receiver=None, tolerance_m=None):
+    return b''.join(track_export.export(archive, fmt, start, end, receiver, tolerance_m)).decode()
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("2025-06-03", "2025-06-03"), ("2025-06-03T02", "2025-06-03 02"), ("2025-06-03T04:30+02:00", "2025-06-03 02:30"),
+    ("2025-06-03T00:30:15-01:00", "2025-06-03 01:30:15"), ("2025-06-03T02:30:15.25Z", "2025-06-03 02:30:15.25"),
+    ("2025-06-03T00:30+02:00", "2025-06-02 22:30"), ("", None), (None, None)])
+def test_normalize_time(value, expected):
+    assert track_export.normalize_time(value) == expected
+
+
+@pytest.mark.parametrize("value", ["2025-13-99", "2025-06-03T25:00", "yesterday", "2025"])
+def test_normalize_time_rejects(value):
+    with pytest.raises(ValueError):
+        track_export.normalize_time(value)
+
+
+def times(archive, start, end):
+    return [fix["timestamp"][:16] for fix in track_export.iter_fixes(archive, track_export.normalize_time(start),
+                                                                     track_export.normalize_time(end))]
+
+
+def test_time_filter(archive):
+    assert times(archive, "2025-06-03", "2025-06-03") == ["2025-06-03 00:00", "2025-06-03 06:00",
+                                                          "2025-06-03 12:00", "2025-06-03 18:00"]
+    assert times(archive, "2025-06-02T18", "2025-06-03T00") == ["2025-06-02 18:00", "2025-06-03 00:00"]
+    # 08:00+02:00 is 06:00 UTC.
+    assert times(archive, "2025-06-03T08:00+02:00", "2025-06-03T14:00+02:00") == ["2025-06-03 06:00",
+                                                                                  "2025-06-03 12:00"]
+
+
+def test_geojson_linestring(archive):
+    feature = json.loads(export_text(archive, "geojson", "2025-06-03"))
+    coordinates = feature["geometry"]["coordinates"]
+    assert len(coordinates) == 4 and coordinates[0] == [20.0, 10.0, 5.0]
+    assert feature["properties"] == {"start": "2025-06-03 00:00:00.000000", "end": "2025-06-03 18:00:00.000000",
+                                     "points": 4}
+
+
+def test_features_csv_and_gpx(archive):
+    features = json.loads(export_text(archive, "features", "2025-06-03", receiver="bottom_gps"))["features"]
+    assert len(features) == 4 and features[0]["properties"]["receiver"] == "bottom_gps"
+    assert features[0]["geometry"]["coordinates"] == [20.0, 10.0002]
+    rows = list(csv.DictReader(io.StringIO(export_text(archive, "csv", end="2025-06-02"))))
+    assert len(rows) == 4 and rows[0]["satellites"] == "9" and rows[0]["receiver"] == "top_gps"
+    document = ElementTree.fromstring(export_text(archive, "gpx", "2025-06-03T12"))
+    namespace = {"gpx": track_export.GPX_NAMESPACE}
+    points = document.findall(".//gpx:trkpt", namespace)
+    assert [point.find("gpx:time", namespace).text for point in points] == ["2025-06-03T12:00:00.000000Z",
+                                                                          "2025-06-03T18:00:00.000000Z"]
+
+
+def test_simplify_drops_straight_line_points():
+    points = [(str(index), 10.0 + index * 0.001, 20.0, None, None, None, None, "top_gps") for index in range(10)]
+    points.append(("10", 10.009, 20.01, None, None, None, None, "top_gps"))
+    kept = list(track_export.simplify(points, 5.0, window=4))
+    assert [point[0] for point in kept] == ["0", "3", "6", "9", "10"]  # Window ends are always kept
+    assert [point[0] for point in track_export.simplify(points, 5.0)] == ["0", "9", "10"]
+
+
+@pytest.mark.parametrize("query", ["format=kml", "start=2025-13-99", "end=2025-06-03T04:00%2B99:00", "simplify=x"])
+def test_http_export_rejects_bad_queries(archive, monkeypatch, query):
+    monkeypatch.setattr(gps_websocket_offline, "web", web)
+    monkeypatch.setattr(gps_websocket_offline, "track_export", track_export)
+    monkeypatch.setattr(gps_websocket_offline, "fix_archive", archive)
+    response = asyncio.run(gps_websocket_offline.export_track(make_mocked_request('GET', f'/export?{query}')))
+    assert response.status == 400
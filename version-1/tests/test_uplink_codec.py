@@ -0,0 +1,69 @@
+import pytest
+
+import uplink_codec
+
+
+def make_fix(second, latitude, speed=5.0, satellites=9, prns=("3", "7", "12"), receivers=("top_gps", "bottom_gps")):
+    return {
+        "timestamp": f"2025-06-03 12:00:{second:02d}.250000",
+        "ship_id": "MV-TEST",
+        "device_id": "pi-1",
+        "heading": 87.5,
+        "primary": "top_gps",
+        "gps_data": [{"gps": label, "latitude": latitude + index * 1e-5, "longitude": -122.4194155,
+                      "altitude": 12.345, "speed": speed, "satellites": satellites,
+                      "satellite_prns": list(prns)} for index, label in enumerate(receivers)],
+    }
+
+
+def test_round_trip_keyframes_and_deltas():
+    encoder = uplink_codec.CompactEncoder(keyframe_interval=3)
+    decoder = uplink_codec.CompactDecoder()
+    fixes = [make_fix(second, 37.7749295 + second * 1e-6, speed=5.0 + second / 10) for second in range(8)]
+    frames = [encoder.encode(fix) for fix in fixes]
+    assert frames[0][0] == uplink_codec.FRAME_STATIC
+    assert frames[1][0] == uplink_codec.FRAME_DELTA
+    assert frames[4][0] == uplink_codec.FRAME_KEY  # keyframe_interval deltas after the first keyframe
+    for fix, frame in zip(fixes, frames):
+        [decoded] = decoder.decode(frame)
+        assert decoded["timestamp"] == fix["timestamp"]
+        assert decoded["heading"] == fix["heading"]
+        assert decoded["primary"] == "top_gps"
+        for sent, received in zip(fix["gps_data"], decoded["gps_data"]):
+            assert received["gps"] == sent["gps"]
+            assert received["latitude"] == pytest.approx(sent["latitude"], abs=1e-7)
+            assert received["altitude"] == pytest.approx(sent["altitude"])
+            assert received["speed"] == pytest.approx(sent["speed"])
+            assert received["satellites"] == sent["satellites"]
+            assert sorted(received["satellite_prns"], key=int) == list(sent["satellite_prns"])
+
+
+def test_missing_values_and_receiver_changes():
+    encoder = uplink_codec.CompactEncoder()
+    decoder = uplink_codec.CompactDecoder()
+    first = make_fix(0, 10.0)
+    first["gps_data"][1].update(latitude=None, longitude=None, speed=None)
+    second = make_fix(1, 10.0, receivers=("top_gps",))
+    message = encoder.encode(first) + encoder.encode(second)
+    decoded = decoder.decode(message)
+    assert [gps["gps"] for gps in decoded[0]["gps_data"]] == ["top_gps", "bottom_gps"]
+    assert decoded[0]["gps_data"][1]["latitude"] is None
+    assert decoded[0]["gps_data"][1]["speed"] is None
+    # The receiver list changed, so the second fix starts over with STATIC and a keyframe.
+    assert [gps["gps"] for gps in decoded[1]["gps_data"]] == ["top_gps"]
+
+
+def test_decoder_rejects_frames_out_of_order():
+    encoder = uplink_codec.CompactEncoder()
+    encoder.encode(make_fix(0, 10.0))
+    delta = encoder.encode(make_fix(1, 10.0001))
+    with pytest.raises(ValueError):
+        uplink_codec.CompactDecoder().decode(delta)
+
+
+def test_timestamps_and_encoding_choice():
+    micros = uplink_codec.parse_timestamp("2025-06-03 12:00:01.500000")
+    assert uplink_codec.format_timestamp(micros) == "2025-06-03 12:00:01.500000"
+    assert uplink_codec.parse_timestamp("not a time") is None
+    assert uplink_codec.choose_encoding(["zstd", uplink_codec.ENCODING_COMPACT]) == uplink_codec.ENCODING_COMPACT
+    assert uplink_codec.choose_encoding(None) == uplink_codec.ENCODING_JSON
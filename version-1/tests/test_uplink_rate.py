@@ -0,0 +1,58 @@
+import datetime
+
+import uplink_rate
+
+START = datetime.datetime(2025, 6, 3, 12, 0, 0)
+
+
+def make_fix(seconds, latitude=37.7749, speed=0.0, heading=90.0):
+    timestamp = (START + datetime.timedelta(seconds=seconds)).strftime("%Y-%m-%d %H:%M:%S.%f")
+    return {"timestamp": timestamp, "heading": heading, "primary": "top_gps",
+            "gps_data": [{"gps": "top_gps", "latitude": latitude, "longitude": -122.4194, "speed": speed}]}
+
+
+def sent_at(controller, fixes):
+    return [seconds for seconds, fix in fixes if controller.should_send(fix)]
+
+
+def test_stationary_sends_heartbeats_only():
+    controller = uplink_rate.UplinkRateController(heartbeat_interval=60.0)
+    assert sent_at(controller, [(s, make_fix(s)) for s in range(0, 181)]) == [0, 60, 120, 180]
+    assert (controller.sent, controller.skipped) == (4, 177)
+
+
+def test_underway_and_maneuvering_rates():
+    controller = uplink_rate.UplinkRateController(underway_interval=5.0, maneuver_interval=1.0,
+                                                  distance_threshold=1000.0)
+    steady = [(s, make_fix(s, speed=20.0)) for s in range(0, 11)]
+    assert sent_at(controller, steady) == [0, 5, 10]
+    turning = [(s, make_fix(s, speed=20.0, heading=90.0 + 15 * (s - 10))) for s in range(11, 14)]
+    assert sent_at(controller, turning) == [11, 12, 13]
+
+
+def test_distance_forces_a_send():
+    controller = uplink_rate.UplinkRateController(distance_threshold=25.0)
+    assert controller.should_send(make_fix(0))
+    assert not controller.should_send(make_fix(2, latitude=37.7749 + 0.0001))  # About 11 m
+    assert controller.should_send(make_fix(3, latitude=37.7749 + 0.0003))  # About 33 m
+    assert not controller.should_send(make_fix(3.5, latitude=37.7759))  # Inside the maneuver interval
+
+
+def test_backwards_clock_restarts():
+    controller = uplink_rate.UplinkRateController()
+    assert controller.should_send(make_fix(100))
+    assert controller.should_send(make_fix(10))
+
+
+def test_backoff_follows_latency_and_queue():
+    controller = uplink_rate.UplinkRateController(latency_target=0.5, queue_target=20, max_backoff=8.0)
+    controller.record_send(0.1, 100)
+    assert controller.backoff == 5.0
+    controller.record_send(0.1, 1000)
+    assert controller.backoff == 8.0
+    for _ in range(50):
+        controller.record_send(0.0, 0)
+    assert controller.backoff == 1.0
+    stretched = uplink_rate.UplinkRateController(heartbeat_interval=60.0)
+    stretched.backoff = 2.0
+    assert sent_at(stretched, [(s, make_fix(s)) for s in range(0, 241, 30)]) == [0, 120, 240]
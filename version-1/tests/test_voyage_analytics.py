@@ -0,0 +1,79 @@
+import json
+import math
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import geodesy
+import voyage_analytics
+
+START = datetime(2025, 6, 3, 22, 0, tzinfo=timezone.utc)
+KNOTS_10_DEG_PER_MIN = math.degrees(10 * geodesy.METERS_PER_NM / 60 / geodesy.EARTH_RADIUS_M)
+
+
+def fix(minute, latitude, speed_kn, ship_id="MV-TEST"):
+    timestamp = (START + timedelta(minutes=minute)).strftime('%Y-%m-%d %H:%M:%S.%f')
+    return {"timestamp": timestamp, "ship_id": ship_id, "primary": "top_gps",
+            "gps_data": [{"gps": "top_gps", "latitude": latitude, "longitude": 20.0,
+                          "speed": speed_kn * voyage_analytics.KMH_PER_KNOT}]}
+
+
+def voyage(ship_id="MV-TEST"):
+    """An hour moored, an hour at 10 knots due north across midnight, then an hour moored."""
+    fixes = [fix(minute, 10.0, 0.0, ship_id) for minute in range(0, 60)]
+    fixes += [fix(minute, 10.0 + (minute - 59) * KNOTS_10_DEG_PER_MIN, 10.0, ship_id) for minute in range(60, 120)]
+    arrival = 10.0 + 61 * KNOTS_10_DEG_PER_MIN
+    fixes += [fix(minute, arrival, 0.0, ship_id) for minute in range(120, 181)]
+    return fixes
+
+
+def write_jsonl(path, records):
+    path.write_text(''.join(json.dumps(record) + '\n' for record in records))
+    return str(path)
+
+
+def test_stops_and_daily_rollups():
+    track = voyage_analytics.load_tracks(voyage())["MV-TEST"]
+    stops, stopped = voyage_analytics.find_stops(track)
+    assert [(stop["fixes"], stop["end"] - stop["start"]) for stop in stops] == [(60, 3540.0), (61, 3600.0)]
+    assert stopped.sum() == 59 + 60
+    rollups = voyage_analytics.daily_rollups(track, stopped)
+    assert list(rollups) == ["2025-06-03", "2025-06-04"]
+    distance = sum(rollup["distance_nm"] for rollup in rollups.values())
+    assert distance == pytest.approx(61 / 6, rel=1e-3)  # 61 one-minute steps at 10 knots
+    assert sum(rollup["underway_s"] for rollup in rollups.values()) == 61 * 60
+    assert rollups["2025-06-03"]["stopped_s"] == 3540 and rollups["2025-06-04"]["stopped_s"] == 3600
+    assert rollups["2025-06-03"]["max_speed_kn"] == pytest.approx(10.0)
+    assert rollups["2025-06-04"]["max_speed_kn"] is None  # Moored all of the second day
+
+
+def test_short_pause_is_not_a_stop():
+    fixes = [fix(minute, 10.0 + minute * KNOTS_10_DEG_PER_MIN, 10.0) for minute in range(0, 30)]
+    fixes += [fix(minute, 10.0 + 30 * KNOTS_10_DEG_PER_MIN, 0.0) for minute in range(30, 35)]
+    fixes += [fix(minute, 10.0 + (minute - 5) * KNOTS_10_DEG_PER_MIN, 10.0) for minute in range(35, 60)]
+    track = voyage_analytics.load_tracks(fixes)["MV-TEST"]
+    stops, stopped = voyage_analytics.find_stops(track)
+    assert stops == [] and not stopped.any()
+
+
+def test_report_merges_stops_across_files_and_uses_the_cache(tmp_path, monkeypatch):
+    fixes = voyage()
+    paths = [write_jsonl(tmp_path / "a.jsonl", fixes[:150]),
+             write_jsonl(tmp_path / "b.jsonl", [{"ships": fixes[150:] + voyage("MV-OTHER")[:2]}])]
+    cache = voyage_analytics.RollupCache(str(tmp_path / "cache.json"))
+    report = voyage_analytics.voyage_report(paths, cache, workers=1)
+    assert sorted(report) == ["MV-OTHER", "MV-TEST"]
+    ship = report["MV-TEST"]
+    assert [stop["start"] for stop in ship["stops"]] == ["2025-06-03T22:00:00Z", "2025-06-04T00:00:00Z"]
+    assert ship["stops"][1]["hours"] == 1.0 and ship["totals"]["stops"] == 2
+    assert ship["totals"]["fixes"] == len(fixes)
+
+    def fail(path):
+        raise AssertionError(f"{path} should come from the cache")
+
+    monkeypatch.setattr(voyage_analytics, "summarize_source", fail)
+    cached = voyage_analytics.RollupCache(str(tmp_path / "cache.json"))
+    assert voyage_analytics.voyage_report(paths, cached, ship_id="MV-TEST", start_day="2025-06-04",
+                                          workers=1)["MV-TEST"]["days"][0]["day"] == "2025-06-04"
+    monkeypatch.setattr(voyage_analytics, "STOP_MIN_SECONDS", 600)  # Other settings invalidate the cache
+    assert voyage_analytics.RollupCache(str(tmp_path / "cache.json")).sources == {}
@@ -0,0 +1,260 @@
+import asyncio
+import json
+
+import pytest
+
+import geofence
+import spatial_index
+import ws_server
+
+
+class FakeSocket:
+    """Stands in for a websockets connection: records what is sent and replays queued messages."""
+
+    def __init__(self, messages=()):
+        self.messages = list(messages)
+        self.sent = []
+        self.closed = None
+        self.remote_address = ("192.0.2.1", 40000)
+
+    async def send(self, message):
+        self.sent.append(message)
+
+    async def close(self, code=1000, reason=""):
+        self.closed = (code, reason)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.messages:
+            raise StopAsyncIteration
+        return self.messages.pop(0)
+
+    def received(self, kind):
+        return [message for message in map(json.loads, self.sent) if message.get("type") == kind]
+
+
+@pytest.fixture
+def hub(monkeypatch):
+    """A fresh, single-worker fleet state; broadcasts are delivered straight to FakeSockets."""
+    for name, value in (("ships", {}), ("dirty_ships", set()), ("ship_index", spatial_index.PointIndex()),
+                        ("geofences", geofence.GeofenceEngine()), ("pending_fence_events", []),
+                        ("viewers", set()), ("subscriptions", {}), ("subscription_index", spatial_index.BoxIndex()),
+                        ("ship_watchers", {}), ("unfiltered_subscribers", set()), ("waiting_subscribers", set()),
+                        ("stats", {"fixes": 0, "rejected": 0, "broadcasts": 0}), ("peer_bus", None),
+                        ("worker_count", 1), ("fence_owner", True)):
+        monkeypatch.setattr(ws_server, name, value)
+
+    def broadcast(connections, message):
+        for websocket in connections:
+            websocket.sent.append(message)
+    monkeypatch.setattr(ws_server.websockets, "broadcast", broadcast)
+    return ws_server
+
+
+def fix(ship_id, lat, lon, **extra):
+    return dict({"ship_id": ship_id, "timestamp": "2025-06-03T12:00:00Z",
+                 "gps_data": [{"gps": "top_gps", "latitude": lat, "longitude": lon, "speed": 4.0}]}, **extra)
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_ingest_stores_changed_reports_only(hub):
+    state = hub.ingest_fix(fix("A", 10.0, 20.0))
+    assert (state.lat, state.lon) == (10.0, 20.0)
+    assert hub.dirty_ships == {"A"}
+    hub.dirty_ships.clear()
+    assert hub.ingest_fix(fix("A", 10.0, 20.0)) is None
+    assert hub.dirty_ships == set()
+    hub.ingest_fix(fix("A", 10.5, 20.0))
+    assert [key for _, key in hub.ship_index.near(10.5, 20.0, 100)] == ["A"]
+    assert hub.stats["fixes"] == 3
+
+
+def test_ingest_keeps_the_pis_primary_receiver(hub):
+    data = fix("A", 10.0, 20.0, primary="bottom_gps")
+    data["gps_data"].append({"gps": "bottom_gps", "latitude": 11.0, "longitude": 21.0})
+    state = hub.ingest_fix(data)
+    assert json.loads(state.encoded)["primary"] == "bottom_gps"
+    assert (state.lat, state.lon) == (11.0, 21.0)
+    assert "primary" not in json.loads(hub.ingest_fix(fix("B", 1.0, 2.0, primary="nonexistent")).encoded)
+
+
+@pytest.mark.parametrize("lat, lon", [(float("nan"), 20.0), (10.0, float("inf")), (91.0, 20.0), (10.0, -180.5),
+                                      ("10", 20.0), (True, 20.0)])
+def test_ingest_rejects_bad_positions_without_touching_state(hub, lat, lon):
+    hub.ingest_fix(fix("A", 10.0, 20.0))
+    before = hub.ships["A"].encoded
+    assert hub.ingest_fix(fix("A", lat, lon)) is None
+    assert hub.ingest_fix(fix("B", lat, lon)) is None
+    assert hub.ships["A"].encoded == before and "B" not in hub.ships
+    assert len(hub.ship_index) == 1
+    assert hub.stats["rejected"] == 2
+
+
+def test_ingest_rejects_non_finite_fields(hub):
+    data = fix("A", 10.0, 20.0)
+    data["gps_data"][0]["altitude"] = float("nan")
+    assert hub.ingest_fix(data) is None
+    assert hub.ships == {}
+
+
+def test_uplink_gets_no_ship_packets(hub):
+    hub.ingest_fix(fix("A", 10.0, 20.0))
+    uplink = FakeSocket([json.dumps({"type": "hello", "ship_id": "B", "encodings": ["compact-v1"]}),
+                         json.dumps({"type": "batch", "fixes": [fix("B", 1.0, 2.0)]})])
+    run(hub.handle_connection(uplink))
+    assert [message["type"] for message in map(json.loads, uplink.sent)] == ["welcome", "hello"]
+    assert uplink.received("hello")[0]["encoding"] == "compact-v1"
+    assert set(hub.ships) == {"A", "B"}
+    assert hub.viewers == set()
+
+
+def test_viewer_gets_the_snapshot_after_subscribing(hub):
+    hub.ingest_fix(fix("A", 10.0, 20.0))
+    viewer = FakeSocket([json.dumps({"type": "subscribe"})])
+    run(hub.handle_connection(viewer))
+    [packet] = viewer.received("shipsUpdate")
+    assert packet["full"] and [ship["ship_id"] for ship in packet["ships"]] == ["A"]
+    assert viewer.received("welcome")[0]["shipCount"] == 1
+
+
+def test_max_viewers_counts_viewers_only(hub, monkeypatch):
+    monkeypatch.setattr(hub, "MAX_VIEWERS", 1)
+    first, second = FakeSocket(), FakeSocket()
+    run(hub.subscribe(first, hub.viewer_subscriptions.parse_subscription({"type": "subscribe"})))
+    run(hub.handle_connection(FakeSocket([json.dumps(fix("B", 1.0, 2.0))])))  # An uplink is still admitted
+    assert "B" in hub.ships
+    run(hub.subscribe(second, hub.viewer_subscriptions.parse_subscription({"type": "subscribe"})))
+    assert second.closed[0] == 1013
+    assert hub.viewers == {first}
+
+
+def test_peer_updates_and_fence_following(hub, monkeypatch):
+    hub.geofences.set_fences([geofence.parse_fence({"id": "f", "type": "circle", "center": [10.0, 20.0],
+                                                    "radius_m": 1000})])
+    monkeypatch.setattr(hub, "fence_owner", False)
+    hub.apply_peer_update("A", 10.0, 20.0, '{"ship_id":"A"}')
+    assert hub.dirty_ships == {"A"} and [key for _, key in hub.ship_index.near(10.0, 20.0, 10)] == ["A"]
+    assert hub.pending_fence_events == []  # Only the owner worker evaluates fences
+    event = {"seq": 7, "event": "enter", "fence_id": "f", "fence_name": "f", "ship_id": "A",
+             "latitude": 10.0, "longitude": 20.0, "timestamp": 1000}
+    hub.apply_fence_state({"events": [event]})
+    assert hub.pending_fence_events == [event]
+    assert hub.geofences.ships_inside("f") == ["A"]
+    hub.apply_peer_update("A", None, None, '{"ship_id":"A","gps_data":[]}')
+    assert len(hub.ship_index) == 0
+
+
+def subscribe(hub, websocket, **message):
+    run(hub.subscribe(websocket, hub.viewer_subscriptions.parse_subscription(dict(message, type="subscribe"))))
+
+
+def broadcast_tick(hub):
+    """One broadcast_changes iteration without the sleep."""
+    changed = [hub.ships[ship_id] for ship_id in sorted(hub.dirty_ships)]
+    hub.dirty_ships.clear()
+    if hub.viewers:
+        hub.websockets.broadcast(hub.viewers, hub.ships_packet(changed))
+    hub.route_changes(changed)
+    hub.flush_subscribers()
+
+
+def ship_ids(websocket):
+    return [[ship["ship_id"] for ship in packet["ships"]] for packet in websocket.received("shipsUpdate")]
+
+
+def test_bbox_and_ship_id_subscriptions(hub):
+    hub.ingest_fix(fix("inside", 16.8, 96.2))
+    hub.ingest_fix(fix("outside", 1.0, 1.0))
+    hub.ingest_fix(fix("watched", -30.0, 150.0))
+    everyone, filtered = FakeSocket(), FakeSocket()
+    subscribe(hub, everyone)
+    subscribe(hub, filtered, bbox={"south": 16.7, "west": 96.1, "north": 16.9, "east": 96.3}, ship_ids=["watched"])
+    assert sorted(ship_ids(filtered)[0]) == ["inside", "watched"]
+    hub.dirty_ships.clear()
+    hub.ingest_fix(fix("outside", 1.1, 1.0))
+    hub.ingest_fix(fix("watched", -30.1, 150.0))
+    hub.ingest_fix(fix("outside", 16.85, 96.25))  # Moves into the box
+    broadcast_tick(hub)
+    assert ship_ids(everyone)[-1] == ["outside", "watched"]
+    assert sorted(ship_ids(filtered)[-1]) == ["outside", "watched"]
+
+
+def test_min_interval_holds_back_the_latest_report(hub, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(hub.time, "monotonic", lambda: clock[0])
+    viewer = FakeSocket()
+    subscribe(hub, viewer, min_interval=5)
+    assert hub.viewers == set() and viewer in hub.unfiltered_subscribers
+    hub.ingest_fix(fix("A", 10.0, 20.0))
+    broadcast_tick(hub)
+    hub.ingest_fix(fix("A", 10.1, 20.0))
+    broadcast_tick(hub)
+    assert len(ship_ids(viewer)) == 1  # Only the snapshot so far
+    clock[0] += 5
+    hub.flush_subscribers()
+    [packet] = viewer.received("shipsUpdate")[1:]
+    assert [ship["gps_data"][0]["latitude"] for ship in packet["ships"]] == [10.1]
+
+
+def test_resubscribing_and_producers_leave_the_indexes(hub):
+    viewer = FakeSocket()
+    subscribe(hub, viewer, ship_ids=["A"])
+    assert hub.ship_watchers == {"A": {viewer}}
+    subscribe(hub, viewer)  # Back to the unfiltered stream
+    assert hub.ship_watchers == {} and hub.subscriptions == {} and hub.viewers == {viewer}
+    subscribe(hub, viewer, bbox={"south": 0, "west": 0, "north": 1, "east": 1})
+    hub.mark_producer(viewer)
+    assert hub.viewers == set() and hub.subscriptions == {} and len(hub.subscription_index) == 0
+
+
+def test_bad_subscriptions_are_rejected():
+    parse = ws_server.viewer_subscriptions.parse_subscription
+    for message in ({"bbox": {"south": 10, "west": 0, "north": 5, "east": 1}}, {"bbox": [1, 2, 3, 4]},
+                    {"ship_ids": "A"}, {"min_interval": -1}, {"min_interval": "5"}):
+        with pytest.raises(ValueError):
+            parse(message)
+
+
+def query(handler, path):
+    from aiohttp.test_utils import make_mocked_request
+    response = run(handler(make_mocked_request('GET', path)))
+    return response.status, json.loads(response.text)
+
+
+def test_ships_near(hub):
+    hub.ingest_fix(fix("near", 10.0, 20.001))
+    hub.ingest_fix(fix("nearer", 10.0, 20.0001))
+    hub.ingest_fix(fix("far", 11.0, 20.0))
+    status, body = query(hub.get_ships_near, "/ships/near?lat=10&lon=20&radius=1&unit=km")
+    assert status == 200 and body["count"] == 2
+    assert [entry["ship"]["ship_id"] for entry in body["ships"]] == ["nearer", "near"]
+    assert body["ships"][0]["distance_m"] < body["ships"][1]["distance_m"]
+    status, body = query(hub.get_ships_near, "/ships/near?lat=10&lon=20&radius=100&unit=nm&limit=1")
+    assert [entry["ship"]["ship_id"] for entry in body["ships"]] == ["nearer"]
+
+
+def test_ships_bbox_across_the_antimeridian(hub):
+    hub.ingest_fix(fix("east", 0.0, 179.5))
+    hub.ingest_fix(fix("west", 0.0, -179.5))
+    hub.ingest_fix(fix("greenwich", 0.0, 0.0))
+    status, body = query(hub.get_ships_bbox, "/ships/bbox?south=-1&west=179&north=1&east=-179")
+    assert status == 200 and sorted(ship["ship_id"] for ship in body["ships"]) == ["east", "west"]
+    status, body = query(hub.get_ships_bbox, "/ships/bbox?south=-1&west=179&north=1&east=-179&limit=1")
+    assert (body["count"], body["total"]) == (1, 2)
+
+
+@pytest.mark.parametrize("path", ["/ships/near?lat=10&lon=20", "/ships/near?lat=95&lon=20&radius=1",
+                                  "/ships/near?lat=10&lon=20&radius=1&unit=furlong",
+                                  "/ships/near?lat=10&lon=20&radius=1&limit=0"])
+def test_ships_near_rejects_bad_queries(hub, path):
+    assert query(hub.get_ships_near, path)[0] == 400
+
+
+def test_ships_bbox_rejects_bad_queries(hub):
+    assert query(hub.get_ships_bbox, "/ships/bbox?south=5&west=0&north=1&east=1")[0] == 400
+    assert query(hub.get_ships_bbox, "/ships/bbox?south=0&west=0")[0] == 400
@@ -0,0 +1,282 @@
+import argparse
+import json
+import logging
+import math
+import re
+import sys
+from datetime import datetime, timezone
+
+import geodesy
+import gps_archive
+
+logger = logging.getLogger(__name__)
+
+# Streaming export of archived fixes as GeoJSON, GPX or CSV. Every stage is a
+# generator: archive lines -> fixes in the time range -> track points ->
+# optional simplification -> text pieces -> byte chunks. Nothing holds more
+# than one simplification window, so a multi-month export runs in constant
+# memory, and the first chunk (the document header) is produced before the
+# archive is read.
+#
+# Time bounds are ISO-8601 dates or times, down to any precision; a UTC offset
+# ("Z", "+02:00") is converted to UTC and a time without one is taken as UTC.
+# They are compared with the fix timestamps ("YYYY-MM-DD HH:MM:SS.ffffff", UTC)
+# at their own precision, so end=2025-06-03 covers the whole day.
+#
+# Track points are tuples
+#   (timestamp, latitude, longitude, altitude, speed, heading, satellites, receiver)
+# with speed in km/h as in the fix dicts.
+CHUNK_BYTES = 64 * 1024  # Target size of each yielded chunk
+SIMPLIFY_WINDOW = 2000  # Points per Douglas-Peucker window when simplifying
+CSV_COLUMNS = ("timestamp", "latitude", "longitude", "altitude", "speed", "heading", "satellites", "receiver")
+GPX_NAMESPACE = "http://www.topografix.com/GPX/1/1"
+
+
+def normalize_time(value):
+    """Turn an ISO-8601 time into a UTC prefix of the archive's timestamp form, or None if empty.
+
+    The prefix keeps the precision given: "2025-06-03T04:30+02:00" becomes
+    "2025-06-03 02:30". Raises ValueError for anything fromisoformat rejects.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f"Invalid time {value!r}, expected ISO-8601 such as 2025-06-03T02:00Z")
+    if parsed.tzinfo:
+        parsed = parsed.astimezone(timezone.utc)
+    timestamp = parsed.strftime('%Y-%m-%d %H:%M:%S.%f')
+    time_part = re.split('[T ]', value, maxsplit=1)[1] if len(value) > 10 else ''
+    digits = len(re.sub('[^0-9]', '', re.match(r'[0-9:.,]*', time_part).group()))
+    # Date, HH, HH:MM or HH:MM:SS, then each fraction digit given, up to microseconds.
+    precision = {0: 10, 2: 13, 4: 16}.get(digits, 19 if digits <= 6 else min(14 + digits, 26))
+    return timestamp[:precision]
+
+
+def iter_fixes(archive, start=None, end=None):
+    """Yield archived fix dicts with start <= timestamp <= end (inclusive at end's precision), oldest first."""
+    start_day = start[:10].replace('-', '') if start else None
+    end_day = end[:10].replace('-', '') if end else None
+    for day, path in archive.segments(start_day, end_day):
+        try:
+            segment = gps_archive.open_segment(path)
+        except OSError as e:
+            logger.error(f"Cannot read archive segment {path}: {e}")
+            continue
+        with segment:
+            for line in segment:
+                if not line.endswith(b'\n'):
+                    break  # The writer is mid-line
+                try:
+                    fix = json.loads(line)
+                except ValueError:
+                    continue
+                timestamp = fix.get("timestamp") or ""
+                if start and timestamp < start:
+                    continue
+                if end and timestamp[:len(end)] > end:
+                    continue
+                yield fix
+
+
+def track_points(fixes, receiver=None):
+    """Yield one track point per positioned fix, from the primary receiver or the given label ("fused" = mean)."""
+    for fix in fixes:
+        if receiver is None:
+            position = geodesy.primary_position(fix)
+            if position is None:
+                continue
+            latitude, longitude, speed, label = position
+        else:
+            position = geodesy.receiver_position(fix, receiver)
+            if position is None:
+                continue
+            latitude, longitude, speed = position
+            label = receiver
+        gps = next((gps for gps in fix.get("gps_data", []) if gps.get("gps") == label), {})
+        yield (fix.get("timestamp"), latitude, longitude, gps.get("altitude"), speed, fix.get("heading"),
+               gps.get("satellites"), label)
+
+
+def _douglas_peucker(points, tolerance_m):
+    """Return the points of one window that Douglas-Peucker keeps at tolerance_m; first and last always stay."""
+    if len(points) < 3:
+        return points
+    # Local equirectangular projection around the first point, in meters.
+    lat0 = points[0][1]
+    lon0 = points[0][2]
+    scale = math.radians(1) * geodesy.EARTH_RADIUS_M
+    cos_lat = math.cos(math.radians(lat0))
+    xy = [(((point[2] - lon0 + 540) % 360 - 180) * scale * cos_lat, (point[1] - lat0) * scale) for point in points]
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        x1, y1 = xy[first]
+        dx = xy[last][0] - x1
+        dy = xy[last][1] - y1
+        length = math.hypot(dx, dy)
+        farthest = None
+        worst = tolerance_m
+        for index in range(first + 1, last):
+            x, y = xy[index]
+            if length:
+                distance = abs(dy * (x - x1) - dx * (y - y1)) / length
+            else:
+                distance = math.hypot(x - x1, y - y1)
+            if distance > worst:
+                worst = distance
+                farthest = index
+        if farthest is not None:
+            keep[farthest] = True
+            stack.append((first, farthest))
+            stack.append((farthest, last))
+    return [point for point, kept in zip(points, keep) if kept]
+
+
+def simplify(points, tolerance_m, window=SIMPLIFY_WINDOW):
+    """Douglas-Peucker over consecutive windows of points; each window's last point starts the next."""
+    buffer = []
+    for point in points:
+        buffer.append(point)
+        if len(buffer) >= window:
+            yield from _douglas_peucker(buffer, tolerance_m)[:-1]
+            buffer = [buffer[-1]]
+    if buffer:
+        yield from _douglas_peucker(buffer, tolerance_m)
+
+
+def _number(value):
+    return '' if value is None else repr(value) if isinstance(value, float) else str(value)
+
+
+def _json_number(value):
+    return 'null' if value is None else repr(value) if isinstance(value, float) else str(value)
+
+
+def geojson_linestring(points):
+    """Yield the text of a GeoJSON LineString Feature; its properties follow the coordinates."""
+    yield '{"type":"Feature","geometry":{"type":"LineString","coordinates":['
+    first = last = None
+    count = 0
+    for point in points:
+        coordinate = f"[{_json_number(point[2])},{_json_number(point[1])}"
+        if point[3] is not None:
+            coordinate += f",{_json_number(point[3])}"
+        yield (',' if count else '') + coordinate + ']'
+        if first is None:
+            first = point[0]
+        last = point[0]
+        count += 1
+    properties = {"start": first, "end": last, "points": count}
+    yield ']},"properties":' + json.dumps(properties) + '}\n'
+
+
+def geojson_features(points):
+    """Yield the text of a GeoJSON FeatureCollection with one Point feature per track point."""
+    yield '{"type":"FeatureCollection","features":['
+    separator = ''
+    for point in points:
+        properties = dict(zip(CSV_COLUMNS, point))
+        del properties["latitude"], properties["longitude"]
+        yield (f'{separator}{{"type":"Feature","geometry":{{"type":"Point","coordinates":'
+               f'[{_json_number(point[2])},{_json_number(point[1])}]}},"properties":{json.dumps(properties)}}}')
+        separator = ',\n'
+    yield ']}\n'
+
+
+def gpx(points, name="GPS track"):
+    """Yield the text of a GPX 1.1 document with one track segment."""
+    yield (f'<?xml version="1.0" encoding="UTF-8"?>\n<gpx version="1.1" creator="track_export" '
+           f'xmlns="{GPX_NAMESPACE}">\n<trk><name>{name}</name><trkseg>\n')
+    for point in points:
+        timestamp, latitude, longitude, altitude, _, _, satellites, _ = point
+        parts = [f'<trkpt lat="{latitude}" lon="{longitude}">']
+        if altitude is not None:
+            parts.append(f'<ele>{altitude}</ele>')
+        if timestamp:
+            parts.append(f'<time>{timestamp.replace(" ", "T")}Z</time>')
+        if satellites is not None:
+            parts.append(f'<sat>{satellites}</sat>')
+        parts.append('</trkpt>\n')
+        yield ''.join(parts)
+    yield '</trkseg></trk>\n</gpx>\n'
+
+
+def csv_rows(points):
+    """Yield CSV text with a header row; unknown values are empty."""
+    yield ','.join(CSV_COLUMNS) + '\n'
+    for point in points:
+        yield ','.join(_number(value) for value in point) + '\n'
+
+
+# format -> (writer, Content-Type, file extension)
+EXPORT_FORMATS = {
+    "geojson": (geojson_linestring, "application/geo+json", "geojson"),
+    "features": (geojson_features, "application/geo+json", "geojson"),
+    "gpx": (gpx, "application/gpx+xml", "gpx"),
+    "csv": (csv_rows, "text/csv", "csv"),
+}
+
+
+def chunked(pieces, size=CHUNK_BYTES):
+    """Join text pieces into UTF-8 chunks of about size bytes; the first piece goes out on its own."""
+    buffer = []
+    buffered = 0
+    first = True
+    for piece in pieces:
+        buffer.append(piece)
+        buffered += len(piece)
+        if first or buffered >= size:
+            yield ''.join(buffer).encode('utf-8')
+            buffer = []
+            buffered = 0
+            first = False
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
+
+
+def export(archive, fmt, start=None, end=None, receiver=None, tolerance_m=None):
+    """Yield the export of archived fixes between start and end as byte chunks; raises ValueError on bad arguments."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}, expected one of {', '.join(EXPORT_FORMATS)}")
+    start = normalize_time(start)
+    end = normalize_time(end)
+    if tolerance_m is not None and tolerance_m < 0:
+        raise ValueError("Simplification tolerance must not be negative")
+    points = track_points(iter_fixes(archive, start, end), receiver)
+    if tolerance_m:
+        points = simplify(points, tolerance_m)
+    writer = EXPORT_FORMATS[fmt][0]
+    return chunked(writer(points))
+
+
+def main(args):
+    archive = gps_archive.FixArchive(args.archive)
+    try:
+        chunks = export(archive, args.format, args.start, args.end, args.receiver, args.simplify)
+    except ValueError as e:
+        sys.exit(str(e))
+    output = open(args.output, 'wb') if args.output and args.output != '-' else sys.stdout.buffer
+    try:
+        for chunk in chunks:
+            output.write(chunk)
+    finally:
+        if output is not sys.stdout.buffer:
+            output.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export archived GPS fixes as GeoJSON, GPX or CSV")
+    parser.add_argument('--archive', default='/home/mdt/gps_archive', help="archive directory (default %(default)s)")
+    parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='geojson',
+                        help="geojson = one LineString, features = one Point per fix (default %(default)s)")
+    parser.add_argument('--start', help="first time, e.g. 2025-06-03 or 2025-06-03T02:00Z")
+    parser.add_argument('--end', help="last time, inclusive at its precision")
+    parser.add_argument('--receiver', help="receiver label or 'fused' (default: each fix's primary receiver)")
+    parser.add_argument('--simplify', type=float, metavar='METERS', help="Douglas-Peucker tolerance")
+    parser.add_argument('-o', '--output', help="output file (default stdout)")
+    main(parser.parse_args())
@@ -0,0 +1,321 @@
+import json
+import sys
+from datetime import datetime, timezone
+
+# Compact binary uplink encoding.
+#
+# A WebSocket message is a sequence of frames. Each frame starts with a type
+# byte:
+#   STATIC  varint length + UTF-8 JSON with ship_id, device_id, receiver
+#           labels and the primary receiver; sent once per session and again
+#           only when they change.
+#   KEY     a full fix, all fields written absolutely.
+#   DELTA   a fix where every field is either unchanged, a zigzag varint delta
+#           against the previous fix, or written absolutely.
+# Fields are fixed-point integers: lat/lon in 1e-7 degrees, altitude in mm,
+# speed in 0.01 km/h, heading in 0.1 degrees and time in microseconds.
+# Satellite PRN lists travel as bitsets, so PRN order is not preserved.
+
+ENCODING_JSON = 'json'
+ENCODING_COMPACT = 'compact-v1'
+SUPPORTED_ENCODINGS = (ENCODING_COMPACT, ENCODING_JSON)
+
+FRAME_STATIC = 0x01
+FRAME_KEY = 0x02
+FRAME_DELTA = 0x03
+
+KEYFRAME_INTERVAL = 60  # Fixes between keyframes, bounds damage from a lost frame
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+# Field modes, two bits per field in the masks.
+UNCHANGED = 0
+DELTA = 1
+ABSOLUTE = 2
+
+RECEIVER_FIELDS = (
+    ('latitude', 10 ** 7),
+    ('longitude', 10 ** 7),
+    ('altitude', 1000),
+    ('speed', 100),
+    ('satellites', 1),
+)
+HEADING_SCALE = 10
+
+
+def write_varint(buf, value):
+    """Append an unsigned LEB128 varint."""
+    while value > 0x7F:
+        buf.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buf.append(value)
+
+
+def read_varint(data, pos):
+    """Read an unsigned LEB128 varint, returning (value, new position)."""
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def zigzag(value):
+    return value << 1 if value >= 0 else (-value << 1) - 1
+
+
+def unzigzag(value):
+    return (value >> 1) ^ -(value & 1)
+
+
+def write_nullable(buf, value):
+    """Append an optional signed integer; None is encoded as 0."""
+    write_varint(buf, 0 if value is None else zigzag(value) + 1)
+
+
+def read_nullable(data, pos):
+    value, pos = read_varint(data, pos)
+    return (None if value == 0 else unzigzag(value - 1)), pos
+
+
+def quantize(value, scale):
+    if not isinstance(value, (int, float)) or isinstance(value, bool):
+        return None
+    return int(round(value * scale))
+
+
+def prns_to_bitset(prns):
+    """Pack PRN strings into a little-endian bitset, dropping non-numeric entries."""
+    bits = 0
+    for prn in prns or ():
+        try:
+            number = int(prn)
+        except (TypeError, ValueError):
+            continue
+        if number >= 0:
+            bits |= 1 << number
+    return bits
+
+
+def bitset_to_prns(bits):
+    prns = []
+    while bits:
+        lowest = bits & -bits
+        prns.append(str(lowest.bit_length() - 1))
+        bits ^= lowest
+    return prns
+
+
+def parse_timestamp(timestamp):
+    """Convert the fix timestamp string to integer microseconds since the epoch."""
+    if not timestamp:
+        return None
+    try:
+        parsed = datetime.strptime(timestamp, TIMESTAMP_FORMAT).replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+    return int(parsed.timestamp()) * 1_000_000 + parsed.microsecond
+
+
+def format_timestamp(micros):
+    if micros is None:
+        return ""
+    seconds, micro = divmod(micros, 1_000_000)
+    return datetime.fromtimestamp(seconds, timezone.utc).replace(microsecond=micro).strftime(TIMESTAMP_FORMAT)
+
+
+def choose_encoding(offered):
+    """Pick the first encoding from a client's hello that this side supports."""
+    for encoding in offered or ():
+        if encoding in SUPPORTED_ENCODINGS:
+            return encoding
+    return ENCODING_JSON
+
+
+def _static_fields(data):
+    return {
+        "ship_id": data.get("ship_id"),
+        "device_id": data.get("device_id"),
+        "receivers": [gps.get("gps") for gps in data.get("gps_data", [])],
+        "primary": data.get("primary"),
+    }
+
+
+def _quantized(data):
+    """Flatten a fix dict into a tuple of integers (or None) in wire order."""
+    values = [parse_timestamp(data.get("timestamp")), quantize(data.get("heading"), HEADING_SCALE)]
+    for gps in data.get("gps_data", []):
+        for name, scale in RECEIVER_FIELDS:
+            values.append(quantize(gps.get(name), scale))
+        values.append(prns_to_bitset(gps.get("satellite_prns")))
+    return tuple(values)
+
+
+def _write_values(buf, values, previous):
+    """Write a mask plus each field as unchanged, delta or absolute."""
+    mask = 0
+    body = bytearray()
+    for index, value in enumerate(values):
+        is_bitset = index >= 2 and (index - 2) % 6 == 5
+        old = previous[index] if previous is not None else None
+        if previous is not None and value == old:
+            mode = UNCHANGED
+        elif previous is not None and value is not None and old is not None and not is_bitset:
+            mode = DELTA
+            write_varint(body, zigzag(value - old))
+        else:
+            mode = ABSOLUTE
+            if is_bitset:
+                raw = value.to_bytes((value.bit_length() + 7) // 8, 'little')
+                write_varint(body, len(raw))
+                body.extend(raw)
+            else:
+                write_nullable(body, value)
+        mask |= mode << (2 * index)
+    mask_bytes = (2 * len(values) + 7) // 8
+    buf.extend(mask.to_bytes(mask_bytes, 'little'))
+    buf.extend(body)
+
+
+class CompactEncoder:
+    """Encode successive fix dicts for one uplink session."""
+
+    def __init__(self, keyframe_interval=KEYFRAME_INTERVAL):
+        self.keyframe_interval = keyframe_interval
+        self.static = None
+        self.previous = None
+        self.since_key = 0
+
+    def encode(self, data):
+        """Return the frames for one fix as bytes, including STATIC when needed."""
+        buf = bytearray()
+        static = _static_fields(data)
+        if static != self.static:
+            payload = json.dumps(static, separators=(',', ':')).encode('utf-8')
+            buf.append(FRAME_STATIC)
+            write_varint(buf, len(payload))
+            buf.extend(payload)
+            self.static = static
+            self.previous = None
+        values = _quantized(data)
+        if self.previous is None or self.since_key >= self.keyframe_interval:
+            buf.append(FRAME_KEY)
+            _write_values(buf, values, None)
+            self.since_key = 0
+        else:
+            buf.append(FRAME_DELTA)
+            _write_values(buf, values, self.previous)
+            self.since_key += 1
+        self.previous = values
+        return bytes(buf)
+
+
+class CompactDecoder:
+    """Shore-side decoder turning compact uplink messages back into fix dicts."""
+
+    def __init__(self):
+        self.static = None
+        self.previous = None
+
+    def decode(self, message):
+        """Decode one WebSocket message into a list of fix dicts."""
+        fixes = []
+        pos = 0
+        while pos < len(message):
+            frame_type = message[pos]
+            pos += 1
+            if frame_type == FRAME_STATIC:
+                length, pos = read_varint(message, pos)
+                self.static = json.loads(message[pos:pos + length].decode('utf-8'))
+                self.previous = None
+                pos += length
+            elif frame_type in (FRAME_KEY, FRAME_DELTA):
+                if self.static is None:
+                    raise ValueError("Fix frame received before static fields")
+                if frame_type == FRAME_DELTA and self.previous is None:
+                    raise ValueError("Delta frame received without a keyframe")
+                previous = self.previous if frame_type == FRAME_DELTA else None
+                values, pos = self._read_values(message, pos, previous)
+                self.previous = values
+                fixes.append(self._to_dict(values))
+            else:
+                raise ValueError(f"Unknown frame type {frame_type:#x}")
+        return fixes
+
+    def _read_values(self, data, pos, previous):
+        count = 2 + 6 * len(self.static["receivers"])
+        mask_bytes = (2 * count + 7) // 8
+        mask = int.from_bytes(data[pos:pos + mask_bytes], 'little')
+        pos += mask_bytes
+        values = []
+        for index in range(count):
+            is_bitset = index >= 2 and (index - 2) % 6 == 5
+            mode = (mask >> (2 * index)) & 3
+            if mode == UNCHANGED:
+                if previous is None:
+                    raise ValueError("Unchanged field in keyframe")
+                values.append(previous[index])
+            elif mode == DELTA:
+                delta, pos = read_varint(data, pos)
+                values.append(previous[index] + unzigzag(delta))
+            elif is_bitset:
+                length, pos = read_varint(data, pos)
+                values.append(int.from_bytes(data[pos:pos + length], 'little'))
+                pos += length
+            else:
+                value, pos = read_nullable(data, pos)
+                values.append(value)
+        return tuple(values), pos
+
+    def _to_dict(self, values):
+        heading = values[1]
+        data = {
+            "timestamp": format_timestamp(values[0]),
+            "ship_id": self.static["ship_id"],
+            "device_id": self.static["device_id"],
+            "heading": heading / HEADING_SCALE if heading is not None else None,
+            "gps_data": [],
+        }
+        for index, label in enumerate(self.static["receivers"]):
+            offset = 2 + 6 * index
+            gps = {"gps": label}
+            for field_index, (name, scale) in enumerate(RECEIVER_FIELDS):
+                value = values[offset + field_index]
+                gps[name] = value if value is None or scale == 1 else value / scale
+            gps["satellite_prns"] = bitset_to_prns(values[offset + 5])
+            data["gps_data"].append(gps)
+        if self.static.get("primary") is not None:
+            data["primary"] = self.static["primary"]
+        return data
+
+
+def compare_sizes(path):
+    """Print JSON vs compact uplink bytes for a newline-separated JSON fix log."""
+    encoder = CompactEncoder()
+    json_bytes = compact_bytes = fixes = 0
+    with open(path, 'r') as f:
+        for line in f:
+            try:
+                data = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            fixes += 1
+            json_bytes += len(json.dumps(data).encode('utf-8'))
+            compact_bytes += len(encoder.encode(data))
+    if not fixes:
+        print(f"No fixes in {path}")
+        return
+    print(f"Fixes: {fixes}")
+    print(f"JSON: {json_bytes} bytes ({json_bytes / fixes:.0f} per fix)")
+    print(f"Compact: {compact_bytes} bytes ({compact_bytes / fixes:.1f} per fix)")
+    print(f"Reduction: {json_bytes / max(compact_bytes, 1):.1f}x")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print(f"Usage: {sys.argv[0]} <gps_offline_data.json>")
+        sys.exit(1)
+    compare_sizes(sys.argv[1])
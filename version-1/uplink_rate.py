@@ -0,0 +1,103 @@
+import logging
+
+import geodesy
+import uplink_codec
+
+logger = logging.getLogger(__name__)
+
+# Defaults for the uplink rate controller
+MANEUVER_INTERVAL = 1.0  # Seconds between fixes while turning or moving off station
+UNDERWAY_INTERVAL = 5.0  # Seconds between fixes while steaming on a steady course
+HEARTBEAT_INTERVAL = 60.0  # Seconds between fixes while stationary
+MOVING_SPEED = 2.0  # km/h above which the vessel counts as underway
+HEADING_CHANGE = 10.0  # Degrees of heading change that counts as a maneuver
+DISTANCE_THRESHOLD = 25.0  # Meters moved since the last sent fix that forces a send
+LATENCY_TARGET = 0.5  # Seconds per send above which the controller backs off
+QUEUE_TARGET = 20  # Queued fixes above which the controller backs off
+MAX_BACKOFF = 8.0  # Largest multiplier applied to all intervals
+LATENCY_SMOOTHING = 0.2  # EWMA weight of the newest send latency
+# Settings a config reload may change: read when a controller is created (one per
+# uplink connection) or on every send.
+HOT_SETTINGS = ('MANEUVER_INTERVAL', 'UNDERWAY_INTERVAL', 'HEARTBEAT_INTERVAL', 'MOVING_SPEED',
+                'HEADING_CHANGE', 'DISTANCE_THRESHOLD', 'LATENCY_TARGET', 'QUEUE_TARGET',
+                'MAX_BACKOFF', 'LATENCY_SMOOTHING')
+
+
+class UplinkRateController:
+    """Decide which fixes to forward upstream based on vessel motion and link health.
+
+    Intervals are measured on the fix timestamps, so the same decisions are made
+    for live fixes and for fixes replayed from the offline log.
+    """
+
+    def __init__(self, maneuver_interval=None, underway_interval=None, heartbeat_interval=None,
+                 moving_speed=None, heading_change=None, distance_threshold=None,
+                 latency_target=None, queue_target=None, max_backoff=None):
+        # Unset arguments take the module settings as they are now, so a (re)loaded config
+        # applies to every controller created afterwards.
+        self.maneuver_interval = MANEUVER_INTERVAL if maneuver_interval is None else maneuver_interval
+        self.underway_interval = UNDERWAY_INTERVAL if underway_interval is None else underway_interval
+        self.heartbeat_interval = HEARTBEAT_INTERVAL if heartbeat_interval is None else heartbeat_interval
+        self.moving_speed = MOVING_SPEED if moving_speed is None else moving_speed
+        self.heading_change = HEADING_CHANGE if heading_change is None else heading_change
+        self.distance_threshold = DISTANCE_THRESHOLD if distance_threshold is None else distance_threshold
+        self.latency_target = LATENCY_TARGET if latency_target is None else latency_target
+        self.queue_target = QUEUE_TARGET if queue_target is None else queue_target
+        self.max_backoff = MAX_BACKOFF if max_backoff is None else max_backoff
+        self.backoff = 1.0
+        self.latency = 0.0
+        self.sent = 0
+        self.skipped = 0
+        self._last_time = None
+        self._last_position = None
+        self._last_heading = None
+
+    def should_send(self, gps_data):
+        """Return True if this fix should go upstream, updating the last-sent state if so."""
+        micros = uplink_codec.parse_timestamp(gps_data.get("timestamp"))
+        fix_time = micros / 1_000_000 if micros is not None else None
+        position = geodesy.primary_position(gps_data)
+        heading = gps_data.get("heading")
+        if self._decide(fix_time, position, heading):
+            self._last_time = fix_time
+            if position:
+                self._last_position = position[:2]
+            if heading is not None:
+                self._last_heading = heading
+            self.sent += 1
+            return True
+        self.skipped += 1
+        return False
+
+    def _decide(self, fix_time, position, heading):
+        if self._last_time is None or fix_time is None:
+            return True
+        elapsed = fix_time - self._last_time
+        if elapsed < 0:
+            # Clock went backwards (receiver reset or replayed data); start over.
+            return True
+        if elapsed >= self.heartbeat_interval * self.backoff:
+            return True
+        if elapsed < self.maneuver_interval * self.backoff:
+            return False
+        if heading is not None and self._last_heading is not None:
+            if geodesy.heading_delta(heading, self._last_heading) >= self.heading_change:
+                return True
+        if position and self._last_position:
+            moved = geodesy.haversine_m(self._last_position[0], self._last_position[1], position[0], position[1])
+            if moved >= self.distance_threshold:
+                return True
+        speed = position[2] if position else None
+        if isinstance(speed, (int, float)) and speed >= self.moving_speed:
+            return elapsed >= self.underway_interval * self.backoff
+        return False
+
+    def record_send(self, latency, queue_depth):
+        """Feed back how long a send took and how many fixes are waiting."""
+        self.latency += LATENCY_SMOOTHING * (latency - self.latency)
+        pressure = max(self.latency / self.latency_target, queue_depth / self.queue_target)
+        backoff = min(max(pressure, 1.0), self.max_backoff)
+        if backoff != self.backoff and (backoff == 1.0 or abs(backoff - self.backoff) >= 0.5):
+            logger.info(f"Uplink backoff {self.backoff:.1f}x -> {backoff:.1f}x "
+                        f"(latency {self.latency:.3f} s, queue {queue_depth})")
+            self.backoff = backoff
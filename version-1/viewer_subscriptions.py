@@ -0,0 +1,66 @@
+import spatial_index
+
+# Viewers narrow what they receive with a subscribe message:
+#   {"type": "subscribe",
+#    "bbox": {"south": 16.7, "west": 96.1, "north": 16.9, "east": 96.3},
+#    "ship_ids": ["SHIP123"],
+#    "min_interval": 5}
+# A ship is delivered if it lies in the bbox or is listed in ship_ids; with
+# neither given every ship is delivered. min_interval (seconds) limits how
+# often the viewer is sent updates; only the latest report per ship is kept in
+# between. {"type": "subscribe"} alone restores the unfiltered stream.
+SUBSCRIBE_TYPE = "subscribe"
+MAX_SHIP_IDS = 1000
+MAX_MIN_INTERVAL = 3600
+
+
+class Subscription:
+    """One viewer's filter and rate limit."""
+    __slots__ = ('bbox', 'ship_ids', 'min_interval', 'next_send', 'pending')
+
+    def __init__(self, bbox=None, ship_ids=None, min_interval=0.0):
+        self.bbox = bbox  # (south, west, north, east) or None
+        self.ship_ids = ship_ids or frozenset()
+        self.min_interval = min_interval
+        self.next_send = 0.0
+        self.pending = {}  # ship_id -> latest report held back by min_interval
+
+    @property
+    def filtered(self):
+        return self.bbox is not None or bool(self.ship_ids)
+
+    def matches(self, ship_id, lat, lon):
+        if not self.filtered or ship_id in self.ship_ids:
+            return True
+        return self.bbox is not None and lat is not None and spatial_index.bbox_contains(self.bbox, lat, lon)
+
+    def due(self, now):
+        return now >= self.next_send
+
+    def mark_sent(self, now):
+        self.next_send = now + self.min_interval
+
+
+def parse_bbox(value):
+    """Validate a {"south", "west", "north", "east"} dict and return it as a tuple."""
+    if not isinstance(value, dict):
+        raise ValueError("bbox must be an object with south, west, north and east")
+    try:
+        south, west, north, east = (float(value[key]) for key in ("south", "west", "north", "east"))
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("bbox needs numeric south, west, north and east")
+    if not (-90 <= south <= north <= 90) or not (-180 <= west <= 180 and -180 <= east <= 180):
+        raise ValueError(f"bbox out of range: {value}")
+    return (south, west, north, east)
+
+
+def parse_subscription(message):
+    """Build a Subscription from a subscribe message, raising ValueError if it is malformed."""
+    bbox = parse_bbox(message["bbox"]) if message.get("bbox") is not None else None
+    ship_ids = message.get("ship_ids") or []
+    if not isinstance(ship_ids, list) or len(ship_ids) > MAX_SHIP_IDS:
+        raise ValueError(f"ship_ids must be a list of at most {MAX_SHIP_IDS} ids")
+    min_interval = message.get("min_interval") or 0
+    if not isinstance(min_interval, (int, float)) or not 0 <= min_interval <= MAX_MIN_INTERVAL:
+        raise ValueError(f"min_interval must be between 0 and {MAX_MIN_INTERVAL} seconds")
+    return Subscription(bbox, frozenset(str(ship_id) for ship_id in ship_ids), float(min_interval))
@@ -0,0 +1,480 @@
+import argparse
+import gzip
+import json
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+
+import geodesy
+import gps_archive
+
+logger = logging.getLogger(__name__)
+
+# Voyage statistics per ship: distance sailed, time underway and stopped,
+# speeds and port stops, per UTC day. Sources are archive segments, the fleet
+# server's ships_log.jsonl and offline JSON dumps (one fix, or one
+# {"ships": [...]} line, per line; .gz files are read transparently).
+#
+# Each source file is parsed once into NumPy arrays per ship (time, position
+# and speed from the primary receiver) and reduced in vectorized form to daily
+# rollups and a stop list. Those are small, so they are cached by file size and
+# mtime: a repeated query only re-reads files that changed, typically today's
+# archive segment. Archive segments are cached per day by mtime alone, so a
+# segment gzipped by retention (which keeps the mtime) is not parsed again;
+# thinning rewrites it with a new mtime. Uncached files are parsed in parallel
+# worker processes.
+#
+# Classification works on steps between consecutive fixes. A step is stopped
+# when both ends lie in a stop (a run of fixes slower than STOP_SPEED_KN, with
+# nearby runs merged); stopped steps count as moored time even across gaps in
+# coverage, so a ship in port with its receivers off is still moored. Other
+# steps count as underway when they are shorter than MAX_STEP_SECONDS and as
+# no coverage otherwise. Distance excludes stopped steps, so position noise at
+# the quay does not add up to miles sailed.
+#
+# Stops are found per source file. A stationary run touching either end of a
+# file is kept whatever its length, and the stop lists of all files are merged
+# again when a report is built, so a stop across midnight in the archive is
+# reported once; its short part on one side may count a few minutes of moored
+# time that is later dropped from the stop list.
+STOP_SPEED_KN = 0.5  # Fixes slower than this are stationary
+STOP_MIN_SECONDS = 900  # Shortest stationary period reported as a stop
+STOP_MERGE_SECONDS = 300  # Stationary runs this close in time...
+STOP_MERGE_M = 500.0  # ...and with centres this close are one stop
+MAX_STEP_SECONDS = 300  # Longer gaps between fixes are no coverage unless the ship is stopped across them
+MAX_SPEED_KN = 60.0  # Faster steps are position jumps and are left out of speed statistics
+SPEED_BINS_KN = (0.0, 0.5, 2.0, 5.0, 8.0, 10.0, 12.0, 15.0, 20.0, 30.0)  # Lower edges of the histogram bins
+KMH_PER_KNOT = geodesy.METERS_PER_NM / 1000
+SECONDS_PER_DAY = 86400
+CACHE_VERSION = 2
+ROLLUP_SUMS = ("fixes", "distance_nm", "underway_s", "stopped_s")
+
+
+def _cache_params():
+    """Settings the cached rollups depend on; a cache made with other values is discarded."""
+    return [CACHE_VERSION, STOP_SPEED_KN, STOP_MIN_SECONDS, STOP_MERGE_SECONDS, STOP_MERGE_M, MAX_STEP_SECONDS,
+            MAX_SPEED_KN, list(SPEED_BINS_KN)]
+
+
+class Track:
+    """Fixes of one ship as parallel arrays, sorted by time; speed in knots, NaN where unknown."""
+    __slots__ = ('ship_id', 'time', 'latitude', 'longitude', 'speed')
+
+    def __init__(self, ship_id, time, latitude, longitude, speed):
+        self.ship_id = ship_id
+        self.time = time  # Seconds since the epoch (UTC)
+        self.latitude = latitude
+        self.longitude = longitude
+        self.speed = speed
+
+    def __len__(self):
+        return len(self.time)
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Great-circle distances in meters between arrays of lat/lon points in degrees."""
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    a = (np.sin((phi2 - phi1) / 2) ** 2
+         + np.cos(phi1) * np.cos(phi2) * np.sin(np.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * geodesy.EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def step_distances_m(latitude, longitude):
+    """Haversine distances in meters between consecutive points, computing each cosine once."""
+    phi = np.radians(latitude)
+    cos_phi = np.cos(phi)
+    a = np.sin(np.diff(phi) / 2) ** 2
+    a += cos_phi[:-1] * cos_phi[1:] * np.sin(np.radians(np.diff(longitude)) / 2) ** 2
+    np.minimum(a, 1.0, out=a)
+    return 2 * geodesy.EARTH_RADIUS_M * np.arcsin(np.sqrt(a, out=a), out=a)
+
+
+def read_fixes(path):
+    """Yield the fix dicts in a JSON-lines file, unwrapping ships_log {"ships": [...]} lines."""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(record, dict):
+                continue
+            ships = record.get("ships")
+            if isinstance(ships, list):
+                yield from (fix for fix in ships if isinstance(fix, dict))
+            else:
+                yield record
+
+
+def _epoch_seconds(timestamps):
+    """Convert fix timestamp strings to epoch seconds; unparseable ones become NaN."""
+    try:
+        return np.array(timestamps, dtype='datetime64[us]').astype(np.int64) / 1e6
+    except ValueError:
+        seconds = np.full(len(timestamps), np.nan)
+        for index, timestamp in enumerate(timestamps):
+            try:
+                seconds[index] = np.datetime64(timestamp, 'us').astype(np.int64) / 1e6
+            except ValueError:
+                pass
+        return seconds
+
+
+def load_tracks(fixes, ship_id=None, start=None, end=None):
+    """Build a Track per ship from fix dicts, optionally for one ship and start <= time < end (epoch seconds)."""
+    columns = {}  # ship_id -> (timestamps, latitudes, longitudes, speeds)
+    for fix in fixes:
+        ship = fix.get("ship_id")
+        if ship_id is not None and ship != ship_id:
+            continue
+        timestamp = fix.get("timestamp")
+        position = geodesy.primary_position(fix)
+        if not isinstance(timestamp, str) or position is None:
+            continue
+        lists = columns.get(ship)
+        if lists is None:
+            lists = columns[ship] = ([], [], [], [])
+        lists[0].append(timestamp[:-1] if timestamp.endswith('Z') else timestamp)
+        lists[1].append(position[0])
+        lists[2].append(position[1])
+        speed = position[2]
+        lists[3].append(speed / KMH_PER_KNOT if isinstance(speed, (int, float)) else np.nan)
+    tracks = {}
+    for ship, (timestamps, latitudes, longitudes, speeds) in columns.items():
+        time = _epoch_seconds(timestamps)
+        keep = np.isfinite(time)
+        if start is not None:
+            keep &= time >= start
+        if end is not None:
+            keep &= time < end
+        order = np.argsort(time[keep], kind='stable')
+        tracks[ship] = Track(ship, time[keep][order], np.asarray(latitudes)[keep][order],
+                             np.asarray(longitudes)[keep][order], np.asarray(speeds, dtype=float)[keep][order])
+    return tracks
+
+
+def step_speeds(track, dt, distance):
+    """Speed in knots of each step: the reported speed at its start, else derived from the positions."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        derived = np.where(dt > 0, distance / dt * 3600 / geodesy.METERS_PER_NM, np.nan)
+    speed = np.where(np.isfinite(track.speed[:-1]), track.speed[:-1], derived)
+    speed[speed > MAX_SPEED_KN] = np.nan
+    return speed
+
+
+def find_stops(track):
+    """Return (stops, stopped) for a track: stop dicts, oldest first, and a bool per step.
+
+    Stationary runs are merged when close in time and space; a merged run is a
+    stop if it lasts STOP_MIN_SECONDS or touches either end of the track.
+    """
+    n = len(track)
+    stopped = np.zeros(max(n - 1, 0), dtype=bool)
+    if n == 0:
+        return [], stopped
+    stationary = (track.speed < STOP_SPEED_KN).astype(np.int8)
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], stationary, [0]))))
+    if not len(edges):
+        return [], stopped
+    first = edges[0::2]
+    last = edges[1::2] - 1
+    counts = last - first + 1
+    lat_sums = np.concatenate(([0.0], np.cumsum(track.latitude)))
+    lon_sums = np.concatenate(([0.0], np.cumsum(track.longitude)))
+    latitude = (lat_sums[last + 1] - lat_sums[first]) / counts
+    longitude = (lon_sums[last + 1] - lon_sums[first]) / counts
+    # Merge each run into the previous one when the gap and the distance between them are small.
+    merge = np.zeros(len(first), dtype=bool)
+    if len(first) > 1:
+        gap = track.time[first[1:]] - track.time[last[:-1]]
+        apart = haversine_m(latitude[:-1], longitude[:-1], latitude[1:], longitude[1:])
+        merge[1:] = (gap <= STOP_MERGE_SECONDS) & (apart <= STOP_MERGE_M)
+    group = np.cumsum(~merge) - 1
+    groups = group[-1] + 1
+    heads = np.flatnonzero(~merge)
+    group_first = first[heads]
+    group_last = last[np.append(heads[1:] - 1, len(last) - 1)]
+    weight = np.bincount(group, weights=counts, minlength=groups)
+    group_lat = np.bincount(group, weights=latitude * counts, minlength=groups) / weight
+    group_lon = np.bincount(group, weights=longitude * counts, minlength=groups) / weight
+    duration = track.time[group_last] - track.time[group_first]
+    keep = (duration >= STOP_MIN_SECONDS) | (group_first == 0) | (group_last == n - 1)
+    marks = np.zeros(n, dtype=np.int64)
+    np.add.at(marks, group_first[keep], 1)
+    np.add.at(marks, group_last[keep], -1)
+    stopped[:] = np.cumsum(marks)[:-1] > 0
+    stops = [{"start": float(track.time[a]), "end": float(track.time[b]), "latitude": round(float(lat), 6),
+              "longitude": round(float(lon), 6), "fixes": int(b - a + 1)}
+             for a, b, lat, lon in zip(group_first[keep], group_last[keep], group_lat[keep], group_lon[keep])]
+    return stops, stopped
+
+
+def daily_rollups(track, stopped):
+    """Per-UTC-day sums for a track: {"YYYY-MM-DD": rollup}; speeds in knots, times in seconds."""
+    if len(track) == 0:
+        return {}
+    point_day = (track.time // SECONDS_PER_DAY).astype(np.int64)
+    # The track is sorted, so each day is one contiguous slice of it.
+    new_day = np.diff(point_day) != 0
+    starts = np.concatenate(([0], np.flatnonzero(new_day) + 1))
+    days = point_day[starts]
+    fixes = np.diff(np.append(starts, len(track)))
+    bins = len(SPEED_BINS_KN)
+    distance_m = np.zeros(len(days))
+    underway = np.zeros(len(days))
+    moored = np.zeros(len(days))
+    max_speed = np.full(len(days), np.nan)
+    histogram = np.zeros((len(days), bins))
+    if len(track) > 1:
+        dt = np.diff(track.time)
+        distance = step_distances_m(track.latitude, track.longitude)
+        speed = step_speeds(track, dt, distance)
+        covered = stopped | (dt <= MAX_STEP_SECONDS)
+        day = np.cumsum(np.concatenate(([0], new_day[:-1])))  # Day index of each step's first fix
+        distance_m = np.bincount(day, weights=np.where(stopped, 0.0, distance), minlength=len(days))
+        underway = np.bincount(day, weights=np.where(covered & ~stopped, dt, 0.0), minlength=len(days))
+        moored = np.bincount(day, weights=np.where(stopped, dt, 0.0), minlength=len(days))
+        # Like the underway time: no stopped steps (GPS jitter at the quay) and no gaps.
+        max_speed = np.fmax.reduceat(np.append(np.where(covered & ~stopped, speed, np.nan), np.nan), starts)
+        counted = covered & np.isfinite(speed)
+        speed_bin = np.clip(np.digitize(speed[counted], SPEED_BINS_KN) - 1, 0, bins - 1)
+        histogram = np.bincount(day[counted] * bins + speed_bin, weights=dt[counted],
+                                minlength=len(days) * bins).reshape(len(days), bins)
+    rollups = {}
+    for index, day in enumerate(days):
+        key = datetime.fromtimestamp(int(day) * SECONDS_PER_DAY, timezone.utc).strftime('%Y-%m-%d')
+        rollups[key] = {
+            "fixes": int(fixes[index]),
+            "distance_nm": float(distance_m[index]) / geodesy.METERS_PER_NM,
+            "underway_s": float(underway[index]),
+            "stopped_s": float(moored[index]),
+            "max_speed_kn": None if np.isnan(max_speed[index]) else float(max_speed[index]),
+            "speed_seconds": [float(seconds) for seconds in histogram[index]]
+        }
+    return rollups
+
+
+def summarize_source(path):
+    """Daily rollups and stops per ship for one source file: {ship_id: {"days": ..., "stops": ...}}."""
+    summary = {}
+    for ship, track in load_tracks(read_fixes(path)).items():
+        stops, stopped = find_stops(track)
+        summary[ship] = {"days": daily_rollups(track, stopped), "stops": stops}
+    return summary
+
+
+def cache_key(path, stat):
+    """(key, signature) of a source file in the RollupCache."""
+    parsed = gps_archive.parse_segment_name(os.path.basename(path))
+    if parsed is not None:
+        return os.path.join(os.path.dirname(path), parsed[0]), [stat.st_mtime_ns]
+    return path, [stat.st_size, stat.st_mtime_ns]
+
+
+class RollupCache:
+    """summarize_source() results per source (see cache_key()), kept in a JSON file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.sources = {}
+        self.dirty = False
+        try:
+            with open(path, 'r') as f:
+                cache = json.load(f)
+            if cache.get("params") == _cache_params():
+                self.sources = cache["sources"]
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error(f"Ignoring unreadable analytics cache {path}: {e}")
+
+    def get(self, key, signature):
+        entry = self.sources.get(key)
+        if entry is not None and entry["signature"] == signature:
+            return entry["ships"]
+        return None
+
+    def put(self, key, signature, summary):
+        self.sources[key] = {"signature": signature, "ships": summary}
+        self.dirty = True
+
+    def save(self):
+        """Write the cache atomically if anything changed."""
+        if not self.dirty:
+            return
+        try:
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump({"params": _cache_params(), "sources": self.sources}, f, separators=(',', ':'))
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+        except Exception as e:
+            logger.error(f"Failed to save analytics cache {self.path}: {e}")
+
+
+def archive_sources(directory, start_day=None, end_day=None):
+    """Archive segment paths for the inclusive YYYY-MM-DD day range."""
+    archive = gps_archive.FixArchive(directory)
+    return [path for _, path in archive.segments(start_day and start_day.replace('-', ''),
+                                                   end_day and end_day.replace('-', ''))]
+
+
+def summarize_sources(paths, cache=None, workers=None):
+    """summarize_source() for each path, from the cache where the file is unchanged; {path: summary}."""
+    summaries = {}
+    pending = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError as e:
+            logger.error(f"Skipping {path}: {e}")
+            continue
+        key, signature = cache_key(path, stat)
+        summary = cache.get(key, signature) if cache else None
+        if summary is None:
+            pending.append((path, key, signature))
+        else:
+            summaries[path] = summary
+    if pending:
+        names = [path for path, _, _ in pending]
+        if workers == 1 or len(pending) == 1:
+            results = map(summarize_source, names)
+            for (path, key, signature), summary in zip(pending, results):
+                summaries[path] = summary
+                if cache:
+                    cache.put(key, signature, summary)
+        else:
+            with ProcessPoolExecutor(workers) as executor:
+                for (path, key, signature), summary in zip(pending, executor.map(summarize_source, names)):
+                    summaries[path] = summary
+                    if cache:
+                        cache.put(key, signature, summary)
+    if cache:
+        cache.save()
+    return summaries
+
+
+def merge_stops(stops):
+    """Join stops from different sources that continue each other; drop ones shorter than STOP_MIN_SECONDS."""
+    merged = []
+    for stop in sorted(stops, key=lambda stop: stop["start"]):
+        previous = merged[-1] if merged else None
+        if (previous is not None and stop["start"] - previous["end"] <= STOP_MERGE_SECONDS
+                and geodesy.haversine_m(previous["latitude"], previous["longitude"],
+                                        stop["latitude"], stop["longitude"]) <= STOP_MERGE_M):
+            fixes = previous["fixes"] + stop["fixes"]
+            previous["latitude"] = round((previous["latitude"] * previous["fixes"]
+                                          + stop["latitude"] * stop["fixes"]) / fixes, 6)
+            previous["longitude"] = round((previous["longitude"] * previous["fixes"]
+                                           + stop["longitude"] * stop["fixes"]) / fixes, 6)
+            previous["end"] = max(previous["end"], stop["end"])
+            previous["fixes"] = fixes
+        else:
+            merged.append(dict(stop))
+    return [stop for stop in merged if stop["end"] - stop["start"] >= STOP_MIN_SECONDS]
+
+
+def _iso(seconds):
+    return datetime.fromtimestamp(seconds, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _with_averages(rollup):
+    hours = rollup["underway_s"] / 3600
+    rollup["avg_speed_kn"] = rollup["distance_nm"] / hours if hours else None
+    rollup["distance_nm"] = round(rollup["distance_nm"], 3)
+    return rollup
+
+
+def voyage_report(paths, cache=None, ship_id=None, start_day=None, end_day=None, workers=None):
+    """Daily rollups, totals, speed histogram and stops per ship for the inclusive YYYY-MM-DD day range."""
+    ships = {}
+    for summary in summarize_sources(paths, cache, workers).values():
+        for ship, data in summary.items():
+            if ship_id is not None and ship != ship_id:
+                continue
+            combined = ships.setdefault(ship, {"days": {}, "stops": []})
+            combined["stops"].extend(data["stops"])
+            for day, rollup in data["days"].items():
+                if (start_day and day < start_day) or (end_day and day > end_day):
+                    continue
+                total = combined["days"].get(day)
+                if total is None:
+                    combined["days"][day] = dict(rollup, speed_seconds=list(rollup["speed_seconds"]))
+                    continue
+                for name in ROLLUP_SUMS:
+                    total[name] += rollup[name]
+                total["max_speed_kn"] = max(filter(lambda value: value is not None,
+                                                   (total["max_speed_kn"], rollup["max_speed_kn"])), default=None)
+                total["speed_seconds"] = [a + b for a, b in zip(total["speed_seconds"], rollup["speed_seconds"])]
+    report = {}
+    for ship, combined in sorted(ships.items(), key=lambda item: str(item[0])):
+        days = combined["days"]
+        stops = [stop for stop in merge_stops(combined["stops"])
+                 if not (start_day and _iso(stop["end"])[:10] < start_day)
+                 and not (end_day and _iso(stop["start"])[:10] > end_day)]
+        stop_days = [_iso(stop["start"])[:10] for stop in stops]
+        totals = {name: sum(rollup[name] for rollup in days.values()) for name in ROLLUP_SUMS}
+        totals["max_speed_kn"] = max((rollup["max_speed_kn"] for rollup in days.values()
+                                      if rollup["max_speed_kn"] is not None), default=None)
+        totals["stops"] = len(stops)
+        histogram = [sum(column) for column in zip(*(rollup["speed_seconds"] for rollup in days.values()))]
+        report[ship] = {
+            "days": [_with_averages(dict(days[day], day=day, stops=stop_days.count(day))) for day in sorted(days)],
+            "totals": _with_averages(totals),
+            "speed_histogram": {"bins_kn": list(SPEED_BINS_KN), "seconds": histogram or [0.0] * len(SPEED_BINS_KN)},
+            "stops": [dict(stop, start=_iso(stop["start"]), end=_iso(stop["end"]),
+                           hours=round((stop["end"] - stop["start"]) / 3600, 2)) for stop in stops]
+        }
+    return report
+
+
+def print_report(report):
+    for ship, data in report.items():
+        print(f"Ship {ship}")
+        print(f"  {'day':<10} {'fixes':>8} {'nm':>9} {'underway h':>10} {'stopped h':>9} {'max kn':>7} {'avg kn':>7} "
+              f"{'stops':>5}")
+        for rollup in data["days"] + [dict(data["totals"], day="total")]:
+            max_speed = rollup["max_speed_kn"]
+            average = rollup["avg_speed_kn"]
+            print(f"  {rollup['day']:<10} {rollup['fixes']:>8} {rollup['distance_nm']:>9.1f} "
+                  f"{rollup['underway_s'] / 3600:>10.1f} {rollup['stopped_s'] / 3600:>9.1f} "
+                  f"{max_speed if max_speed is not None else float('nan'):>7.1f} "
+                  f"{average if average is not None else float('nan'):>7.1f} {rollup['stops']:>5}")
+        for stop in data["stops"]:
+            print(f"  stop {stop['start']} .. {stop['end']} ({stop['hours']:.1f} h) "
+                  f"at {stop['latitude']:.5f}, {stop['longitude']:.5f}")
+
+
+def main(args):
+    paths = list(args.files)
+    if args.archive:
+        paths.extend(archive_sources(args.archive, args.start, args.end))
+    if not paths:
+        sys.exit("No sources: give --archive and/or JSON-lines files")
+    cache = RollupCache(args.cache) if args.cache else None
+    report = voyage_report(paths, cache, args.ship, args.start, args.end, args.workers)
+    if args.json:
+        json.dump(report, sys.stdout, indent=1)
+        print()
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Daily voyage statistics per ship")
+    parser.add_argument('files', nargs='*', help="ships_log.jsonl, offline JSON or archive segment files")
+    parser.add_argument('--archive', help="archive directory to read segments from")
+    parser.add_argument('--start', help="first UTC day, YYYY-MM-DD")
+    parser.add_argument('--end', help="last UTC day, YYYY-MM-DD (inclusive)")
+    parser.add_argument('--ship', help="only this ship_id")
+    parser.add_argument('--cache', default=os.path.expanduser('~/.voyage_analytics_cache.json'),
+                        help="daily rollup cache file, '' to disable (default %(default)s)")
+    parser.add_argument('--workers', type=int, help="processes parsing uncached files (default: one per CPU)")
+    parser.add_argument('--json', action='store_true', help="print the full report as JSON")
+    main(parser.parse_args())
@@ -2,19 +2,254 @@ import asyncio
 import websockets
 import json
 import logging
-import re
+import argparse
+import math
+import multiprocessing
+import os
+import signal
+import sys
+import time
+import fleet_bus
+import geodesy
+import geofence
+import gps_config
+import spatial_index
+import uplink_codec
+import viewer_subscriptions
+from aiohttp import web
 
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('/home/mdt/ws_server.log'),
-        logging.StreamHandler()
-    ]
+    handlers=[logging.StreamHandler()]  # SERVICE_LOG_FILE is added once the configuration is loaded
 )
 
-# Set to keep track of connected clients
-connected_clients = set()
+# Configuration. Defaults; gps_config layers CONFIG_FILE and FLEET_<NAME>
+# environment variables over them, and re-applies HOT_SETTINGS when the file changes.
+CONFIG_FILE = os.environ.get('FLEET_CONFIG', '/home/mdt/fleet_config.json')
+CONFIG_RELOAD_INTERVAL = 10  # Seconds between checks for an edited CONFIG_FILE
+SERVICE_LOG_FILE = '/home/mdt/ws_server.log'  # This service's log, besides stderr; '' for stderr only
+WS_HOST = "0.0.0.0"
+WS_PORT = 8765
+HTTP_PORT = 8080  # /ships/near and /ships/bbox
+BROADCAST_INTERVAL = 1.0  # Seconds between shipsUpdate packets to viewers
+MAX_VIEWERS = 2000  # For the whole hub; each of N workers admits MAX_VIEWERS // N (SO_REUSEPORT spreads them evenly)
+STATS_INTERVAL = 60  # Seconds between throughput log lines
+LOG_FILE_PATH = '/home/mdt/ships_log.jsonl'  # Per-ship deltas, one line per broadcast tick
+MAX_QUERY_RESULTS = 1000  # Default and upper limit for ships returned by one HTTP query
+GEOFENCE_FILE = '/home/mdt/geofences.json'  # Polygons and circles, see geofence.py
+GEOFENCE_RELOAD_INTERVAL = 10  # Seconds between checks for an edited GEOFENCE_FILE
+RADIUS_UNITS = {"m": 1.0, "km": 1000.0, "nm": geodesy.METERS_PER_NM}
+HOT_SETTINGS = ('BROADCAST_INTERVAL', 'MAX_VIEWERS', 'STATS_INTERVAL', 'MAX_QUERY_RESULTS', 'GEOFENCE_FILE',
+                'GEOFENCE_RELOAD_INTERVAL', 'CONFIG_RELOAD_INTERVAL')
+
+# Fleet state
+ships = {}  # ship_id -> ShipState
+dirty_ships = set()  # ship_ids changed since the last broadcast
+ship_index = spatial_index.PointIndex()  # ship_id -> latest position
+geofences = geofence.GeofenceEngine()
+pending_fence_events = []  # Geofence events not yet sent to viewers
+viewers = set()  # Connections that receive every shipsUpdate packet
+subscriptions = {}  # websocket -> viewer_subscriptions.Subscription for filtered or rate-limited viewers
+subscription_index = spatial_index.BoxIndex()  # websocket -> subscribed bbox
+ship_watchers = {}  # ship_id -> websockets subscribed to that ship by id
+unfiltered_subscribers = set()  # Subscribed viewers with only a min_interval
+waiting_subscribers = set()  # Subscribed viewers holding back pending updates
+stats = {"fixes": 0, "rejected": 0, "broadcasts": 0}
+config = None  # gps_config.Config, loaded before the workers start
+peer_bus = None  # fleet_bus.PeerBus when running as one of several workers
+worker_count = 1
+fence_owner = True  # Evaluates geofences; with several workers only worker 0 does, the others follow it over the bus
+
+class ShipState:
+    """Latest report for one ship, kept together with its encoded JSON and position."""
+    __slots__ = ('ship_id', 'encoded', 'lat', 'lon')
+
+    def __init__(self, ship_id):
+        self.ship_id = ship_id
+        self.encoded = None
+        self.lat = None
+        self.lon = None
+
+def valid_position(lat, lon):
+    """True for a finite latitude and longitude in range; anything else would break the spatial index."""
+    return (all(isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+                for value in (lat, lon))
+            and -90 <= lat <= 90 and -180 <= lon <= 180)
+
+def normalize_ship_data(msg):
+    """Validate an uplink fix like server.js does and return the record to store, or None."""
+    ship_id = msg.get("ship_id")
+    gps_entries = msg.get("gps_data")
+    if not ship_id or not isinstance(gps_entries, list):
+        return None
+    valid = []
+    for entry in gps_entries:
+        if not isinstance(entry, dict) or not entry.get("gps"):
+            continue
+        lat = entry.get("latitude")
+        lon = entry.get("longitude")
+        if not valid_position(lat, lon):
+            continue
+        prns = entry.get("satellite_prns")
+        valid.append({
+            "gps": entry["gps"],
+            "latitude": lat,
+            "longitude": lon,
+            "altitude": entry.get("altitude"),
+            "speed": entry.get("speed"),
+            "satellites": entry.get("satellites"),
+            "satellite_prns": prns if isinstance(prns, list) else []
+        })
+    if not valid:
+        return None
+    record = {
+        "timestamp": msg.get("timestamp") or time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        "ship_id": str(ship_id),
+        "device_id": msg.get("device_id"),
+        "heading": msg.get("heading"),
+        "gps_data": valid
+    }
+    # The receiver the Pi chose, so positions here match the ship's own; ignored unless it has a position.
+    primary = msg.get("primary")
+    if isinstance(primary, str) and any(entry["gps"] == primary for entry in valid):
+        record["primary"] = primary
+    return record
+
+def ingest_fix(msg):
+    """Store one ship fix; mark the ship dirty only if its report actually changed."""
+    record = normalize_ship_data(msg)
+    try:
+        # Viewers' JSON.parse rejects NaN, so a non-finite altitude or speed rejects the fix too.
+        encoded = json.dumps(record, separators=(',', ':'), allow_nan=False) if record else None
+    except ValueError:
+        encoded = None
+    if encoded is None:
+        stats["rejected"] += 1
+        return None
+    stats["fixes"] += 1
+    ship_id = record["ship_id"]
+    position = geodesy.primary_position(record)
+    state = ships.get(ship_id)
+    if state is None:
+        state = ships[ship_id] = ShipState(ship_id)
+    elif state.encoded == encoded:
+        return None
+    state.encoded = encoded
+    set_position(state, *(position[:2] if position else (None, None)))
+    dirty_ships.add(ship_id)
+    if peer_bus:
+        peer_bus.publish(ship_id, state.lat, state.lon, encoded)
+    return state
+
+def apply_peer_update(ship_id, lat, lon, encoded):
+    """Store a ship record ingested by another worker."""
+    state = ships.get(ship_id)
+    if state is None:
+        state = ships[ship_id] = ShipState(ship_id)
+    elif state.encoded == encoded:
+        return
+    state.encoded = encoded
+    set_position(state, lat, lon)
+    dirty_ships.add(ship_id)
+
+def set_position(state, lat, lon):
+    """Record a ship's position and keep the spatial index in step."""
+    state.lat = lat
+    state.lon = lon
+    if lat is None:
+        ship_index.remove(state.ship_id)
+        return
+    ship_index.update(state.ship_id, lat, lon)
+    if geofences.fences and fence_owner:
+        events = geofences.evaluate(state.ship_id, lat, lon, time.time())
+        pending_fence_events.extend(events)
+        if peer_bus and events:
+            peer_bus.publish_events(events)
+
+def apply_fence_state(state):
+    """Take geofence events (or a snapshot) from the fence owner worker."""
+    pending_fence_events.extend(geofences.apply_state(state))
+
+def ship_snapshot():
+    return [(state.ship_id, state.lat, state.lon, state.encoded) for state in ships.values()]
+
+async def subscribe(websocket, subscription):
+    """Replace a viewer's subscription and send it the ships it now covers.
+
+    The first subscribe makes a connection a viewer, so it is the point where
+    MAX_VIEWERS applies.
+    """
+    if websocket not in viewers and websocket not in subscriptions:
+        if len(viewers) + len(subscriptions) >= MAX_VIEWERS // worker_count:
+            logging.warning(f"Max viewers ({MAX_VIEWERS // worker_count} of {MAX_VIEWERS} on this worker) reached, "
+                            f"rejecting new viewer")
+            await websocket.close(1013, "Maximum clients reached")
+            return
+    unsubscribe(websocket)
+    if not subscription.filtered and not subscription.min_interval:
+        viewers.add(websocket)
+        await websocket.send(ships_packet(ships.values(), full=True))
+        return
+    viewers.discard(websocket)
+    subscriptions[websocket] = subscription
+    if subscription.bbox is not None:
+        subscription_index.add(websocket, subscription.bbox)
+    for ship_id in subscription.ship_ids:
+        ship_watchers.setdefault(ship_id, set()).add(websocket)
+    if not subscription.filtered:
+        unfiltered_subscribers.add(websocket)
+    matching = {ship_id: ships[ship_id] for ship_id in subscription.ship_ids if ship_id in ships}
+    if subscription.bbox is not None:
+        matching.update((ship_id, ships[ship_id]) for ship_id, _, _ in ship_index.within_bbox(subscription.bbox))
+    if not subscription.filtered:
+        matching = ships
+    subscription.mark_sent(time.monotonic())
+    await websocket.send(ships_packet(matching.values(), full=True))
+
+def unsubscribe(websocket):
+    subscription = subscriptions.pop(websocket, None)
+    if subscription is None:
+        return
+    subscription_index.remove(websocket)
+    for ship_id in subscription.ship_ids:
+        watchers = ship_watchers.get(ship_id)
+        if watchers is not None:
+            watchers.discard(websocket)
+            if not watchers:
+                del ship_watchers[ship_id]
+    unfiltered_subscribers.discard(websocket)
+    waiting_subscribers.discard(websocket)
+
+def mark_producer(websocket):
+    """Ship uplinks and legacy GPS clients send data; they are not viewers."""
+    viewers.discard(websocket)
+    unsubscribe(websocket)
+
+def route_changes(changed):
+    """Queue changed ships on the subscribed viewers interested in them."""
+    for state in changed:
+        interested = ship_watchers.get(state.ship_id, set())
+        if state.lat is not None:
+            interested = interested.union(subscription_index.containing(state.lat, state.lon))
+        for websocket in interested:
+            subscriptions[websocket].pending[state.ship_id] = state
+            waiting_subscribers.add(websocket)
+    for websocket in unfiltered_subscribers:
+        subscriptions[websocket].pending.update((state.ship_id, state) for state in changed)
+        waiting_subscribers.add(websocket)
+
+def flush_subscribers():
+    """Send pending updates to subscribed viewers whose min_interval has passed."""
+    now = time.monotonic()
+    for websocket in list(waiting_subscribers):
+        subscription = subscriptions[websocket]
+        if not subscription.due(now):
+            continue
+        websockets.broadcast((websocket,), ships_packet(subscription.pending.values()))
+        subscription.pending.clear()
+        subscription.mark_sent(now)
+        waiting_subscribers.discard(websocket)
 
 async def parse_gps_data(gps_text):
     """Parse GPS text data into a structured JSON object."""
@@ -50,38 +285,280 @@ async def parse_gps_data(gps_text):
         logging.error(f"Failed to parse GPS data: {e}")
         return None
 
+def legacy_to_ship_data(parsed):
+    """Convert the single-ship text format parsed above into the uplink fix shape."""
+    return {
+        "timestamp": parsed["timestamp"],
+        "ship_id": parsed["device_id"] or "unknown",
+        "device_id": parsed["device_id"],
+        "heading": None,
+        "gps_data": [
+            {"gps": "top_gps", **parsed["top_gps"]},
+            {"gps": "bottom_gps", **parsed["bottom_gps"]}
+        ]
+    }
+
+def ships_packet(states, full=False):
+    """Build a shipsUpdate packet by joining the ships' pre-encoded JSON."""
+    body = ",".join(state.encoded for state in states)
+    return f'{{"type":"shipsUpdate","full":{"true" if full else "false"},"ships":[{body}],"timestamp":{int(time.time() * 1000)}}}'
+
+async def handle_message(websocket, message, session):
+    """Dispatch one message from a ship uplink or a legacy GPS client."""
+    if isinstance(message, bytes):
+        if session.get("decoder") is None:
+            session["decoder"] = uplink_codec.CompactDecoder()
+        for fix in session["decoder"].decode(message):
+            ingest_fix(fix)
+        return
+    data = json.loads(message)
+    if not isinstance(data, dict):
+        return
+    msg_type = data.get("type")
+    if msg_type == viewer_subscriptions.SUBSCRIBE_TYPE:
+        await subscribe(websocket, viewer_subscriptions.parse_subscription(data))
+    elif msg_type == "hello":
+        # Ship uplinks negotiate here; they are producers, not viewers.
+        mark_producer(websocket)
+        encoding = uplink_codec.choose_encoding(data.get("encodings"))
+        await websocket.send(json.dumps({"type": "hello", "encoding": encoding, "batch": True}))
+        logging.info(f"Uplink {websocket.remote_address} negotiated {encoding}")
+    elif msg_type == "batch":
+        mark_producer(websocket)
+        for fix in data.get("fixes", []):
+            if isinstance(fix, dict):
+                ingest_fix(fix)
+    elif isinstance(data.get("gps_data"), str):
+        mark_producer(websocket)
+        parsed_data = await parse_gps_data(data["gps_data"])
+        if parsed_data:
+            ingest_fix(legacy_to_ship_data(parsed_data))
+    elif "ship_id" in data:
+        mark_producer(websocket)
+        ingest_fix(data)
+
 async def handle_connection(websocket, path=None):
-    logging.info("Client connected")
-    # Register client
-    connected_clients.add(websocket)
+    # A connection is neither viewer nor producer until its first message: viewers
+    # send {"type": "subscribe"} (optionally filtered) and then get the fleet
+    # snapshot, ship uplinks send hello or data and never get ship packets.
+    session = {}
     try:
+        await websocket.send(json.dumps({"type": "welcome", "shipCount": len(ships)}))
         async for message in websocket:
             try:
-                data = json.loads(message)
-                gps_text = data.get("gps_data", "")
-                parsed_data = await parse_gps_data(gps_text)
-                if parsed_data:
-                    # Broadcast parsed data to all connected clients
-                    for client in connected_clients:
-                        try:
-                            await client.send(json.dumps(parsed_data))
-                        except websockets.exceptions.ConnectionClosed:
-                            continue
-                    logging.info(f"Broadcasted parsed GPS data: {parsed_data}")
-            except json.JSONDecodeError:
-                logging.error("Invalid JSON received")
+                await handle_message(websocket, message, session)
+            except (json.JSONDecodeError, ValueError) as e:
+                logging.error(f"Invalid message received: {e}")
             except Exception as e:
                 logging.error(f"Error processing message: {e}")
     except websockets.exceptions.ConnectionClosed:
-        logging.info("Client disconnected")
+        pass
+    finally:
+        viewers.discard(websocket)
+        unsubscribe(websocket)
+
+def broadcast_fence_events(log_events):
+    """Send queued geofence events to unfiltered viewers and to subscribers covering the ship."""
+    events = pending_fence_events[:]
+    pending_fence_events.clear()
+    if log_events:
+        for event in events:
+            logging.info(f"Geofence {event['event']}: {event['ship_id']} {event['fence_id']}")
+    if viewers:
+        websockets.broadcast(viewers, json.dumps({"type": "geofenceEvents", "events": events}))
+    for websocket, subscription in subscriptions.items():
+        matching = [event for event in events
+                    if subscription.matches(event["ship_id"], event["latitude"], event["longitude"])]
+        if matching:
+            websockets.broadcast((websocket,), json.dumps({"type": "geofenceEvents", "events": matching}))
+
+async def broadcast_changes(log_file):
+    """Every BROADCAST_INTERVAL, send changed ships to interested viewers and log them (log_file may be None).
+
+    Unfiltered viewers share one encoded packet; subscribed viewers get only the
+    ships their subscription routes to them, at most once per min_interval.
+    """
+    while True:
+        await asyncio.sleep(BROADCAST_INTERVAL)
+        if pending_fence_events:
+            broadcast_fence_events(log_file is not None)
+        if not dirty_ships:
+            flush_subscribers()
+            continue
+        changed = [ships[ship_id] for ship_id in sorted(dirty_ships)]
+        dirty_ships.clear()
+        if viewers:
+            websockets.broadcast(viewers, ships_packet(changed))
+        route_changes(changed)
+        flush_subscribers()
+        stats["broadcasts"] += 1
+        if log_file is None:
+            continue
+        try:
+            log_file.write(f'{{"ships":[{",".join(state.encoded for state in changed)}],"timestamp":{int(time.time() * 1000)}}}\n')
+            log_file.flush()
+        except Exception as e:
+            logging.error(f"Error writing to log file: {e}")
+
+async def log_stats(worker_index):
+    """Periodically log ingest and fan-out throughput."""
+    last_fixes = 0
+    while True:
+        await asyncio.sleep(STATS_INTERVAL)
+        fixes = stats["fixes"]
+        logging.info(f"Worker {worker_index}: {len(ships)} ships, {len(viewers)} viewers, "
+                     f"{len(subscriptions)} subscribed, "
+                     f"{(fixes - last_fixes) / STATS_INTERVAL:.0f} fixes/s, {stats['rejected']} rejected")
+        last_fixes = fixes
+
+async def watch_geofences():
+    """Load GEOFENCE_FILE and reload it whenever it changes."""
+    loaded_mtime = None
+    while True:
+        try:
+            mtime = os.path.getmtime(GEOFENCE_FILE)
+            if mtime != loaded_mtime:
+                loaded_mtime = mtime
+                geofences.load(GEOFENCE_FILE)
+        except FileNotFoundError:
+            if loaded_mtime is not None:
+                loaded_mtime = None
+                geofences.set_fences([])
+                logging.info(f"{GEOFENCE_FILE} removed, geofences cleared")
+        except Exception as e:
+            logging.error(f"Failed to load geofences from {GEOFENCE_FILE}: {e}")
+        await asyncio.sleep(GEOFENCE_RELOAD_INTERVAL)
+
+async def watch_config():
+    """Re-apply hot settings whenever CONFIG_FILE changes (each worker applies them itself)."""
+    while True:
+        await asyncio.sleep(CONFIG_RELOAD_INTERVAL)
+        try:
+            config.reload_if_changed()
+        except Exception as e:
+            logging.error(f"Error reloading {config.path}: {e}")
+
+def query_limit(request):
+    limit = int(request.query.get("limit", MAX_QUERY_RESULTS))
+    if limit <= 0:
+        raise ValueError("limit must be positive")
+    return min(limit, MAX_QUERY_RESULTS)
+
+def json_error(message):
+    return web.json_response({"error": message}, status=400)
+
+async def get_ships_near(request):
+    """Handle GET /ships/near?lat=&lon=&radius=[&unit=m|km|nm][&limit=], nearest first."""
+    try:
+        lat = float(request.query["lat"])
+        lon = float(request.query["lon"])
+        radius = float(request.query["radius"])
+        unit = request.query.get("unit", "m")
+        if unit not in RADIUS_UNITS:
+            raise ValueError(f"unit must be one of {', '.join(RADIUS_UNITS)}")
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180) or radius < 0:
+            raise ValueError("lat, lon or radius out of range")
+        limit = query_limit(request)
+    except KeyError as e:
+        return json_error(f"missing parameter {e}")
+    except ValueError as e:
+        return json_error(str(e))
+    found = ship_index.near(lat, lon, radius * RADIUS_UNITS[unit], limit)
+    body = ",".join(f'{{"distance_m":{distance:.1f},"ship":{ships[ship_id].encoded}}}' for distance, ship_id in found)
+    return web.Response(text=f'{{"count":{len(found)},"ships":[{body}]}}', content_type='application/json')
+
+async def get_ships_bbox(request):
+    """Handle GET /ships/bbox?south=&west=&north=&east=[&limit=]; west > east crosses the antimeridian."""
+    try:
+        bbox = viewer_subscriptions.parse_bbox(dict(request.query))
+        limit = query_limit(request)
+    except ValueError as e:
+        return json_error(str(e))
+    found = ship_index.within_bbox(bbox)
+    body = ",".join(ships[ship_id].encoded for ship_id, _, _ in found[:limit])
+    return web.Response(text=f'{{"count":{min(len(found), limit)},"total":{len(found)},"ships":[{body}]}}',
+                        content_type='application/json')
+
+async def get_geofences(request):
+    """Handle GET /geofences: every fence with the ships currently inside it."""
+    return web.json_response({"fences": [dict(fence.to_dict(), ships_inside=geofences.ships_inside(fence.fence_id))
+                                         for fence in geofences.fences.values()]})
+
+async def get_geofence_events(request):
+    """Handle GET /geofences/events?since=<seq>[&limit=]; poll with the last seq seen."""
+    try:
+        since = int(request.query.get("since", 0))
+        limit = query_limit(request)
+    except ValueError as e:
+        return json_error(str(e))
+    events = geofences.events_since(since, limit)
+    return web.json_response({"events": events, "last_seq": events[-1]["seq"] if events else max(since, 0)})
+
+async def start_http_server(reuse_port):
+    app = web.Application()
+    app.router.add_get('/ships/near', get_ships_near)
+    app.router.add_get('/ships/bbox', get_ships_bbox)
+    app.router.add_get('/geofences', get_geofences)
+    app.router.add_get('/geofences/events', get_geofence_events)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, WS_HOST, HTTP_PORT, reuse_port=reuse_port)
+    await site.start()
+    logging.info(f"HTTP server started on http://{WS_HOST}:{HTTP_PORT}")
+
+async def main(worker_index=0, workers=1):
+    """Run one hub process; with several workers they share the port and exchange ship state."""
+    global peer_bus, worker_count, fence_owner
+    tasks = [log_stats(worker_index), watch_geofences()]
+    if config:
+        tasks.append(watch_config())
+    if workers > 1:
+        worker_count = workers
+        # Events numbered by one worker, so /geofences/events?since= means the same whichever worker answers.
+        fence_owner = worker_index == 0
+        peer_bus = fleet_bus.PeerBus(WS_PORT, worker_index, workers, apply_peer_update, ship_snapshot,
+                                     apply_fence_state, geofences.snapshot if fence_owner else None)
+        await peer_bus.start()
+        tasks.append(peer_bus.run())
+    # Every worker sees every ship, so one of them is enough to write the log.
+    log_file = open(LOG_FILE_PATH, 'a') if worker_index == 0 else None
+    server = await websockets.serve(handle_connection, WS_HOST, WS_PORT, max_queue=64, reuse_port=workers > 1)
+    await start_http_server(workers > 1)
+    logging.info(f"Fleet hub worker {worker_index} started on ws://{WS_HOST}:{WS_PORT}")
+    try:
+        await asyncio.gather(broadcast_changes(log_file), server.wait_closed(), *tasks)
     finally:
-        # Unregister client
-        connected_clients.remove(websocket)
+        if log_file:
+            log_file.close()
 
-async def main():
-    server = await websockets.serve(handle_connection, "0.0.0.0", 8765)
-    logging.info("WebSocket server started on ws://localhost:8765")
-    await server.wait_closed()
+def run_worker(worker_index, workers):
+    asyncio.run(main(worker_index, workers))
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Fleet WebSocket hub")
+    parser.add_argument('--port', type=int, help=f"WebSocket port (4001 to replace server.js, default {WS_PORT})")
+    parser.add_argument('--http-port', type=int, help=f"HTTP query API port (default {HTTP_PORT})")
+    parser.add_argument('--workers', type=int, default=1, help="worker processes sharing the port via SO_REUSEPORT")
+    parser.add_argument('--config', metavar='FILE', default=CONFIG_FILE, help="JSON settings file (default $FLEET_CONFIG or %(default)s)")
+    args = parser.parse_args()
+    config = gps_config.Config(sys.modules[__name__], args.config, 'FLEET_', HOT_SETTINGS,
+                               exclude=('CONFIG_FILE', 'HOT_SETTINGS', 'RADIUS_UNITS'))
+    config.load()
+    gps_config.log_to_file(SERVICE_LOG_FILE)
+    WS_PORT = args.port or WS_PORT
+    HTTP_PORT = args.http_port or HTTP_PORT
+    if args.workers > 1:
+        # Workers inherit the loaded configuration, log handlers and port overrides as module
+        # state, so they must be forked; spawn and forkserver (the default from Python 3.14)
+        # would start them with the defaults.
+        context = multiprocessing.get_context('fork')
+        processes = [context.Process(target=run_worker, args=(i, args.workers), daemon=True)
+                     for i in range(args.workers)]
+        # Exit cleanly on SIGTERM so the daemon workers are terminated with us.
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+    else:
+        asyncio.run(main())
@@ -9,6 +9,9 @@ GPS_DIR="/home/mdt/GPS"
 LOG_FILE="/home/mdt/gps_auto_start.log"
 OUTPUT_DIR="/home/mdt/Desktop/GPS"
 GPS_PY="/home/mdt/gps_websocket.py"
+GPSD_PORT=2947
+WS_PORT=8765
+START_TIMEOUT=10  # Seconds to wait for gpsd / the server to accept connections
 
 # Function to log messages
 log_message() {
@@ -16,6 +19,15 @@ log_message() {
     echo "$1"
 }
 
+# Poll until something accepts TCP connections on 127.0.0.1:$1, for at most $2 seconds
+wait_for_port() {
+    local deadline=$((SECONDS + $2))
+    until (exec 3<>"/dev/tcp/127.0.0.1/$1") 2>/dev/null; do
+        [ "${SECONDS}" -ge "${deadline}" ] && return 1
+        sleep 0.1
+    done
+}
+
 # Create log and output directories
 mkdir -p "${OUTPUT_DIR}" "${GPS_DIR}"
 touch "${LOG_FILE}"
@@ -30,16 +42,16 @@ else
     exit 1
 fi
 
-# Check Python package dependencies
-for pkg in gps3 websocket_client websockets aiohttp pytz; do
-    python3 -c "import $pkg" 2>/dev/null || {
-        log_message "Installing missing package: $pkg"
-        pip install "$pkg" || {
-            log_message "ERROR: Failed to install $pkg"
-            exit 1
-        }
-    }
-done
+# Check Python package dependencies in one interpreter start. Installing at boot
+# stalls startup (or hangs offline); install into the venv ahead of time instead.
+MISSING=$(python3 -c "
+import importlib.util
+print(' '.join(pkg for pkg in ('gps', 'websockets', 'aiohttp') if importlib.util.find_spec(pkg) is None))
+")
+if [ -n "${MISSING}" ]; then
+    log_message "ERROR: Missing Python packages: ${MISSING} (run: ${VENV_PATH}/bin/pip install ${MISSING})"
+    exit 1
+fi
 
 # Detect GPS devices
 GPS_DEVICES=$(ls /dev/ttyACM* /dev/ttyUSB* 2>/dev/null)
@@ -50,24 +62,30 @@ fi
 GPS_DEVICES_ARRAY=(${GPS_DEVICES})
 log_message "Detected GPS devices: ${GPS_DEVICES}"
 
-# Set baud rate for each device
+# Set baud rate for all devices concurrently
 for device in "${GPS_DEVICES_ARRAY[@]}"; do
-    sudo stty -F "${device}" 9600
-    if [ $? -eq 0 ]; then
-        log_message "Set baud rate to 9600 for ${device}"
-    else
-        log_message "WARNING: Failed to set baud rate for ${device}"
-    fi
+    (
+        if sudo stty -F "${device}" 9600; then
+            log_message "Set baud rate to 9600 for ${device}"
+        else
+            log_message "WARNING: Failed to set baud rate for ${device}"
+        fi
+    ) &
 done
 
-# Stop any existing gpsd instances
-sudo killall gpsd 2>/dev/null
-sleep 1
-log_message "Stopped any existing gpsd instances"
+# Stop any existing gpsd instances, waiting only as long as they take to exit
+if sudo killall gpsd 2>/dev/null; then
+    for _ in $(seq 50); do
+        pgrep -x gpsd > /dev/null || break
+        sleep 0.1
+    done
+    log_message "Stopped existing gpsd instances"
+fi
+wait  # For the stty jobs
 
 # Start gpsd with detected devices
 sudo gpsd -n -F /var/run/gpsd.sock -G 127.0.0.1 -b ${GPS_DEVICES}
-if [ $? -eq 0 ]; then
+if [ $? -eq 0 ] && wait_for_port "${GPSD_PORT}" "${START_TIMEOUT}"; then
     log_message "Started gpsd with devices: ${GPS_DEVICES}"
 else
     log_message "ERROR: Failed to start gpsd"
@@ -79,7 +97,12 @@ if [ -f "${GPS_PY}" ]; then
     python3 "${GPS_PY}" >> "${LOG_FILE}" 2>&1 &
     GPS_PID=$!
     log_message "Started GPS and WebSocket server (PID: ${GPS_PID})"
-    sleep 5  # Increased sleep to allow script to initialize
+    # Ready as soon as the WebSocket server listens; fail early if the process dies first.
+    deadline=$((SECONDS + START_TIMEOUT))
+    until (exec 3<>"/dev/tcp/127.0.0.1/${WS_PORT}") 2>/dev/null || ! ps -p "${GPS_PID}" > /dev/null \
+            || [ "${SECONDS}" -ge "${deadline}" ]; do
+        sleep 0.1
+    done
     if ! ps -p "${GPS_PID}" > /dev/null; then
         log_message "ERROR: GPS and WebSocket server failed to start. Check ${LOG_FILE} for details."
         cat "${LOG_FILE}" | tail -n 20 >> "${LOG_FILE}.error"
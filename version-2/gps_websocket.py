@@ -7,8 +7,7 @@ import glob
 import asyncio
 import websockets
 import json
-import pytz
-from datetime import datetime
+from datetime import datetime, timezone
 from aiohttp import web
 from queue import Queue, Empty
 
@@ -32,6 +31,7 @@ HTTP_PORT = 8080
 TIMEOUT = 10
 RECONNECT_DELAY = 2
 DATA_TIMEOUT = 30  # seconds
+DEVICE_ID = os.environ.get('GPS_DEVICE_ID', '10000000e123456be')  # Set GPS_DEVICE_ID per unit; the default is a placeholder
 
 # Global variables
 latest_gps_data = None
@@ -85,7 +85,7 @@ async def parse_gps_data(gps_text):
     try:
         data = {
             "timestamp": "",
-            "device_id": "10000000e123456be",
+            "device_id": DEVICE_ID,
             "heading": None,
             "gps_data": [
                 {"gps": "top_gps", "latitude": None, "longitude": None, "altitude": None, "speed": None, "satellites": None, "satellite_prns": []},
@@ -264,7 +264,7 @@ def process_gps_data():
                         logger.debug(f"Ignoring report for unknown device: {device}")
                         continue
                     last_data_time[device] = current_time
-                    timestamp = datetime.now(pytz.UTC).strftime('%Y-%m-%d %H:%M:%S.%f')
+                    timestamp = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S.%f')
 
                     if report.get('class') == 'TPV':
                         lat = getattr(report, 'lat', None)
@@ -296,7 +296,7 @@ def process_gps_data():
 
                     output = [
                         f"GPS Data (Real-Time): {timestamp}",
-                        f"Device ID: 10000000e123456be",
+                        f"Device ID: {DEVICE_ID}",
                         f"Heading: {device_data[device].get('heading', 'Unknown') if device_data[device].get('heading') is not None else 'Unknown'}"
                     ]
                     for idx, dev in enumerate(sorted(SERIAL_DEVICES)):